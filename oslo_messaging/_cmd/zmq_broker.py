@@ -24,6 +24,12 @@ from oslo_messaging._executors import impl_pooledexecutor
 
 CONF = cfg.CONF
 CONF.register_opts(impl_zmq.zmq_opts)
+CONF.register_cli_opts([
+    cfg.IntOpt('workers', default=1, min=1,
+               help='Number of broker processes. With more than one, '
+                    'a supervisor load balances the requests between '
+                    'the workers and restarts the workers which die.'),
+])
 CONF.register_opts(impl_pooledexecutor._pool_opts)
 # TODO(ozamiatin): Move this option assignment to an external config file
 # Use efficient zmq poller in real-world deployment
@@ -34,7 +40,12 @@ def main():
     CONF(sys.argv[1:], project='oslo')
     logging.basicConfig(level=logging.DEBUG)
 
-    with contextlib.closing(zmq_broker.ZmqBroker(CONF)) as reactor:
+    if CONF.workers > 1:
+        broker = zmq_broker.ZmqBrokerSupervisor(CONF, CONF.workers)
+    else:
+        broker = zmq_broker.ZmqBroker(CONF)
+
+    with contextlib.closing(broker) as reactor:
         reactor.start()
         reactor.wait()
 
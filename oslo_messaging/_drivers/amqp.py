@@ -25,12 +25,12 @@ uses AMQP, but is deprecated and predates this code.
 
 import collections
 import logging
-import uuid
 
 from oslo_config import cfg
 import six
 
 from oslo_messaging._drivers import common as rpc_common
+from oslo_messaging import _utils as utils
 
 deprecated_durable_opts = [
     cfg.DeprecatedOpt('amqp_durable_queues',
@@ -133,7 +133,7 @@ class _MsgIdCache(object):
 
 def _add_unique_id(msg):
     """Add unique_id for checking duplicate messages."""
-    unique_id = uuid.uuid4().hex
+    unique_id = utils.generate_id()
     msg.update({UNIQUE_ID: unique_id})
 
 
@@ -31,6 +31,7 @@ from oslo_messaging._i18n import _
 from oslo_messaging._i18n import _LE
 from oslo_messaging._i18n import _LI
 from oslo_messaging._i18n import _LW
+from oslo_messaging import _utils as utils
 
 LOG = logging.getLogger(__name__)
 
@@ -405,7 +406,7 @@ class AMQPDriverBase(base.BaseDriver):
         msg = message
 
         if wait_for_reply:
-            msg_id = uuid.uuid4().hex
+            msg_id = utils.generate_id()
             msg.update({'_msg_id': msg_id})
             msg.update({'_reply_q': self._get_reply_q()})
 
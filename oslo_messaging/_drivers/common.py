@@ -15,14 +15,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import copy
 import logging
+import os
 import sys
 import traceback
 
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 import six
+from six import moves
 
 import oslo_messaging
 from oslo_messaging._i18n import _
@@ -351,6 +354,51 @@ class DecayingTimer(object):
         return left if maximum is None else min(left, maximum)
 
 
+class Handoff(object):
+    """Items passed from any thread to a consumer thread without locks.
+
+    A deque is safe to append to from any thread.  The consumer waits for the
+    read end of a pipe, written to only once until the consumer has taken the
+    queued items, so a burst of items costs a single write.
+    """
+
+    def __init__(self):
+        self._items = collections.deque()
+        self._pipe = os.pipe()
+        # True when a byte has been written to the pipe and the consumer has
+        # not taken the queued items yet
+        self._pending = False
+
+    def put(self, item):
+        """Queue an item and wake the consumer up."""
+        self._items.append(item)
+        self.wakeup()
+
+    def wakeup(self):
+        """Wake the consumer up, unless it is already."""
+        # the items must be queued before checking the flag, get_all()
+        # clears the flag before it takes the queued items
+        if not self._pending:
+            self._pending = True
+            os.write(self._pipe[1], b'!')
+
+    def fileno(self):
+        return self._pipe[0]
+
+    def get_all(self):
+        """Return the queued items, once the pipe is readable."""
+        # the pipe is drained before the flag is cleared: the byte of a
+        # wakeup() which saw the flag cleared must stay for the next wait
+        os.read(self._pipe[0], 512)
+        self._pending = False
+        return [self._items.popleft()
+                for __ in moves.range(len(self._items))]
+
+    def close(self):
+        os.close(self._pipe[0])
+        os.close(self._pipe[1])
+
+
 # NOTE(sileht): Even if rabbit has only one Connection class,
 # this connection can be used for two purposes:
 # * wait and receive amqp messages (only do read stuffs on the socket)
@@ -0,0 +1,177 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import threading
+
+from oslo_config import cfg
+from oslo_utils import excutils
+
+from oslo_messaging._drivers import base
+from oslo_messaging._drivers import impl_memory
+from oslo_messaging._i18n import _LW
+from oslo_messaging import transport as msg_transport
+
+LOG = logging.getLogger(__name__)
+
+hybrid_opts = [
+    cfg.StrOpt('local_transport_url', default='unix://',
+               help='URL of the transport through which the messages to '
+                    'the servers of the host are sent, unix:// for the '
+                    'servers of any process of the host or memory:// for '
+                    'those of the process. Without virtual host, the '
+                    'virtual host of the broker is used.'),
+    cfg.BoolOpt('local_topic_delivery', default=False,
+                help='Also send the messages to a topic without server '
+                     'through the local transport, when a server of the '
+                     'topic runs on the host. The servers of the host then '
+                     'take all the messages of the topic sent from it.'),
+]
+
+# seconds the listeners of both transports are polled for, in between checks
+# that the hybrid listener was not stopped
+_POLL_TIMEOUT = 1
+
+
+class HybridListener(impl_memory.MemoryListener):
+    """Merge the messages of the listeners of the local and broker transports.
+
+    A thread per listener polls it and queues its incoming messages, which
+    are then taken as by the listeners of the memory driver.
+    """
+
+    def __init__(self, driver, listeners):
+        self._queue = impl_memory.MemoryQueue()
+        super(HybridListener, self).__init__(driver, [self._queue])
+        self._listeners = listeners
+        self._pumps = []
+        for listener in listeners:
+            pump = threading.Thread(target=self._pump, args=(listener,))
+            pump.daemon = True
+            pump.start()
+            self._pumps.append(pump)
+
+    @excutils.forever_retry_uncaught_exceptions
+    def _pump(self, listener):
+        while not self._stopped:
+            for incoming in listener.poll(timeout=_POLL_TIMEOUT):
+                self._queue.put(incoming)
+
+    def _incoming(self, queue, item):
+        return item
+
+    def stop(self):
+        super(HybridListener, self).stop()
+        for listener in self._listeners:
+            listener.stop()
+
+    def cleanup(self):
+        self.stop()
+        for pump in self._pumps:
+            pump.join()
+        for listener in self._listeners:
+            listener.cleanup()
+        super(HybridListener, self).cleanup()
+
+
+class HybridDriver(base.BaseDriver):
+    """Send the messages to the servers of the host without the broker.
+
+    The transport URL is the one of the broker, its scheme prefixed with
+    'hybrid+', as in hybrid+rabbit://host/virtual_host.  The servers listen
+    through both the local transport and the broker.  A message to a server
+    known to the local transport, which registers the listeners of the host,
+    is sent through it; the other messages, the fanouts and the notifications
+    through the broker, as are the messages no local listener took.  Both
+    transports raise MessagingTimeout and the deserialized remote exceptions
+    alike.
+    """
+
+    def __init__(self, conf, url, default_exchange=None,
+                 allowed_remote_exmods=None):
+
+        opt_group = cfg.OptGroup(name='oslo_messaging_hybrid',
+                                 title='Hybrid driver options')
+        conf.register_group(opt_group)
+        conf.register_opts(hybrid_opts, group=opt_group)
+
+        super(HybridDriver, self).__init__(conf, url, default_exchange,
+                                           allowed_remote_exmods)
+
+        scheme = url.transport.split('+', 1)
+        if len(scheme) < 2 or scheme[1].startswith('hybrid'):
+            raise msg_transport.InvalidTransportURL(
+                url, 'No broker transport in "%s", expected a scheme such '
+                     'as hybrid+rabbit' % url)
+        broker_url = msg_transport.TransportURL(
+            conf, scheme[1], url.virtual_host, url.hosts, url.aliases)
+
+        local_url = msg_transport.TransportURL.parse(
+            conf, conf.oslo_messaging_hybrid.local_transport_url)
+        if not local_url.virtual_host:
+            local_url.virtual_host = url.virtual_host
+
+        self._broker = msg_transport.get_transport(
+            conf, broker_url, allowed_remote_exmods)._driver
+        self._local = msg_transport.get_transport(
+            conf, local_url, allowed_remote_exmods)._driver
+        if not hasattr(self._local, 'has_listeners'):
+            self.cleanup()
+            raise msg_transport.InvalidTransportURL(
+                local_url, 'Transport "%s" can not be the local transport'
+                           % local_url.transport)
+        self._local_topic_delivery = (
+            conf.oslo_messaging_hybrid.local_topic_delivery)
+
+    def require_features(self, requeue=False):
+        self._local.require_features(requeue=requeue)
+        self._broker.require_features(requeue=requeue)
+
+    def _get_driver(self, target):
+        """Return the driver of the transport to send to target through."""
+        if target.fanout:
+            return self._broker
+        if not target.server and not self._local_topic_delivery:
+            return self._broker
+        if self._local.has_listeners(target):
+            return self._local
+        return self._broker
+
+    def send(self, target, ctxt, message, wait_for_reply=None, timeout=None,
+             retry=None):
+        if self._get_driver(target) is self._local:
+            try:
+                return self._local.send(
+                    target, ctxt, message, wait_for_reply=wait_for_reply,
+                    timeout=timeout, retry=retry)
+            except impl_memory.MessageNotDelivered as e:
+                LOG.warning(_LW("Sending to %(target)s through the broker: "
+                                "%(error)s"), {'target': target, 'error': e})
+        return self._broker.send(
+            target, ctxt, message, wait_for_reply=wait_for_reply,
+            timeout=timeout, retry=retry)
+
+    def send_notification(self, target, ctxt, message, version, retry=None):
+        return self._broker.send_notification(target, ctxt, message, version,
+                                              retry=retry)
+
+    def listen(self, target):
+        return HybridListener(self, [self._local.listen(target),
+                                     self._broker.listen(target)])
+
+    def listen_for_notifications(self, targets_and_priorities, pool):
+        return self._broker.listen_for_notifications(targets_and_priorities,
+                                                     pool)
+
+    def cleanup(self):
+        self._local.cleanup()
+        self._broker.cleanup()
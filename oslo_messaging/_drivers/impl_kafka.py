@@ -11,7 +11,9 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import collections
 import threading
+import time
 
 from oslo_messaging._drivers import base
 from oslo_messaging._drivers import common as driver_common
@@ -19,6 +21,7 @@ from oslo_messaging._drivers import pool as driver_pool
 from oslo_messaging._i18n import _LE
 from oslo_messaging._i18n import _LW
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 
 import kafka
 from kafka.common import KafkaError
@@ -31,6 +34,10 @@ LOG = logging.getLogger(__name__)
 PURPOSE_SEND = 'send'
 PURPOSE_LISTEN = 'listen'
 
+# Seconds the driver cleanup waits for the batching producer to send or drop
+# its pending notifications
+_PRODUCER_STOP_TIMEOUT = 15
+
 kafka_opts = [
     cfg.StrOpt('kafka_default_host', default='localhost',
                help='Default Kafka broker Host'),
@@ -41,11 +48,37 @@ kafka_opts = [
     cfg.IntOpt('kafka_max_fetch_bytes', default=1024 * 1024,
                help='Max fetch bytes of Kafka consumer'),
 
+    cfg.IntOpt('kafka_max_fetch_messages', default=100,
+               help='Max number of messages returned by one poll of a Kafka '
+                    'consumer'),
+
     cfg.IntOpt('kafka_consumer_timeout', default=1.0,
                help='Default timeout(s) for Kafka consumers'),
 
     cfg.IntOpt('pool_size', default=10,
                help='Pool Size for Kafka Consumers'),
+
+    cfg.FloatOpt('producer_batch_timeout', default=0.,
+                 help='Upper bound on the delay in seconds for the batching '
+                      'of notifications per topic. 0 disables batching, '
+                      'notifications are then sent synchronously'),
+
+    cfg.IntOpt('producer_batch_size', default=16384,
+               help='Size in bytes above which a batch of notifications '
+                    'is sent without waiting for producer_batch_timeout'),
+
+    cfg.IntOpt('producer_queue_size', default=1000,
+               help='Maximum number of notifications waiting to be sent '
+                    'by the batching producer, senders are blocked above'),
+
+    cfg.FloatOpt('consumer_commit_interval', default=1.0,
+                 help='Maximum delay in seconds before the offsets of '
+                      'processed notifications are committed'),
+
+    cfg.IntOpt('consumer_commit_batch_size', default=100,
+               help='Number of processed notifications above which their '
+                    'offsets are committed without waiting for '
+                    'consumer_commit_interval'),
 ]
 
 CONF = cfg.CONF
@@ -74,6 +107,14 @@ def target_to_topic(target):
 
 class Connection(object):
 
+    # Maximum time the broker waits for messages before answering a fetch
+    # request, so that short consume timeouts are respected
+    _FETCH_WAIT_MAX_MS = 100
+
+    # Delays between two attempts to publish a message
+    _RETRY_BACKOFF_START = 0.1
+    _RETRY_BACKOFF_MAX = 10
+
     def __init__(self, conf, url, purpose):
 
         driver_conf = conf.oslo_messaging_kafka
@@ -83,15 +124,17 @@ class Connection(object):
         self.producer = None
         self.consumer = None
         self.fetch_messages_max_bytes = driver_conf.kafka_max_fetch_bytes
+        self.max_fetch_messages = driver_conf.kafka_max_fetch_messages
         self.consumer_timeout = float(driver_conf.kafka_consumer_timeout)
         self.url = url
         self._parse_url()
-        # TODO(Support for manual/auto_commit functionality)
-        # When auto_commit is False, consumer can manually notify
-        # the completion of the subscription.
-        # Currently we don't support for non auto commit option
-        self.auto_commit = True
+        # Offsets are committed by the listener once the messages have been
+        # processed, see KafkaListener.
+        self.auto_commit = False
+        self.group = None
         self._consume_loop_stopped = False
+        # Messages of the last fetch response not consumed yet
+        self._fetched = None
 
     def _parse_url(self):
         driver_conf = self.conf.oslo_messaging_kafka
@@ -120,34 +163,55 @@ class Connection(object):
         :param retry: the number of retry
         """
         message = pack_context_with_message(ctxt, msg)
-        self._ensure_connection()
         self._send_and_retry(message, topic, retry)
 
-    def _send_and_retry(self, message, topic, retry):
+    def _send_and_retry(self, messages, topic, retry, stopping=None):
+        """Send messages, retrying with a backoff.
+
+        :param stopping: event set when the sender is stopping, after which
+                         the messages are dropped on the next failure rather
+                         than retried
+        :returns: whether the messages were sent
+        """
+        if not isinstance(messages, list):
+            messages = [messages]
+        messages = [m if isinstance(m, str) else jsonutils.dumps(m)
+                    for m in messages]
         current_retry = 0
-        if not isinstance(message, str):
-            message = jsonutils.dumps(message)
-        while message is not None:
+        backoff = self._RETRY_BACKOFF_START
+        while True:
             try:
-                self._send(message, topic)
-                message = None
+                self._ensure_connection()
+                self._send(messages, topic)
+                return True
             except Exception:
                 LOG.warn(_LW("Failed to publish a message of topic %s"), topic)
                 current_retry += 1
                 if retry is not None and current_retry >= retry:
                     LOG.exception(_LE("Failed to retry to send data "
                                       "with max retry times"))
-                    message = None
-
-    def _send(self, message, topic):
-        self.producer.send_messages(topic, message)
+                    return False
+            if stopping is None:
+                time.sleep(backoff)
+            else:
+                stopping.wait(backoff)
+            if stopping is not None and stopping.is_set():
+                LOG.error(_LE("Dropped %(count)d messages of topic "
+                              "%(topic)s, the sender is stopping"),
+                          {'count': len(messages), 'topic': topic})
+                return False
+            backoff = min(backoff * 2, self._RETRY_BACKOFF_MAX)
+
+    def _send(self, messages, topic):
+        self.producer.send_messages(topic, *messages)
 
     def consume(self, timeout=None):
-        """recieve messages as many as max_fetch_messages.
+        """Wait for messages and return an iterator over them.
 
-        In this functions, there are no while loop to subscribe.
-        This would be helpful when we wants to control the velocity of
-        subscription.
+        The iterator yields at most max_fetch_messages messages, taken from
+        the fetch responses already received, so that the caller controls
+        the velocity of subscription. Raise Timeout when no message has been
+        received before the timeout.
         """
         duration = (self.consumer_timeout if timeout is None else timeout)
         timer = driver_common.DecayingTimer(duration=duration)
@@ -157,29 +221,42 @@ class Connection(object):
             LOG.debug('Timed out waiting for Kafka response')
             raise driver_common.Timeout()
 
-        poll_timeout = (self.consumer_timeout if timeout is None
-                        else min(timeout, self.consumer_timeout))
-
         while True:
             if self._consume_loop_stopped:
-                return
-            try:
-                next_timeout = poll_timeout * 1000.0
-                # TODO(use configure() method instead)
-                # Currently KafkaConsumer does not support for
-                # the case of updating only fetch_max_wait_ms parameter
-                self.consumer._config['fetch_max_wait_ms'] = next_timeout
-                messages = list(self.consumer.fetch_messages())
-            except Exception as e:
-                LOG.exception(_LE("Failed to consume messages: %s"), e)
-                messages = None
-
-            if not messages:
-                poll_timeout = timer.check_return(
-                    _raise_timeout, maximum=self.consumer_timeout)
+                return iter(())
+            message = self._next_fetched(fetch=True)
+            if message is None:
+                timer.check_return(_raise_timeout,
+                                   maximum=self.consumer_timeout)
                 continue
+            return self._iter_fetched(message)
 
-            return messages
+    def _next_fetched(self, fetch):
+        """Return the next message of the current fetch response.
+
+        :param fetch: send a new fetch request if the current response is
+                      exhausted
+        """
+        if self._fetched is None:
+            if not fetch:
+                return None
+            self._fetched = iter(self.consumer.fetch_messages())
+        try:
+            return next(self._fetched)
+        except StopIteration:
+            self._fetched = None
+        except Exception as e:
+            LOG.exception(_LE("Failed to consume messages: %s"), e)
+            self._fetched = None
+        return None
+
+    def _iter_fetched(self, message):
+        yield message
+        for __ in range(self.max_fetch_messages - 1):
+            message = self._next_fetched(fetch=False)
+            if message is None:
+                return
+            yield message
 
     def stop_consuming(self):
         self._consume_loop_stopped = True
@@ -193,6 +270,7 @@ class Connection(object):
             self.producer.stop()
         self.producer = None
         self.consumer = None
+        self._fetched = None
 
     def close(self):
         if self.kafka_client:
@@ -201,6 +279,11 @@ class Connection(object):
         if self.producer:
             self.producer.stop()
         self.consumer = None
+        self._fetched = None
+
+    def task_done(self, message):
+        """Mark a consumed message as processed."""
+        self.consumer.task_done(message)
 
     def commit(self):
         """Commit is used by subscribers belonging to the same group.
@@ -208,9 +291,11 @@ class Connection(object):
         the other subscribers which belong to the same group
         from re-subscribing the same messages.
 
-        Currently self.auto_commit option is always True,
-        so we don't need to call this function.
+        Only the offsets of the messages marked with task_done() are
+        committed. Without a group there is nothing to commit.
         """
+        if self.consumer is None or self.group is None:
+            return
         self.consumer.commit()
 
     def _ensure_connection(self):
@@ -225,63 +310,317 @@ class Connection(object):
             self.kafka_client = None
 
     def declare_topic_consumer(self, topics, group=None):
+        self.group = group
+        self._fetched = None
         self.consumer = kafka.KafkaConsumer(
             *topics, group_id=group,
             metadata_broker_list=["%s:%s" % (self.host, str(self.port))],
-            # auto_commit_enable=self.auto_commit,
+            auto_commit_enable=self.auto_commit,
+            fetch_wait_max_ms=self._FETCH_WAIT_MAX_MS,
             fetch_message_max_bytes=self.fetch_messages_max_bytes)
 
 
+class _Batch(object):
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.messages = []
+        self.size = 0
+
+
+class BatchingProducer(object):
+    """Send notifications in batches, per topic, from a background thread.
+
+    Notifications are serialized by the caller and appended to the batch of
+    their topic. A batch is sent when it reaches max_batch_bytes, or
+    linger seconds after its first notification, so that a single produce
+    request, compressed as a whole, carries many notifications. Callers are
+    blocked while max_queued notifications are waiting to be sent. Once
+    stopping, the pending batches are dropped as soon as one fails to be
+    sent, rather than retried.
+    """
+
+    def __init__(self, conn, linger, max_batch_bytes, max_queued):
+        self._conn = conn
+        self._linger = linger
+        self._max_batch_bytes = max_batch_bytes
+        self._max_queued = max_queued
+        self._cond = threading.Condition()
+        self._batches = collections.OrderedDict()
+        self._queued = 0
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def send(self, topic, message, retry):
+        message = jsonutils.dumps(message)
+        with self._cond:
+            while (self._queued >= self._max_queued and
+                   not self._stopped.is_set()):
+                self._cond.wait()
+            key = (topic, retry)
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = _Batch(time.time() + self._linger)
+                self._batches[key] = batch
+            batch.messages.append(message)
+            batch.size += len(message)
+            self._queued += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _next_batch(self):
+        """Wait for a batch to be ready and remove it from the batches."""
+        with self._cond:
+            while True:
+                now = time.time()
+                deadline = None
+                for key, batch in self._batches.items():
+                    if (self._stopped.is_set() or batch.deadline <= now or
+                            batch.size >= self._max_batch_bytes):
+                        del self._batches[key]
+                        return key, batch
+                    if deadline is None or batch.deadline < deadline:
+                        deadline = batch.deadline
+                if self._stopped.is_set():
+                    self._thread = None
+                    return None, None
+                self._cond.wait(None if deadline is None else deadline - now)
+
+    def _drop_batches(self):
+        """Drop the pending batches, with the condition held."""
+        count = sum(len(batch.messages) for batch in self._batches.values())
+        if count:
+            LOG.error(_LE("Dropped %d messages, the sender is stopping"),
+                      count)
+        self._batches.clear()
+        self._queued -= count
+
+    def _run(self):
+        try:
+            while True:
+                key, batch = self._next_batch()
+                if batch is None:
+                    return
+                topic, retry = key
+                sent = False
+                try:
+                    sent = self._conn._send_and_retry(
+                        batch.messages, topic, retry, stopping=self._stopped)
+                except Exception:
+                    LOG.exception(_LE("Failed to send a batch of %(count)d "
+                                      "messages of topic %(topic)s"),
+                                  {'count': len(batch.messages),
+                                   'topic': topic})
+                with self._cond:
+                    self._queued -= len(batch.messages)
+                    if not sent and self._stopped.is_set():
+                        self._drop_batches()
+                    self._cond.notify_all()
+        finally:
+            self._conn.close()
+
+    def stop(self, timeout=None):
+        """Send the pending batches, then stop the background thread.
+
+        The connection is closed by the thread once it has exited, or here
+        when there is no thread.
+        """
+        with self._cond:
+            self._stopped.set()
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is None:
+            self._conn.close()
+            return
+        thread.join(timeout)
+        if thread.is_alive():
+            LOG.warning(_LW("The Kafka producer is still sending after "
+                            "%s seconds, its connection is closed once "
+                            "it is done"), timeout)
+
+
 class OsloKafkaMessage(base.IncomingMessage):
 
-    def __init__(self, listener, ctxt, message):
+    def __init__(self, listener, ctxt, message, kafka_message=None):
         super(OsloKafkaMessage, self).__init__(listener, ctxt, message)
+        self.kafka_message = kafka_message
+
+    def acknowledge(self):
+        self.listener._release(self)
 
     def requeue(self):
         LOG.warn(_LW("requeue is not supported"))
+        self.listener._release(self)
 
     def reply(self, reply=None, failure=None, log_failure=True):
         LOG.warn(_LW("reply is not supported"))
 
 
 class KafkaListener(base.Listener):
+    """Hand out the consumed messages, one partition at a time.
+
+    The messages of a partition are handed out to a single poll at a time,
+    and not again before they have been acknowledged, so the executor
+    processes the partitions in parallel while the order of the messages
+    within a partition is kept. Once a message has been acknowledged, its
+    offset is committed along with the other processed ones, after
+    consumer_commit_batch_size messages or consumer_commit_interval seconds,
+    which gives at-least-once delivery.
+    """
+
+    # Maximum number of consumed messages waiting for their partition
+    _MAX_PENDING = 1000
+
+    # Delay in seconds during which the listener waits for a partition to
+    # be released before fetching more messages
+    _FETCH_AHEAD_DELAY = 0.05
 
     def __init__(self, driver, conn):
         super(KafkaListener, self).__init__(driver)
         self._stopped = threading.Event()
         self.conn = conn
-        self.incoming_queue = []
+        driver_conf = conn.conf.oslo_messaging_kafka
+        self._commit_interval = driver_conf.consumer_commit_interval
+        self._commit_batch_size = driver_conf.consumer_commit_batch_size
+        self._cond = threading.Condition()
+        # Messages waiting to be handed out, per (topic, partition)
+        self._partitions = collections.OrderedDict()
+        self._pending = 0
+        # Number of messages being processed, per (topic, partition)
+        self._in_flight = {}
+        self._acked = []
+        self._uncommitted = 0
+        self._last_commit = time.time()
+
+    def _partition_key(self, message):
+        kafka_message = message.kafka_message
+        return (kafka_message.topic, kafka_message.partition)
+
+    def _enqueue(self, messages):
+        for msg in messages:
+            message = jsonutils.loads(msg.value)
+            message = OsloKafkaMessage(
+                listener=self, ctxt=message['context'],
+                message=message['message'], kafka_message=msg)
+            key = (msg.topic, msg.partition)
+            with self._cond:
+                queue = self._partitions.get(key)
+                if queue is None:
+                    queue = self._partitions[key] = collections.deque()
+                queue.append(message)
+                self._pending += 1
+
+    def _take(self, count, taken):
+        """Take up to count messages of the partitions which are not busy.
+
+        :param taken: the partitions of the messages already taken by the
+                      current poll, which may hand out more of them
+        """
+        messages = []
+        with self._cond:
+            progress = True
+            while len(messages) < count and progress:
+                progress = False
+                for key in list(self._partitions):
+                    if key in self._in_flight and key not in taken:
+                        continue
+                    queue = self._partitions.pop(key)
+                    messages.append(queue.popleft())
+                    # Move the partition at the end, to be fair to the others
+                    if queue:
+                        self._partitions[key] = queue
+                    self._pending -= 1
+                    self._in_flight[key] = self._in_flight.get(key, 0) + 1
+                    taken.add(key)
+                    progress = True
+                    if len(messages) == count:
+                        break
+        return messages
+
+    def _release(self, message):
+        key = self._partition_key(message)
+        with self._cond:
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+            self._acked.append(message.kafka_message)
+            self._cond.notify_all()
+
+    def _wait_for_release(self, timeout, taken):
+        """Wait while all the pending messages have a busy partition.
+
+        Return True if there are too many pending messages to fetch more.
+        """
+        with self._cond:
+            if self._pending and all(
+                    key in self._in_flight and key not in taken
+                    for key in self._partitions):
+                self._cond.wait(timeout)
+            return self._pending >= self._MAX_PENDING
 
-    @base.batch_poll_helper
-    def poll(self, timeout=None):
-        while not self._stopped.is_set():
-            if self.incoming_queue:
-                return self.incoming_queue.pop(0)
+    def _commit_acked(self, force=False):
+        """Commit the offsets of the acknowledged messages.
+
+        This must be called from the thread consuming the messages.
+        """
+        with self._cond:
+            acked, self._acked = self._acked, []
+        for kafka_message in acked:
+            self.conn.task_done(kafka_message)
+        self._uncommitted += len(acked)
+        if not self._uncommitted:
+            return
+        if (force or self._uncommitted >= self._commit_batch_size or
+                time.time() - self._last_commit >= self._commit_interval):
             try:
-                messages = self.conn.consume(timeout=timeout)
-                for msg in messages:
-                    message = msg.value
-                    message = jsonutils.loads(message)
-                    self.incoming_queue.append(OsloKafkaMessage(
-                        listener=self, ctxt=message['context'],
-                        message=message['message']))
-            except driver_common.Timeout:
-                return None
+                self.conn.commit()
+            except Exception:
+                LOG.exception(_LE("Failed to commit the offsets of %d "
+                                  "messages"), self._uncommitted)
+                return
+            self._uncommitted = 0
+            self._last_commit = time.time()
+
+    def poll(self, timeout=None, prefetch_size=1):
+        incoming = []
+        taken = set()
+        with timeutils.StopWatch(duration=timeout) as w:
+            while not self._stopped.is_set():
+                self._commit_acked()
+                incoming.extend(self._take(prefetch_size - len(incoming),
+                                           taken))
+                if len(incoming) == prefetch_size or w.expired():
+                    break
+                leftover = w.leftover(return_none=True)
+                delay = self._FETCH_AHEAD_DELAY
+                if leftover is not None:
+                    delay = min(delay, leftover)
+                if self._wait_for_release(delay, taken):
+                    # Too many messages are pending, do not fetch more
+                    continue
+                with self._cond:
+                    if self._in_flight:
+                        leftover = delay
+                try:
+                    self._enqueue(self.conn.consume(timeout=leftover))
+                except driver_common.Timeout:
+                    continue
+        return incoming
 
     def stop(self):
         self._stopped.set()
         self.conn.stop_consuming()
 
     def cleanup(self):
+        self.commit()
         self.conn.close()
 
     def commit(self):
-        # TODO(Support for manually/auto commit functionality)
-        # It's better to allow users to commit manually and support for
-        # self.auto_commit = False option. For now, this commit function
-        # is meaningless since user couldn't call this function and
-        # auto_commit option is always True.
-        self.conn.commit()
+        """Commit the offsets of all the acknowledged messages."""
+        self._commit_acked(force=True)
 
 
 class KafkaDriver(base.BaseDriver):
@@ -304,11 +643,29 @@ class KafkaDriver(base.BaseDriver):
             self.conf, self.conf.oslo_messaging_kafka.pool_size,
             self._url, Connection)
         self.listeners = []
+        self._producer = None
+        self._producer_lock = threading.Lock()
 
     def cleanup(self):
         for c in self.listeners:
             c.close()
         self.listeners = []
+        if self._producer is not None:
+            self._producer.stop(timeout=_PRODUCER_STOP_TIMEOUT)
+            self._producer = None
+
+    def _get_producer(self):
+        driver_conf = self.conf.oslo_messaging_kafka
+        if driver_conf.producer_batch_timeout <= 0:
+            return None
+        with self._producer_lock:
+            if self._producer is None:
+                self._producer = BatchingProducer(
+                    Connection(self.conf, self._url, PURPOSE_SEND),
+                    driver_conf.producer_batch_timeout,
+                    driver_conf.producer_batch_size,
+                    driver_conf.producer_queue_size)
+            return self._producer
 
     def send(self, target, ctxt, message, wait_for_reply=None, timeout=None,
              retry=None):
@@ -332,6 +689,11 @@ class KafkaDriver(base.BaseDriver):
                       N means N retries
         :type retry: int
         """
+        producer = self._get_producer()
+        if producer is not None:
+            producer.send(target_to_topic(target),
+                          pack_context_with_message(ctxt, message), retry)
+            return
         with self._get_connection(purpose=PURPOSE_SEND) as conn:
             conn.notify_send(target_to_topic(target), ctxt, message, retry)
 
@@ -0,0 +1,369 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import logging
+import threading
+
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+from oslo_utils import timeutils
+
+import oslo_messaging
+from oslo_messaging._drivers import base
+from oslo_messaging._drivers import common as rpc_common
+from oslo_messaging._i18n import _LW
+
+LOG = logging.getLogger(__name__)
+
+memory_opts = [
+    cfg.BoolOpt('serialize_messages', default=True,
+                help='Encode the messages and replies in JSON, as the '
+                     'transports through a broker do. When disabled the '
+                     'listeners receive the very objects sent, which must '
+                     'not be modified afterwards by either side.'),
+    cfg.IntOpt('max_queued_notifications', default=1000, min=1,
+               help='Maximum number of notifications queued for a listener '
+                    'pool, or for a topic without listeners. Beyond it the '
+                    'oldest notifications are dropped.'),
+]
+
+# exchanges shared by the transports of the process, indexed by virtual host
+# and exchange name
+_exchanges = {}
+_exchanges_lock = threading.Lock()
+
+
+class MessageNotDelivered(oslo_messaging.MessageDeliveryFailure):
+    """Raised by a local transport when no listener took a message.
+
+    The message was not sent at all, unlike after the other delivery
+    failures, so it may be sent through another transport.
+    """
+
+
+def _get_exchange(virtual_host, name):
+    with _exchanges_lock:
+        key = (virtual_host, name)
+        exchange = _exchanges.get(key)
+        if exchange is None:
+            exchange = _exchanges[key] = MemoryExchange()
+        return exchange
+
+
+class MemoryQueue(object):
+    """Messages of a target, taken by the listeners of the target.
+
+    With a max_length, the oldest messages are dropped to put new ones in a
+    full queue.
+    """
+
+    def __init__(self, max_length=None):
+        self._messages = collections.deque()
+        self._max_length = max_length
+        # set from the first message dropped until the queue is emptied, so
+        # that a burst of drops is only logged once
+        self._dropping = False
+        self._listeners_lock = threading.Lock()
+        # replaced on change, so that put() reads it without the lock
+        self._listeners = ()
+
+    def add_listener(self, listener):
+        with self._listeners_lock:
+            self._listeners += (listener,)
+
+    def remove_listener(self, listener):
+        with self._listeners_lock:
+            self._listeners = tuple(
+                other for other in self._listeners if other is not listener)
+
+    def has_listeners(self):
+        return bool(self._listeners)
+
+    def put(self, item, first=False):
+        if first:
+            self._messages.appendleft(item)
+        else:
+            self._messages.append(item)
+            if self._max_length is not None and \
+                    len(self._messages) > self._max_length:
+                self._drop()
+        for listener in self._listeners:
+            listener.wakeup()
+
+    def _drop(self):
+        try:
+            self._messages.popleft()
+        except IndexError:
+            # taken by a listener meanwhile
+            return
+        if not self._dropping:
+            self._dropping = True
+            LOG.warning(_LW("Queue full with %d messages, dropping the "
+                            "oldest ones"), self._max_length)
+
+    def get(self):
+        try:
+            return self._messages.popleft()
+        except IndexError:
+            # taken by another listener
+            self._dropping = False
+            return None
+
+
+class MemoryExchange(object):
+    """The queues of an exchange, indexed by topic then server or pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._server_queues = {}
+        self._topic_queues = {}
+
+    def get_queue(self, topic, server=None, pool=None, max_length=None):
+        with self._lock:
+            if server:
+                queues = self._server_queues.setdefault(topic, {})
+                key = server
+            else:
+                queues = self._topic_queues.setdefault(topic, {})
+                key = pool
+            queue = queues.get(key)
+            if queue is None:
+                queue = queues[key] = MemoryQueue(max_length)
+            return queue
+
+    def get_queues(self, target, keep=None):
+        """Return the queues a message sent to target is delivered to.
+
+        A message sent to a topic without listeners is lost, unless keep is
+        set: up to keep messages are then kept in the topic queue until a
+        listener polls them.
+        """
+        with self._lock:
+            if target.fanout:
+                return list(self._server_queues.get(target.topic,
+                                                    {}).values())
+            if target.server:
+                queue = self._server_queues.get(target.topic,
+                                                {}).get(target.server)
+                return [queue] if queue is not None else []
+            queues = self._topic_queues.get(target.topic)
+            if queues is None and keep:
+                queues = self._topic_queues[target.topic] = {
+                    None: MemoryQueue(keep)}
+            return list(queues.values()) if queues else []
+
+
+class MemoryReply(object):
+    """The reply to a call, waited for by the caller."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+
+    def put(self, result):
+        self._result = result
+        self._event.set()
+
+    def wait(self, timeout):
+        if not self._event.wait(timeout):
+            return None
+        return self._result
+
+
+class MemoryIncomingMessage(base.IncomingMessage):
+
+    def __init__(self, listener, ctxt, message, queue, item):
+        super(MemoryIncomingMessage, self).__init__(listener, ctxt, message)
+        self._queue = queue
+        self._item = item
+
+    def reply(self, reply=None, failure=None, log_failure=True):
+        memory_reply = self._item[1]
+        if memory_reply is not None:
+            memory_reply.put(self.listener.driver._encode_reply(
+                reply, failure, log_failure))
+
+    def requeue(self):
+        self._queue.put(self._item, first=True)
+
+
+class MemoryListener(base.Listener):
+    """Poll the queues of the targets of a listener.
+
+    The listener marks itself as waiting before it looks at its queues, so
+    that a message put after it found them empty always wakes it up, while
+    the senders do not take the lock of a busy listener.
+    """
+
+    def __init__(self, driver, queues):
+        super(MemoryListener, self).__init__(driver)
+        self._queues = queues
+        self._cond = threading.Condition()
+        self._waiting = False
+        self._stopped = False
+        for queue in queues:
+            queue.add_listener(self)
+
+    def wakeup(self):
+        if self._waiting:
+            with self._cond:
+                self._cond.notify()
+
+    def _take(self, count, items):
+        for queue in self._queues:
+            while len(items) < count:
+                item = queue.get()
+                if item is None:
+                    break
+                items.append((queue, item))
+
+    def poll(self, timeout=None, prefetch_size=1):
+        items = []
+        with timeutils.StopWatch(duration=timeout) as watch:
+            with self._cond:
+                while not self._stopped:
+                    self._waiting = True
+                    self._take(prefetch_size, items)
+                    if len(items) >= prefetch_size or watch.expired():
+                        break
+                    self._cond.wait(watch.leftover(return_none=True))
+                self._waiting = False
+
+        return [self._incoming(queue, item) for queue, item in items]
+
+    def _incoming(self, queue, item):
+        ctxt, message = self.driver._decode(item[0])
+        return MemoryIncomingMessage(self, ctxt, message, queue, item)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def cleanup(self):
+        for queue in self._queues:
+            queue.remove_listener(self)
+
+
+class MemoryDriver(base.BaseDriver):
+    """In memory driver.
+
+    The messages are passed between the transports of a process with the same
+    virtual host, through a queue per topic and server or listener pool. It
+    has no broker to run, for single process deployments and to measure the
+    cost of the dispatchers and executors apart from any broker.
+    """
+
+    def __init__(self, conf, url, default_exchange=None,
+                 allowed_remote_exmods=None):
+
+        opt_group = cfg.OptGroup(name='oslo_messaging_memory',
+                                 title='In memory driver options')
+        conf.register_group(opt_group)
+        conf.register_opts(memory_opts, group=opt_group)
+
+        super(MemoryDriver, self).__init__(conf, url, default_exchange,
+                                           allowed_remote_exmods)
+
+        self._serialize = conf.oslo_messaging_memory.serialize_messages
+        self._max_queued_notifications = (
+            conf.oslo_messaging_memory.max_queued_notifications)
+        self._virtual_host = url.virtual_host if url is not None else None
+
+    def require_features(self, requeue=True):
+        pass
+
+    def _get_exchange(self, target):
+        return _get_exchange(self._virtual_host,
+                             target.exchange or self._default_exchange)
+
+    def has_listeners(self, target):
+        """Whether a message sent to target is delivered to a listener."""
+        return any(queue.has_listeners()
+                   for queue in self._get_exchange(target).get_queues(target))
+
+    def _encode(self, ctxt, message):
+        if self._serialize:
+            return jsonutils.dump_as_bytes({'context': ctxt,
+                                            'message': message})
+        return ctxt, message
+
+    def _decode(self, payload):
+        if self._serialize:
+            body = jsonutils.loads(payload)
+            return body['context'], body['message']
+        return payload
+
+    def _encode_reply(self, reply, failure, log_failure):
+        if not self._serialize:
+            return reply, failure[1] if failure else None
+        if failure:
+            failure = rpc_common.serialize_remote_exception(failure,
+                                                            log_failure)
+        return jsonutils.dump_as_bytes({'reply': reply, 'failure': failure})
+
+    def _decode_reply(self, result):
+        if not self._serialize:
+            reply, failure = result
+            if failure:
+                raise failure
+            return reply
+        body = jsonutils.loads(result)
+        if body['failure']:
+            raise rpc_common.deserialize_remote_exception(
+                body['failure'], self._allowed_remote_exmods)
+        return body['reply']
+
+    def _deliver(self, queues, ctxt, message, reply=None):
+        if queues:
+            item = (self._encode(ctxt, message), reply)
+            for queue in queues:
+                queue.put(item)
+
+    def send(self, target, ctxt, message, wait_for_reply=None, timeout=None,
+             retry=None):
+        # NOTE: retry is never needed, sending to a queue can not fail
+        reply = MemoryReply() if wait_for_reply else None
+        self._deliver(self._get_exchange(target).get_queues(target),
+                      ctxt, message, reply)
+        if reply is None:
+            return None
+
+        result = reply.wait(timeout)
+        if result is None:
+            raise oslo_messaging.MessagingTimeout(
+                'No reply on topic %s' % target.topic)
+        return self._decode_reply(result)
+
+    def send_notification(self, target, ctxt, message, version, retry=None):
+        self._deliver(self._get_exchange(target).get_queues(
+            target, keep=self._max_queued_notifications), ctxt, message)
+
+    def listen(self, target):
+        exchange = self._get_exchange(target)
+        queues = [exchange.get_queue(target.topic)]
+        if target.server:
+            queues.insert(0, exchange.get_queue(target.topic,
+                                                server=target.server))
+        return MemoryListener(self, queues)
+
+    def listen_for_notifications(self, targets_and_priorities, pool):
+        queues = [
+            self._get_exchange(target).get_queue(
+                '%s.%s' % (target.topic, priority), pool=pool,
+                max_length=self._max_queued_notifications)
+            for target, priority in targets_and_priorities]
+        return MemoryListener(self, queues)
+
+    def cleanup(self):
+        pass
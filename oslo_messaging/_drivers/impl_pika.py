@@ -46,7 +46,13 @@ pika_opts = [
                       "socket"),
     cfg.FloatOpt('host_connection_reconnect_delay', default=0.25,
                  help="Set delay for reconnection to some host which has "
-                      "connection error")
+                      "connection error"),
+    cfg.BoolOpt('nested_message_context', default=False,
+                help="Send the context of the messages in a field of its own "
+                     "(message format 1.1) instead of merging it into the "
+                     "message (message format 1.0). Enable only once all the "
+                     "services receiving the messages can read the format "
+                     "1.1.")
 ]
 
 pika_pool_opts = [
@@ -105,6 +111,11 @@ rpc_opts = [
              "to rpc reply listener. Works only if rpc_reply_listener_ack == "
              "True"
     ),
+    cfg.IntOpt(
+        'rpc_reply_listener_consumers', default=1,
+        help="Number of consumers of the RPC reply queue, each one with its "
+             "own connection and thread dispatching the replies"
+    ),
     cfg.IntOpt(
         'rpc_reply_retry_attempts', default=-1,
         help="Reconnecting retry count in case of connectivity problem during "
@@ -149,6 +160,8 @@ class PikaDriver(object):
         self._reply_listener = pika_drv_lstnr.RpcReplyPikaListener(
             self._pika_engine
         )
+        # set up the reply queue now, not during the first RPC call
+        self._reply_listener.start()
 
     def require_features(self, requeue=False):
         pass
@@ -0,0 +1,586 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Transport between the processes of a host through Unix domain sockets.
+
+There is no broker: each listener binds a socket named by a unique id in the
+socket directory, and registers its targets as empty files named by the same
+id in the directory tree:
+
+    <socket_dir>/<virtual host>/targets/<exchange>/<topic>/<key>/<id>
+
+where key is 'server:<server>' for the RPC listeners and 'pool:<pool>' for
+the notification listeners.  A message is sent to one of the listeners of its
+target, round robin, or to all the servers of the topic for a fanout.  The
+senders keep a connection to each listener they sent to, on which the replies
+to the calls come back.
+
+Every frame is a JSON object preceded by its length, a 4 bytes big endian
+unsigned integer.  A request holds the context and the message, and the
+message id of a call; a reply holds the message id of the call, the reply and
+the serialized failure.  A connection sending a frame above max_frame_size is
+dropped.
+
+The directories and sockets are only accessible to the user of the process,
+or to the members of socket_group too when set, and the listeners refuse the
+connections of the other users.
+"""
+
+import collections
+import errno
+import grp
+import itertools
+import logging
+import os
+import pwd
+import socket
+import struct
+import sys
+import threading
+
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+from six.moves.urllib import parse
+
+import oslo_messaging
+from oslo_messaging._drivers import base
+from oslo_messaging._drivers import common as rpc_common
+from oslo_messaging._drivers import impl_memory
+from oslo_messaging._i18n import _LE, _LW
+from oslo_messaging import _utils as utils
+
+LOG = logging.getLogger(__name__)
+
+unix_opts = [
+    cfg.StrOpt('socket_dir', default='/var/run/openstack/oslo-messaging',
+               help='Directory of the sockets of the listeners and of the '
+                    'registrations of their targets. The virtual host of '
+                    'the transport URL is a subdirectory of it.'),
+    cfg.StrOpt('socket_group',
+               help='Group whose members may send messages to the listeners '
+                    'too, the directories and sockets being created '
+                    'accessible to it. By default only the user of the '
+                    'process and root may.'),
+    cfg.IntOpt('max_frame_size', default=64 * 1024 * 1024, min=1,
+               help='Maximum size in bytes of a request or reply, the '
+                    'connection of a peer sending a larger one is dropped.'),
+]
+
+_HEADER = struct.Struct('!I')
+
+# credentials of the peer of a Unix domain socket: pid, uid and gid
+_PEERCRED = struct.Struct('3i')
+_SO_PEERCRED = getattr(socket, 'SO_PEERCRED',
+                       17 if sys.platform.startswith('linux') else None)
+
+# put to the replies waited for on a connection closed before they came
+_CONNECTION_LOST = object()
+
+
+def _quote(name):
+    # '%00' is never the quoting of a name, it stands for no name
+    return parse.quote(name, safe='') if name else '%00'
+
+
+def _makedirs(path, mode, gid=None):
+    """Create a directory and its missing parents with mode and group."""
+    if os.path.isdir(path):
+        return
+    parent = os.path.dirname(path)
+    if parent != path:
+        _makedirs(parent, mode, gid)
+    try:
+        os.mkdir(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+        return
+    if gid is not None:
+        os.chown(path, -1, gid)
+    # not restricted by the umask, unlike the mode of mkdir
+    os.chmod(path, mode)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _listdir(path):
+    try:
+        return sorted(os.listdir(path))
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return []
+
+
+def _encode_frame(body):
+    data = jsonutils.dump_as_bytes(body)
+    return _HEADER.pack(len(data)) + data
+
+
+def _read_frame(stream, max_size):
+    """Read a frame from a file object, return None at the end of file.
+
+    Raise ValueError for a frame above max_size bytes.
+    """
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    size = _HEADER.unpack(header)[0]
+    if size > max_size:
+        raise ValueError('Frame of %d bytes above the maximum of %d'
+                         % (size, max_size))
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    return data
+
+
+class UnixConnection(object):
+    """Connection of a sender to a listener, on which the replies come.
+
+    The replies are dispatched to the calls waiting for them by message id,
+    the replies being tracked without a lock.
+    """
+
+    def __init__(self, driver, listener_id, sock):
+        self._driver = driver
+        self._listener_id = listener_id
+        self._sock = sock
+        self._lock = threading.Lock()
+        self._replies = {}
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_replies)
+        self._reader.daemon = True
+        self._reader.start()
+
+    def send(self, frame, msg_id=None, reply=None):
+        """Send a request frame, return False if the connection is lost."""
+        if msg_id is not None:
+            self._replies[msg_id] = reply
+        try:
+            with self._lock:
+                self._sock.sendall(frame)
+        except socket.error as e:
+            LOG.debug("Lost connection to listener %(id)s: %(error)s",
+                      {'id': self._listener_id, 'error': e})
+            self.untrack(msg_id)
+            self.close()
+            return False
+        return True
+
+    def untrack(self, msg_id):
+        self._replies.pop(msg_id, None)
+
+    def _read_replies(self):
+        stream = self._sock.makefile('rb')
+        try:
+            while True:
+                data = _read_frame(stream, self._driver._max_frame_size)
+                if data is None:
+                    break
+                body = jsonutils.loads(data)
+                reply = self._replies.pop(body['msg_id'], None)
+                if reply is not None:
+                    reply.put(body)
+                else:
+                    LOG.warning(_LW("Received timed out reply: %s"),
+                                body['msg_id'])
+        except (socket.error, ValueError) as e:
+            if not self._closed:
+                LOG.error(_LE("Failed to receive the replies of listener "
+                              "%(id)s: %(error)s"),
+                          {'id': self._listener_id, 'error': e})
+        finally:
+            stream.close()
+            self.close()
+            for msg_id in list(self._replies):
+                reply = self._replies.pop(msg_id, None)
+                if reply is not None:
+                    reply.put(_CONNECTION_LOST)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._driver._forget_connection(self._listener_id, self)
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            self._sock.close()
+
+
+class UnixReplyTo(object):
+    """Send the reply to a call on the connection it came from."""
+
+    def __init__(self, connection, msg_id):
+        self._connection = connection
+        self._msg_id = msg_id
+
+    def put(self, body):
+        body['msg_id'] = self._msg_id
+        self._connection.send_reply(_encode_frame(body))
+
+
+class UnixListenerConnection(object):
+    """Connection of a sender to a listener, on which the requests come."""
+
+    def __init__(self, listener, sock):
+        self._listener = listener
+        self._sock = sock
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_requests)
+        self._reader.daemon = True
+        self._reader.start()
+
+    def send_reply(self, frame):
+        try:
+            with self._lock:
+                self._sock.sendall(frame)
+        except socket.error as e:
+            LOG.warning(_LW("Failed to send a reply: %s"), e)
+
+    def _read_requests(self):
+        stream = self._sock.makefile('rb')
+        try:
+            while True:
+                data = _read_frame(stream,
+                                   self._listener.driver._max_frame_size)
+                if data is None:
+                    break
+                self._listener.put_request(self, data)
+        except socket.error as e:
+            LOG.debug("Lost connection to a sender: %s", e)
+        except ValueError as e:
+            LOG.error(_LE("Dropping the connection of a sender after a "
+                          "malformed request: %s"), e)
+        finally:
+            stream.close()
+            self.close()
+            self._listener.forget_connection(self)
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._sock.close()
+
+
+class UnixListener(impl_memory.MemoryListener):
+    """Accept the connections of the senders, and queue their requests.
+
+    The requests are queued in memory as by the listeners of the memory
+    driver, with the connection to reply on for the calls.
+    """
+
+    def __init__(self, driver, markers):
+        self._queue = impl_memory.MemoryQueue()
+        super(UnixListener, self).__init__(driver, [self._queue])
+        self._id = utils.generate_id()
+        self._path = driver._socket_path(self._id)
+        self._markers = [os.path.join(marker, self._id) for marker in markers]
+        self._connections = set()
+        self._closing = False
+
+        driver._makedirs(os.path.dirname(self._path))
+        _remove(self._path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self._path)
+        driver._restrict(self._path, 0o600)
+        self._sock.listen(socket.SOMAXCONN)
+        # registered once the socket accepts connections, so that a refused
+        # connection means a dead listener
+        for marker in self._markers:
+            driver._makedirs(os.path.dirname(marker))
+            open(marker, 'w').close()
+
+        self._acceptor = threading.Thread(target=self._accept)
+        self._acceptor.daemon = True
+        self._acceptor.start()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _address = self._sock.accept()
+            except socket.error as e:
+                if not self._closing:
+                    LOG.error(_LE("Failed to accept a connection: %s"), e)
+                return
+            if self._closing:
+                sock.close()
+                return
+            if not self.driver._peer_allowed(sock):
+                sock.close()
+                continue
+            self._connections.add(UnixListenerConnection(self, sock))
+
+    def put_request(self, connection, data):
+        body = jsonutils.loads(data)
+        msg_id = body.get('msg_id')
+        reply_to = UnixReplyTo(connection, msg_id) if msg_id else None
+        self._queue.put(((body['context'], body['message']), reply_to))
+
+    def forget_connection(self, connection):
+        self._connections.discard(connection)
+
+    def cleanup(self):
+        for marker in self._markers:
+            _remove(marker)
+        self._closing = True
+        # wake the acceptor up
+        try:
+            waker = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            waker.connect(self._path)
+            waker.close()
+        except socket.error:
+            pass
+        self._acceptor.join()
+        self._sock.close()
+        _remove(self._path)
+        for connection in list(self._connections):
+            connection.close()
+        super(UnixListener, self).cleanup()
+
+
+class UnixDriver(base.BaseDriver):
+    """Unix domain sockets driver, for the processes of a single host.
+
+    See the description of the module for the naming of the sockets and the
+    frames sent on them.  No queue keeps the messages: sending a message to
+    a target without any listener alive raises MessageNotDelivered, while
+    the fanouts, and the notifications of a topic without any pool listener
+    alive, are silently lost.
+    """
+
+    def __init__(self, conf, url, default_exchange=None,
+                 allowed_remote_exmods=None):
+
+        opt_group = cfg.OptGroup(name='oslo_messaging_unix',
+                                 title='Unix domain sockets driver options')
+        conf.register_group(opt_group)
+        conf.register_opts(unix_opts, group=opt_group)
+
+        super(UnixDriver, self).__init__(conf, url, default_exchange,
+                                         allowed_remote_exmods)
+
+        driver_conf = conf.oslo_messaging_unix
+        self._root = driver_conf.socket_dir
+        if url is not None and url.virtual_host:
+            self._root = os.path.join(self._root, _quote(url.virtual_host))
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        self._counters = collections.defaultdict(itertools.count)
+        self._max_frame_size = driver_conf.max_frame_size
+        self._group = None
+        if driver_conf.socket_group:
+            self._group = grp.getgrnam(driver_conf.socket_group)
+
+    def require_features(self, requeue=True):
+        pass
+
+    def _makedirs(self, path):
+        if self._group is None:
+            _makedirs(path, 0o700)
+        else:
+            # the files created in the directories get their group
+            _makedirs(path, 0o2770, self._group.gr_gid)
+
+    def _restrict(self, path, mode):
+        """Make a file accessible to the user, and to the group if any."""
+        if self._group is not None:
+            os.chown(path, -1, self._group.gr_gid)
+            mode |= (mode & 0o700) >> 3
+        os.chmod(path, mode)
+
+    def _peer_allowed(self, sock):
+        """Whether the peer of a connection may send messages."""
+        if _SO_PEERCRED is None:
+            # only the permissions of the directories and sockets apply
+            return True
+        _pid, uid, gid = _PEERCRED.unpack(
+            sock.getsockopt(socket.SOL_SOCKET, _SO_PEERCRED, _PEERCRED.size))
+        if uid in (0, os.getuid()):
+            return True
+        if self._group is not None:
+            if gid == self._group.gr_gid:
+                return True
+            try:
+                if pwd.getpwuid(uid).pw_name in self._group.gr_mem:
+                    return True
+            except KeyError:
+                pass
+        LOG.warning(_LW("Refused the connection of user %d"), uid)
+        return False
+
+    def _socket_path(self, listener_id):
+        return os.path.join(self._root, listener_id)
+
+    def _topic_dir(self, exchange, topic):
+        return os.path.join(self._root, 'targets',
+                            _quote(exchange or self._default_exchange),
+                            _quote(topic))
+
+    def _markers(self, topic_dir, prefix, key=None):
+        """Return the markers of the listeners of a topic."""
+        if key is not None:
+            keys = [prefix + _quote(key)]
+        else:
+            keys = [k for k in _listdir(topic_dir) if k.startswith(prefix)]
+        return [marker for k in keys
+                for marker in self._key_markers(topic_dir, k)]
+
+    @staticmethod
+    def _key_markers(topic_dir, key):
+        """Return the markers of the listeners of a server or pool."""
+        key_dir = os.path.join(topic_dir, key)
+        return [os.path.join(key_dir, listener_id)
+                for listener_id in _listdir(key_dir)]
+
+    def has_listeners(self, target):
+        """Whether a listener of the host is registered for target."""
+        return bool(self._markers(
+            self._topic_dir(target.exchange, target.topic), 'server:',
+            target.server))
+
+    def _get_connection(self, marker):
+        listener_id = os.path.basename(marker)
+        connection = self._connections.get(listener_id)
+        if connection is not None:
+            return connection
+        with self._connections_lock:
+            connection = self._connections.get(listener_id)
+            if connection is not None:
+                return connection
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self._socket_path(listener_id))
+            except socket.error as e:
+                sock.close()
+                if e.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+                    raise
+                # the listener is dead
+                LOG.debug("Removing dead listener %s", marker)
+                _remove(marker)
+                if e.errno == errno.ECONNREFUSED:
+                    _remove(self._socket_path(listener_id))
+                return None
+            connection = self._connections[listener_id] = UnixConnection(
+                self, listener_id, sock)
+            return connection
+
+    def _forget_connection(self, listener_id, connection):
+        with self._connections_lock:
+            if self._connections.get(listener_id) is connection:
+                del self._connections[listener_id]
+
+    def _send_to_one(self, markers, frame, msg_id=None, reply=None):
+        """Send a frame to one of the listeners, round robin.
+
+        Return the connection it was sent on, None if no listener is alive.
+        """
+        if not markers:
+            return None
+        start = next(self._counters[os.path.dirname(markers[0])])
+        for i in range(len(markers)):
+            marker = markers[(start + i) % len(markers)]
+            connection = self._get_connection(marker)
+            if connection is not None and connection.send(frame, msg_id,
+                                                          reply):
+                return connection
+        return None
+
+    # the listeners use the methods of the memory driver to decode the
+    # requests they queued, already decoded by their connections, and to
+    # encode their replies
+
+    def _decode(self, payload):
+        return payload
+
+    def _encode_reply(self, reply, failure, log_failure):
+        if failure:
+            failure = rpc_common.serialize_remote_exception(failure,
+                                                            log_failure)
+        return {'reply': reply, 'failure': failure}
+
+    def send(self, target, ctxt, message, wait_for_reply=None, timeout=None,
+             retry=None):
+        topic_dir = self._topic_dir(target.exchange, target.topic)
+        body = {'context': ctxt, 'message': message}
+
+        if target.fanout:
+            frame = _encode_frame(body)
+            for marker in self._markers(topic_dir, 'server:'):
+                connection = self._get_connection(marker)
+                if connection is not None:
+                    connection.send(frame)
+            return None
+
+        markers = self._markers(topic_dir, 'server:', target.server)
+        if not wait_for_reply:
+            if self._send_to_one(markers, _encode_frame(body)) is None:
+                raise impl_memory.MessageNotDelivered(
+                    'No listener on topic %s' % target.topic)
+            return None
+
+        msg_id = body['msg_id'] = utils.generate_id()
+        reply = impl_memory.MemoryReply()
+        connection = self._send_to_one(markers, _encode_frame(body),
+                                       msg_id, reply)
+        if connection is None:
+            raise impl_memory.MessageNotDelivered(
+                'No listener on topic %s' % target.topic)
+        try:
+            result = reply.wait(timeout)
+        finally:
+            connection.untrack(msg_id)
+        if result is None:
+            raise oslo_messaging.MessagingTimeout(
+                'No reply on topic %s' % target.topic)
+        if result is _CONNECTION_LOST:
+            raise oslo_messaging.MessageDeliveryFailure(
+                'Connection lost waiting for the reply on topic %s'
+                % target.topic)
+        if result['failure']:
+            raise rpc_common.deserialize_remote_exception(
+                result['failure'], self._allowed_remote_exmods)
+        return result['reply']
+
+    def send_notification(self, target, ctxt, message, version, retry=None):
+        topic_dir = self._topic_dir(target.exchange, target.topic)
+        frame = _encode_frame({'context': ctxt, 'message': message})
+        for key in _listdir(topic_dir):
+            if key.startswith('pool:'):
+                self._send_to_one(self._key_markers(topic_dir, key), frame)
+
+    def listen(self, target):
+        topic_dir = self._topic_dir(target.exchange, target.topic)
+        return UnixListener(self, [
+            os.path.join(topic_dir, 'server:' + _quote(target.server))])
+
+    def listen_for_notifications(self, targets_and_priorities, pool):
+        return UnixListener(self, [
+            os.path.join(self._topic_dir(target.exchange,
+                                         '%s.%s' % (target.topic, priority)),
+                         'pool:' + _quote(pool))
+            for target, priority in targets_and_priorities])
+
+    def cleanup(self):
+        with self._connections_lock:
+            connections = list(self._connections.values())
+        for connection in connections:
+            connection.close()
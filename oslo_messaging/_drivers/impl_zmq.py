@@ -18,11 +18,11 @@ import socket
 import threading
 
 from oslo_config import cfg
-from stevedore import driver
 
 from oslo_messaging._drivers import base
 from oslo_messaging._drivers import common as rpc_common
 from oslo_messaging._drivers.zmq_driver.client import zmq_client
+from oslo_messaging._drivers.zmq_driver.matchmaker import matchmaker_cache
 from oslo_messaging._drivers.zmq_driver.server import zmq_server
 from oslo_messaging._drivers.zmq_driver import zmq_async
 from oslo_messaging._executors import impl_pooledexecutor
@@ -42,9 +42,24 @@ zmq_opts = [
     cfg.StrOpt('rpc_zmq_matchmaker', default='redis',
                help='MatchMaker driver.'),
 
+    cfg.IntOpt('rpc_zmq_matchmaker_cache_ttl', default=30, min=0,
+               help='Number of seconds the hosts of a target are cached '
+                    'after a matchmaker lookup. Updates published by the '
+                    'matchmaker invalidate the cache earlier. 0 disables '
+                    'the cache.'),
+
+    cfg.IntOpt('rpc_zmq_matchmaker_negative_ttl', default=1, min=0,
+               help='Number of seconds a target without any host is cached '
+                    'after a matchmaker lookup.'),
+
     cfg.StrOpt('rpc_zmq_concurrency', default='eventlet',
                help='Type of concurrency used. Either "native" or "eventlet"'),
 
+    cfg.StrOpt('rpc_zmq_serialization', default='json',
+               choices=['json', 'msgpack'],
+               help='Default serialization mechanism for '
+                    'serializing/deserializing outgoing/incoming messages'),
+
     cfg.IntOpt('rpc_zmq_contexts', default=1,
                help='Number of ZeroMQ contexts, defaults to 1.'),
 
@@ -72,6 +87,32 @@ zmq_opts = [
                 help='Configures zmq-messaging to use proxy with '
                      'non PUB/SUB patterns.'),
 
+    cfg.IntOpt('rpc_zmq_target_sockets', default=1024, min=1,
+               help='Maximum number of sockets connected to the hosts of '
+                    'targets kept by each publisher. The least recently '
+                    'used sockets are closed first.'),
+
+    cfg.IntOpt('rpc_zmq_target_socket_idle_timeout', default=600, min=0,
+               help='Number of seconds after which the unused socket of a '
+                    'target is closed. 0 keeps the sockets until there are '
+                    'too many of them.'),
+
+    cfg.IntOpt('rpc_zmq_target_hosts_interval', default=10, min=0,
+               help='Number of seconds between two matchmaker lookups of '
+                    'the hosts of a target by a publisher. The socket of the '
+                    'target then connects to the new hosts and disconnects '
+                    'from the gone ones.'),
+
+    cfg.IntOpt('rpc_zmq_broker_threads', default=1, min=1,
+               help='Number of threads of zmq-broker routing the requests. '
+                    'With more than one thread the broker address is shared '
+                    'by a queue device load balancing between the threads.'),
+
+    cfg.BoolOpt('rpc_zmq_native_reply_thread', default=False,
+                help='Send the calls and receive their replies in a native '
+                     'thread, even when eventlet is used. The replies are '
+                     'then received while the green threads are busy.'),
+
     cfg.BoolOpt('use_pub_sub', default=True,
                 help='Use PUB/SUB pattern for fanout methods. '
                      'PUB/SUB always uses proxy.'),
@@ -165,10 +206,7 @@ class ZmqDriver(base.BaseDriver):
         self.conf = conf
         self.allowed_remote_exmods = allowed_remote_exmods
 
-        self.matchmaker = driver.DriverManager(
-            'oslo.messaging.zmq.matchmaker',
-            self.conf.rpc_zmq_matchmaker,
-        ).driver(self.conf)
+        self.matchmaker = matchmaker_cache.get_matchmaker(self.conf)
 
         self.server = LazyDriverItem(
             zmq_server.ZmqServer, self, self.conf, self.matchmaker)
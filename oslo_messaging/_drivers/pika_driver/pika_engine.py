@@ -123,6 +123,14 @@ class PikaEngine(object):
             conf.oslo_messaging_pika.rpc_listener_prefetch_count
         )
 
+        self.rpc_reply_listener_consumers = (
+            conf.oslo_messaging_pika.rpc_reply_listener_consumers
+        )
+        if (self.rpc_reply_listener_consumers is None or
+                self.rpc_reply_listener_consumers < 1):
+            raise ValueError("rpc_reply_listener_consumers should be positive "
+                             "integer")
+
         self.rpc_reply_retry_attempts = (
             conf.oslo_messaging_pika.rpc_reply_retry_attempts
         )
@@ -151,6 +159,10 @@ class PikaEngine(object):
             conf.oslo_messaging_pika.notification_persistence
         )
 
+        self.nested_message_context = (
+            conf.oslo_messaging_pika.nested_message_context
+        )
+
         self.default_rpc_retry_attempts = (
             conf.oslo_messaging_pika.default_rpc_retry_attempts
         )
@@ -21,88 +21,127 @@ from oslo_log import log as logging
 
 from oslo_messaging._drivers.pika_driver import pika_exceptions as pika_drv_exc
 from oslo_messaging._drivers.pika_driver import pika_poller as pika_drv_poller
+from oslo_messaging import exceptions
 
 LOG = logging.getLogger(__name__)
 
 
 class RpcReplyPikaListener(object):
     """Provide functionality for listening RPC replies. Create and handle
-    reply poller and coroutine for performing polling job
+    reply pollers and threads for performing polling job
+
+    Several pollers consume the reply queue, each one from its own thread, so
+    replies are dispatched in parallel to the futures of the waiters,
+    matched by correlation id.
     """
 
     def __init__(self, pika_engine):
         self._pika_engine = pika_engine
 
-        # preparing poller for listening replies
-        self._reply_queue = None
+        # reply queue name, shared for whole process
+        self._reply_queue = "reply.{}.{}.{}".format(
+            self._pika_engine.conf.project,
+            self._pika_engine.conf.prog, uuid.uuid4().hex
+        )
 
-        self._reply_poller = None
+        self._reply_pollers = []
+        self._poller_threads = []
+        # msg_id -> (future, registration time)
         self._reply_waiting_futures = {}
 
-        self._reply_consumer_initialized = False
+        self._reply_consumer_initialized = threading.Event()
         self._reply_consumer_initialization_lock = threading.Lock()
-        self._poller_thread = None
-
-    def get_reply_qname(self, expiration_time=None):
-        """As result return reply queue name, shared for whole process,
-        but before this check is RPC listener initialized or not and perform
-        initialization if needed
-
-        :param expiration_time: Float, expiration time in seconds
-            (like time.time()),
-        :return: String, queue name which hould be used for reply sending
+        self._initialization_thread = None
+        self._stopped = threading.Event()
+
+        self._stats_lock = threading.Lock()
+        self._replies = 0
+        self._timeouts = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def start(self):
+        """Start the initialization of the reply consumers in background, if
+        it is not started yet. The reply queue is then ready before the first
+        RPC call
         """
-        if self._reply_consumer_initialized:
-            return self._reply_queue
-
         with self._reply_consumer_initialization_lock:
-            if self._reply_consumer_initialized:
-                return self._reply_queue
-
-            # generate reply queue name if needed
-            if self._reply_queue is None:
-                self._reply_queue = "reply.{}.{}.{}".format(
-                    self._pika_engine.conf.project,
-                    self._pika_engine.conf.prog, uuid.uuid4().hex
-                )
-
-            # initialize reply poller if needed
-            if self._reply_poller is None:
-                self._reply_poller = pika_drv_poller.RpcReplyPikaPoller(
-                    pika_engine=self._pika_engine,
-                    exchange=self._pika_engine.rpc_reply_exchange,
-                    queue=self._reply_queue,
-                    prefetch_count=(
-                        self._pika_engine.rpc_reply_listener_prefetch_count
+            if (self._reply_consumer_initialized.is_set() or
+                    (self._initialization_thread is not None and
+                     self._initialization_thread.is_alive())):
+                return
+            self._stopped.clear()
+            self._initialization_thread = threading.Thread(
+                target=self._initialize
+            )
+            self._initialization_thread.daemon = True
+            self._initialization_thread.start()
+
+    def _initialize(self):
+        """Connect the reply pollers and start their threads, retry until it
+        succeeds or the listener is cleaned up
+        """
+        while not self._stopped.is_set():
+            try:
+                while (len(self._reply_pollers) <
+                       self._pika_engine.rpc_reply_listener_consumers):
+                    poller = pika_drv_poller.RpcReplyPikaPoller(
+                        pika_engine=self._pika_engine,
+                        exchange=self._pika_engine.rpc_reply_exchange,
+                        queue=self._reply_queue,
+                        prefetch_count=(
+                            self._pika_engine.rpc_reply_listener_prefetch_count
+                        )
                     )
+                    poller.start()
+                    self._reply_pollers.append(poller)
+
+                    thread = threading.Thread(target=self._poller,
+                                              args=(poller,))
+                    thread.daemon = True
+                    thread.start()
+                    self._poller_threads.append(thread)
+
+                self._reply_consumer_initialized.set()
+                return
+            except Exception:
+                LOG.exception("Problem during initialization of reply "
+                              "consumers")
+                self._stopped.wait(
+                    self._pika_engine.host_connection_reconnect_delay
                 )
 
-                self._reply_poller.start(timeout=expiration_time - time.time())
-
-            # start reply poller job thread if needed
-            if self._poller_thread is None:
-                self._poller_thread = threading.Thread(target=self._poller)
-                self._poller_thread.daemon = True
-
-            if not self._poller_thread.is_alive():
-                self._poller_thread.start()
+    def get_reply_qname(self, timeout=None):
+        """As result return reply queue name, shared for whole process,
+        but before this check is RPC listener initialized or not and wait for
+        the initialization if needed
 
-            self._reply_consumer_initialized = True
+        :param timeout: Float, seconds to wait for the initialization, None
+            means wait forever
+        :return: String, queue name which hould be used for reply sending
+        """
+        if not self._reply_consumer_initialized.is_set():
+            self.start()
+            if not self._reply_consumer_initialized.wait(timeout):
+                raise exceptions.MessagingTimeout(
+                    "Timed out waiting for RPC reply consumers "
+                    "initialization"
+                )
 
         return self._reply_queue
 
-    def _poller(self):
+    def _poller(self, poller):
         """Reply polling job. Poll replies in infinite loop and notify
         registered features
         """
-        while self._reply_poller:
+        while not self._stopped.is_set():
             try:
                 try:
-                    messages = self._reply_poller.poll()
+                    messages = poller.poll()
                 except pika_drv_exc.EstablishConnectionException:
                     LOG.exception("Problem during establishing connection for "
                                   "reply polling")
-                    time.sleep(
+                    self._stopped.wait(
                         self._pika_engine.host_connection_reconnect_delay
                     )
                     continue
@@ -110,10 +149,12 @@ class RpcReplyPikaListener(object):
                 for message in messages:
                     try:
                         message.acknowledge()
-                        future = self._reply_waiting_futures.pop(
+                        waiter = self._reply_waiting_futures.pop(
                             message.msg_id, None
                         )
-                        if future is not None:
+                        if waiter is not None:
+                            future, registered = waiter
+                            self._record_latency(time.time() - registered)
                             future.set_result(message)
                     except Exception:
                         LOG.exception("Unexpected exception during processing"
@@ -121,6 +162,12 @@ class RpcReplyPikaListener(object):
             except BaseException:
                 LOG.exception("Unexpected exception during reply polling")
 
+    def _record_latency(self, latency):
+        with self._stats_lock:
+            self._replies += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
     def register_reply_waiter(self, msg_id):
         """Register reply waiter. Should be called before message sending to
         the server
@@ -129,7 +176,7 @@ class RpcReplyPikaListener(object):
             over
         """
         future = futures.Future()
-        self._reply_waiting_futures[msg_id] = future
+        self._reply_waiting_futures[msg_id] = (future, time.time())
         return future
 
     def unregister_reply_waiter(self, msg_id):
@@ -138,18 +185,45 @@ class RpcReplyPikaListener(object):
         example)
         :param msg_id:
         """
-        self._reply_waiting_futures.pop(msg_id, None)
+        if self._reply_waiting_futures.pop(msg_id, None) is not None:
+            with self._stats_lock:
+                self._timeouts += 1
+
+    def stats(self):
+        """Return statistics about the reply waiters
+
+        :return: Dictionary, count of waiters waiting for their reply, count
+            of received replies and of waiters unregistered without reply,
+            average and maximum latency in seconds between the registration of
+            a waiter and the reception of its reply
+        """
+        with self._stats_lock:
+            return {
+                'waiting': len(self._reply_waiting_futures),
+                'replies': self._replies,
+                'unregistered': self._timeouts,
+                'latency_avg': (self._total_latency / self._replies
+                                if self._replies else 0.0),
+                'latency_max': self._max_latency,
+            }
 
     def cleanup(self):
         """Stop replies consuming and cleanup resources"""
-        if self._reply_poller:
-            self._reply_poller.stop()
-            self._reply_poller.cleanup()
-            self._reply_poller = None
+        self._stopped.set()
+
+        with self._reply_consumer_initialization_lock:
+            if self._initialization_thread is not None:
+                self._initialization_thread.join()
+                self._initialization_thread = None
+
+        for poller in self._reply_pollers:
+            poller.stop()
+            poller.cleanup()
 
-        if self._poller_thread:
-            if self._poller_thread.is_alive():
-                self._poller_thread.join()
-            self._poller_thread = None
+        for thread in self._poller_threads:
+            if thread.is_alive():
+                thread.join()
 
-        self._reply_queue = None
+        self._reply_pollers = []
+        self._poller_threads = []
+        self._reply_consumer_initialized.clear()
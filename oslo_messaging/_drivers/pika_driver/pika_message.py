@@ -16,7 +16,6 @@
 import socket
 import time
 import traceback
-import uuid
 
 from concurrent import futures
 from oslo_log import log as logging
@@ -38,7 +37,19 @@ from oslo_messaging import exceptions
 LOG = logging.getLogger(__name__)
 
 _VERSION_HEADER = "version"
-_VERSION = "1.0"
+_VERSION = "1.1"
+
+# Up to this version the context keys were merged into the message with a
+# '_$_' prefix, they are now sent in a single nested field
+_LEGACY_VERSION = "1.0"
+_MESSAGE_FIELD = "m"
+_CONTEXT_FIELD = "c"
+
+# Headers are the same for all the messages, pika does not modify them.
+# The receivers older than the format 1.1 accept its messages but can not
+# read them, so it is only sent when the nested_message_context option is set
+_HEADERS = {_VERSION_HEADER: _VERSION}
+_LEGACY_HEADERS = {_VERSION_HEADER: _LEGACY_VERSION}
 
 
 class RemoteExceptionMixin(object):
@@ -86,7 +97,7 @@ class PikaIncomingMessage(object):
         """
         headers = getattr(properties, "headers", {})
         version = headers.get(_VERSION_HEADER, None)
-        if not utils.version_is_compatible(version, _VERSION):
+        if not utils.version_is_compatible(_VERSION, version):
             raise pika_drv_exc.UnsupportedDriverVersion(
                 "Message's version: {} is not compatible with driver version: "
                 "{}".format(version, _VERSION))
@@ -116,15 +127,19 @@ class PikaIncomingMessage(object):
 
         message_dict = jsonutils.loads(body, encoding=self._content_encoding)
 
-        context_dict = {}
+        if utils.version_is_compatible(_LEGACY_VERSION, version):
+            context_dict = {}
 
-        for key in list(message_dict.keys()):
-            key = six.text_type(key)
-            if key.startswith('_$_'):
-                value = message_dict.pop(key)
-                context_dict[key[3:]] = value
-        self.message = message_dict
-        self.ctxt = context_dict
+            for key in list(message_dict.keys()):
+                key = six.text_type(key)
+                if key.startswith('_$_'):
+                    value = message_dict.pop(key)
+                    context_dict[key[3:]] = value
+            self.message = message_dict
+            self.ctxt = context_dict
+        else:
+            self.message = message_dict.get(_MESSAGE_FIELD, {})
+            self.ctxt = message_dict.get(_CONTEXT_FIELD) or {}
 
     def need_ack(self):
         return self._channel is not None
@@ -322,23 +337,33 @@ class PikaOutgoingMessage(object):
         self.message = message
         self.context = context
 
-        self.unique_id = uuid.uuid4().hex
+        self.unique_id = utils.generate_id()
 
     def _prepare_message_to_send(self):
-        """Combine user's message fields an system fields (_unique_id,
-        context's data etc)
+        """Combine user's message and context's data, nested without copying
+        them or merged in a copy of the message for the legacy format
         """
-        msg = self.message.copy()
+        if self._pika_engine.nested_message_context:
+            msg = {_MESSAGE_FIELD: self.message}
 
-        if self.context:
-            for key, value in six.iteritems(self.context):
-                key = six.text_type(key)
-                msg['_$_' + key] = value
+            if self.context:
+                msg[_CONTEXT_FIELD] = self.context
+
+            headers = _HEADERS
+        else:
+            msg = self.message.copy()
+
+            if self.context:
+                for key, value in six.iteritems(self.context):
+                    key = six.text_type(key)
+                    msg['_$_' + key] = value
+
+            headers = _LEGACY_HEADERS
 
         props = pika_spec.BasicProperties(
             content_encoding=self._content_encoding,
             content_type=self._content_type,
-            headers={_VERSION_HEADER: _VERSION},
+            headers=headers,
             message_id=self.unique_id,
         )
         return msg, props
@@ -448,10 +473,9 @@ class PikaOutgoingMessage(object):
                                        encoding=self._content_encoding)
 
         LOG.debug(
-            "Sending message:[body:{}; properties: {}] to target: "
-            "[exchange:{}; routing_key:{}]".format(
-                body, msg_props, exchange, routing_key
-            )
+            "Sending message:[body:%s; properties: %s] to target: "
+            "[exchange:%s; routing_key:%s]", body, msg_props, exchange,
+            routing_key
         )
 
         publish = (self._publish if retrier is None else
@@ -519,11 +543,12 @@ class RpcPikaOutgoingMessage(PikaOutgoingMessage):
         msg_dict, msg_props = self._prepare_message_to_send()
 
         if reply_listener:
-            self.msg_id = uuid.uuid4().hex
+            self.msg_id = utils.generate_id()
             msg_props.correlation_id = self.msg_id
             LOG.debug('MSG_ID is %s', self.msg_id)
 
             self.reply_q = reply_listener.get_reply_qname(
+                None if expiration_time is None else
                 expiration_time - time.time()
             )
             msg_props.reply_to = self.reply_q
@@ -12,6 +12,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import errno
+import fcntl
+import os
+import select
 import threading
 import time
 
@@ -31,6 +36,10 @@ class PikaPoller(object):
     connectivity related problem detected
     """
 
+    # Maximum time in seconds to wait for I/O before processing the connection
+    # events again, so that pika timers (heartbeats, etc) are not delayed
+    _MAX_IO_WAIT = 1.0
+
     def __init__(self, pika_engine, prefetch_count, incoming_message_class):
         """Initialize required fields
 
@@ -53,7 +62,10 @@ class PikaPoller(object):
 
         self._queues_to_consume = None
 
-        self._message_queue = []
+        self._message_queue = collections.deque()
+
+        # Pipe used to wake up a poll waiting for I/O
+        self._wakeup_fds = None
 
     def _reconnect(self):
         """Performs reconnection to the broker. It is unsafe method for
@@ -143,14 +155,81 @@ class PikaPoller(object):
                     LOG.exception("Unexpected error during closing connection")
             self._connection = None
 
-        for i in xrange(len(self._message_queue) - 1, -1, -1):
-            message = self._message_queue[i]
-            if message.need_ack():
-                del self._message_queue[i]
+        self._message_queue = collections.deque(
+            message for message in self._message_queue
+            if not message.need_ack()
+        )
+
+    def _get_wakeup_fds(self):
+        """Returns the pipe used to wake up a poll waiting for I/O, creates it
+        if needed. It is unsafe method for internal use only
+        """
+        if self._wakeup_fds is None:
+            self._wakeup_fds = os.pipe()
+            for fd in self._wakeup_fds:
+                fcntl.fcntl(fd, fcntl.F_SETFL,
+                            fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        return self._wakeup_fds
+
+    def _close_wakeup_fds(self):
+        """Closes the pipe used to wake up a poll, if any. It is unsafe
+        method for internal use only
+        """
+        if self._wakeup_fds is not None:
+            for fd in self._wakeup_fds:
+                os.close(fd)
+            self._wakeup_fds = None
+
+    def _wakeup(self):
+        """Wakes up a poll waiting for I/O. It is unsafe method for internal
+        use only
+        """
+        if self._wakeup_fds is None:
+            return
+        try:
+            os.write(self._wakeup_fds[1], b'x')
+        except OSError as e:
+            # The pipe is full, the poll is already going to wake up
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def _wait_for_io(self, fd, wakeup_fd, timeout):
+        """Waits until there is data to read on the connection, a wake up
+        or the timeout expiration, without holding the lock
+        """
+        wait = self._MAX_IO_WAIT if timeout is None else min(
+            timeout, self._MAX_IO_WAIT)
+        try:
+            readable = select.select([fd, wakeup_fd], [], [], wait)[0]
+        except (OSError, ValueError, select.error):
+            # The connection or the pipe have been closed by another thread,
+            # the next iteration of poll will handle it
+            return
+        if wakeup_fd in readable:
+            with self._lock:
+                # the pipe may have been closed by cleanup() meanwhile
+                if (self._wakeup_fds is not None and
+                        self._wakeup_fds[0] == wakeup_fd):
+                    # a single read is enough, the pipe only holds a few wake
+                    # ups and a green os.read would wait for more data
+                    # instead of failing
+                    os.read(wakeup_fd, 4096)
+
+    def _take_messages(self, count):
+        """Removes up to count messages from the buffer and returns them. It
+        is unsafe method for internal use only
+        """
+        count = min(count, len(self._message_queue))
+        return [self._message_queue.popleft() for __ in range(count)]
 
     def poll(self, timeout=None, prefetch_size=1):
         """Main method of this class - consumes message from RabbitMQ
 
+        The connection events are processed without waiting, the lock is
+        released while waiting for data on the connection, so the poll returns
+        as soon as enough messages arrive and stop() or cleanup() do not wait
+        for it.
+
         :param: timeout: float, seconds, timeout for waiting new incoming
             message, None means wait forever
         :param: prefetch_size:  Integer, count of messages which we are want to
@@ -164,25 +243,23 @@ class PikaPoller(object):
             with self._lock:
                 if timeout is not None:
                     timeout = expiration_time - time.time()
-                if (len(self._message_queue) < prefetch_size and
-                        self._started and ((timeout is None) or timeout > 0)):
-                    try:
-                        if self._channel is None:
-                            self._reconnect()
-                        # we need some time_limit here, not too small to avoid
-                        # a lot of not needed iterations but not too large to
-                        # release lock time to time and give a chance to
-                        # perform another method waiting this lock
-                        self._connection.process_data_events(
-                            time_limit=0.25
-                        )
-                    except pika_pool.Connection.connectivity_errors:
-                        self._cleanup()
-                        raise
-                else:
-                    result = self._message_queue[:prefetch_size]
-                    del self._message_queue[:prefetch_size]
-                    return result
+                if (len(self._message_queue) >= prefetch_size or
+                        not self._started or
+                        (timeout is not None and timeout <= 0)):
+                    return self._take_messages(prefetch_size)
+                try:
+                    if self._channel is None:
+                        self._reconnect()
+                    self._connection.process_data_events(time_limit=0)
+                except pika_pool.Connection.connectivity_errors:
+                    self._cleanup()
+                    raise
+                if len(self._message_queue) >= prefetch_size:
+                    return self._take_messages(prefetch_size)
+                fd = self._connection._impl.socket.fileno()
+                wakeup_fd = self._get_wakeup_fds()[0]
+
+            self._wait_for_io(fd, wakeup_fd, timeout)
 
     def start(self):
         """Starts poller. Should be called before polling to allow message
@@ -200,6 +277,7 @@ class PikaPoller(object):
                 return
 
             self._started = False
+            self._wakeup()
 
     def reconnect(self):
         """Safe version of _reconnect. Performs reconnection to the broker."""
@@ -217,6 +295,8 @@ class PikaPoller(object):
         """
         with self._lock:
             self._cleanup()
+            self._wakeup()
+            self._close_wakeup_fds()
 
 
 class RpcServicePikaPoller(PikaPoller):
@@ -25,18 +25,19 @@ functions scheduled by the Controller.
 """
 
 import abc
+import collections
 import logging
-import threading
+import time
 import uuid
 
 from oslo_config import cfg
 import proton
 import pyngus
-from six import moves
 
 from oslo_messaging._drivers.protocols.amqp import eventloop
 from oslo_messaging._drivers.protocols.amqp import opts
 from oslo_messaging._i18n import _LE, _LI, _LW
+from oslo_messaging import _utils as utils
 from oslo_messaging import exceptions
 from oslo_messaging import transport
 
@@ -87,7 +88,7 @@ class Replies(pyngus.ReceiverEventHandler):
         identifier will appear in the 'correlation-id' field of the
         corresponding response message.
         """
-        request.id = uuid.uuid4().hex
+        request.id = utils.generate_id()
         # reply is placed on reply_queue
         self._correlation[request.id] = reply_queue
         request.reply_to = self._receiver.source_address
@@ -257,14 +258,19 @@ class Controller(pyngus.ConnectionEventHandler):
     """
     def __init__(self, hosts, default_exchange, config):
         self.processor = None
+        # the proton container holding the connection, the eventloop thread
+        # is shared with the other controllers of the process:
+        self._container = None
         self._socket_connection = None
         # queue of Task() objects to execute on the eventloop once the
-        # connection is ready:
-        self._tasks = moves.queue.Queue(maxsize=500)
-        # limit the number of Task()'s to execute per call to _process_tasks().
-        # This allows the eventloop main thread to return to servicing socket
-        # I/O in a timely manner
-        self._max_task_batch = 50
+        # connection is ready, it is fed without locking by the application
+        # threads:
+        self._tasks = collections.deque()
+        # limit the time spent executing Task()'s per call to
+        # _process_tasks(), rather than their number, so the batch size adapts
+        # to the cost of the tasks.  This allows the eventloop main thread to
+        # return to servicing socket I/O in a timely manner
+        self._task_time_slice = 0.01
         # cache of sending links indexed by address:
         self._senders = {}
         # Servers (set of receiving links), indexed by target:
@@ -309,34 +315,26 @@ class Controller(pyngus.ConnectionEventHandler):
         self._delay = 0  # seconds between retries
         # prevent queuing up multiple requests to run _process_tasks()
         self._process_tasks_scheduled = False
-        self._process_tasks_lock = threading.Lock()
 
     def connect(self):
         """Connect to the messaging service."""
-        self.processor = eventloop.Thread(self._container_name)
+        self.processor = eventloop.acquire_thread()
         self.processor.wakeup(lambda: self._do_connect())
 
     def add_task(self, task):
         """Add a Task for execution on processor thread."""
-        self._tasks.put(task)
+        self._tasks.append(task)
         self._schedule_task_processing()
 
     def shutdown(self, wait=True, timeout=None):
         """Shutdown the messaging service."""
         if self.processor:
-            LOG.debug("Waiting for eventloop to exit")
-            self.processor.shutdown(wait, timeout)
-            self.processor = None
-        self._tasks = None
-        self._senders = None
-        for server in self._servers.values():
-            server.destroy()
-        self._servers.clear()
-        self._socket_connection = None
-        if self._replies:
-            self._replies.destroy()
-            self._replies = None
-        LOG.debug("Eventloop exited, driver shut down")
+            LOG.debug("Waiting for the connection to be released")
+            # the connection is closed on the eventloop thread, which keeps
+            # running for the other controllers
+            self.processor.release(lambda: self._do_disconnect(),
+                                   wait, timeout)
+        LOG.debug("Driver shut down")
 
     # The remaining methods are reserved to run from the eventloop thread only!
     # They must not be invoked directly!
@@ -487,40 +485,59 @@ class Controller(pyngus.ConnectionEventHandler):
         if self.sasl_config_name:
             conn_props["x-sasl-config-name"] = self.sasl_config_name
 
-        self._socket_connection = self.processor.connect(host,
-                                                         handler=self,
-                                                         properties=conn_props)
+        if self._container is None:
+            self._container = self.processor.create_container(
+                self._container_name)
+        self._socket_connection = self.processor.connect(
+            host, handler=self, properties=conn_props,
+            container=self._container)
         LOG.debug("Connection initiated")
 
+    def _do_disconnect(self):
+        """Destroy the connection and its links on processor thread."""
+        self._closing = True
+        self._tasks.clear()
+        self._senders = {}
+        for server in self._servers.values():
+            server.destroy()
+        self._servers.clear()
+        if self._replies:
+            self._replies.destroy()
+            self._replies = None
+        if self._socket_connection:
+            self._socket_connection.reset()
+            self._socket_connection = None
+        if self._container:
+            self.processor.destroy_container(self._container)
+            self._container = None
+        self.processor = None
+
     def _process_tasks(self):
         """Execute Task objects in the context of the processor thread."""
-        with self._process_tasks_lock:
-            self._process_tasks_scheduled = False
-        count = 0
-        while (not self._tasks.empty() and
-               count < self._max_task_batch and
-               self._can_process_tasks):
+        # cleared before taking the tasks, so a task added meanwhile
+        # schedules another call
+        self._process_tasks_scheduled = False
+        deadline = time.time() + self._task_time_slice
+        while (self._tasks and self._can_process_tasks and
+               time.time() < deadline):
             try:
-                self._tasks.get(False).execute(self)
+                self._tasks.popleft().execute(self)
             except Exception as e:
                 LOG.exception(_LE("Error processing task: %s"), e)
-            count += 1
 
-        # if we hit _max_task_batch, resume task processing later:
-        if not self._tasks.empty() and self._can_process_tasks:
+        # if we ran out of time, resume task processing later:
+        if self._tasks and self._can_process_tasks:
             self._schedule_task_processing()
 
     def _schedule_task_processing(self):
         """_process_tasks() helper: prevent queuing up multiple requests for
         task processing.  This method is called both by the application thread
-        and the processing thread.
+        and the processing thread.  Two threads may both schedule a call,
+        which is harmless: the second one finds no task to execute.
         """
-        if self.processor:
-            with self._process_tasks_lock:
-                already_scheduled = self._process_tasks_scheduled
-                self._process_tasks_scheduled = True
-            if not already_scheduled:
-                self.processor.wakeup(lambda: self._process_tasks())
+        if self.processor and not self._process_tasks_scheduled:
+            self._process_tasks_scheduled = True
+            self.processor.wakeup(lambda: self._process_tasks())
 
     @property
     def _can_process_tasks(self):
@@ -631,7 +648,6 @@ class Controller(pyngus.ConnectionEventHandler):
         Clean up controller resources and exit.
         """
         self._socket_connection.close()
-        self.processor.shutdown()
         LOG.info(_LI("Messaging has shutdown"))
 
     def _handle_connection_loss(self):
@@ -20,6 +20,10 @@ scheduled via the Controller, and performs blocking socket I/O and timer
 processing.  This thread is designed to be as simple as possible - all the
 protocol specific intelligence is provided by the Controller and executed on
 the background thread via callables.
+
+A single thread is shared by all the Controllers of a process: each of them
+owns a proton container and its connections, and the thread multiplexes the
+sockets of all the containers.
 """
 
 import errno
@@ -34,11 +38,33 @@ import time
 import uuid
 
 import pyngus
-from six import moves
+try:
+    import selectors
+except ImportError:  # Python 2
+    from trollius import selectors
 
+from oslo_messaging._drivers import common
 from oslo_messaging._i18n import _LE, _LI, _LW
 LOG = logging.getLogger(__name__)
 
+# the eventloop thread shared by the controllers, indexed by process id so a
+# forked process starts its own thread
+_threads = {}
+_threads_lock = threading.Lock()
+
+
+def acquire_thread():
+    """Get the eventloop thread of this process, start it if needed.  Each
+    call must be balanced by a call to Thread.release().  Thread safe.
+    """
+    with _threads_lock:
+        thread = _threads.get(os.getpid())
+        if thread is None:
+            thread = Thread()
+            _threads[os.getpid()] = thread
+        thread._users += 1
+        return thread
+
 
 class _SocketConnection(object):
     """Associates a pyngus Connection with a python network socket,
@@ -62,7 +88,7 @@ class _SocketConnection(object):
         return {u'process': os.path.basename(sys.argv[0]), u'pid': os.getpid()}
 
     def fileno(self):
-        """Allows use of a _SocketConnection in a select() call.
+        """Allows use of a _SocketConnection in a selector.
         """
         return self.socket.fileno()
 
@@ -199,34 +225,34 @@ class Schedule(object):
 class Requests(object):
     """A queue of callables to execute from the eventloop thread's main
     loop.
+
+    The queue is unbounded and callers never take a lock, the callables are
+    handed off to the eventloop as by common.Handoff: a burst of requests
+    wakes it up with a single write to a pipe.
     """
     def __init__(self):
-        self._requests = moves.queue.Queue(maxsize=10)
-        self._wakeup_pipe = os.pipe()
+        self._requests = common.Handoff()
 
     def wakeup(self, request=None):
         """Enqueue a callable to be executed by the eventloop, and force the
-        eventloop thread to wake up from select().
+        eventloop thread to wake up from waiting for I/O.
         """
         if request:
             self._requests.put(request)
-        os.write(self._wakeup_pipe[1], b'!')
+        else:
+            self._requests.wakeup()
 
     def fileno(self):
-        """Allows this request queue to be used by select()."""
-        return self._wakeup_pipe[0]
+        """Allows this request queue to be used by a selector."""
+        return self._requests.fileno()
 
     def read(self):
         """Invoked by the eventloop thread, execute each queued callable."""
-        os.read(self._wakeup_pipe[0], 512)
-        # first pop of all current tasks
-        requests = []
-        while not self._requests.empty():
-            requests.append(self._requests.get())
-        # then process them, this allows callables to re-register themselves to
-        # be run on the next iteration of the I/O loop
-        for r in requests:
-            r()
+        # only the current tasks are taken, this allows callables to
+        # re-register themselves to be run on the next iteration of the I/O
+        # loop
+        for request in self._requests.get_all():
+            request()
 
 
 class Thread(threading.Thread):
@@ -241,10 +267,19 @@ class Thread(threading.Thread):
         # delayed callables (only used on this thread for now):
         self._schedule = Schedule()
 
-        # Configure a container
-        if container_name is None:
-            container_name = "Container-" + uuid.uuid4().hex
-        self._container = pyngus.Container(container_name)
+        # sockets are registered with the selector once, their events are
+        # only updated when the connection's I/O needs change:
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._requests, selectors.EVENT_READ,
+                                self._requests)
+        # the events registered for each socket
+        self._sockets = {}
+
+        # Configure a container, other containers may be added later
+        self._containers = []
+        self._container = self.create_container(container_name)
+        # number of controllers which have acquired the thread
+        self._users = 0
 
         self.name = "Thread for Proton container: %s" % self._container.name
         self._shutdown = False
@@ -267,6 +302,33 @@ class Thread(threading.Thread):
             self.join(timeout=timeout)
         LOG.debug("eventloop shutdown complete")
 
+    def release(self, request=None, wait=True, timeout=None):
+        """Release a thread obtained from acquire_thread(), optionally
+        providing a callable to run on the eventloop to clean up the
+        connections of the caller.  The thread is shut down once it has been
+        released by all its users.  Thread safe.
+        """
+        with _threads_lock:
+            self._users -= 1
+            last = self._users <= 0
+            if last:
+                for pid, thread in list(_threads.items()):
+                    if thread is self:
+                        del _threads[pid]
+        if request:
+            done = threading.Event()
+
+            def run_request():
+                try:
+                    request()
+                finally:
+                    done.set()
+            self.wakeup(run_request)
+            if wait:
+                done.wait(timeout)
+        if last:
+            self.shutdown(wait, timeout)
+
     # the following methods are not thread safe - they must be run from the
     # eventloop thread
 
@@ -274,35 +336,84 @@ class Thread(threading.Thread):
         """Invoke request after delay seconds."""
         self._schedule.schedule(request, delay)
 
-    def connect(self, host, handler, properties=None, name=None):
+    def create_container(self, container_name=None):
+        """Create a proton container whose connections are serviced by this
+        thread.
+        """
+        if container_name is None:
+            container_name = "Container-" + uuid.uuid4().hex
+        container = pyngus.Container(container_name)
+        self._containers.append(container)
+        return container
+
+    def destroy_container(self, container):
+        """Destroy a container created by create_container() and all its
+        connections.
+        """
+        self._containers.remove(container)
+        container.destroy()
+
+    def connect(self, host, handler, properties=None, name=None,
+                container=None):
         """Get a _SocketConnection to a peer represented by url."""
+        container = container or self._container
         key = name or "%s:%i" % (host.hostname, host.port)
         # return pre-existing
-        conn = self._container.get_connection(key)
+        conn = container.get_connection(key)
         if conn:
             return conn.user_context
 
         # create a new connection - this will be stored in the
         # container, using the specified name as the lookup key, or if
         # no name was provided, the host:port combination
-        sc = _SocketConnection(key, self._container,
+        sc = _SocketConnection(key, container,
                                properties, handler=handler)
         sc.connect(host)
         return sc
 
+    def _update_selector(self, readers, writers):
+        """Register the events each socket must be polled for, sockets which
+        are not needed anymore are unregistered.
+        """
+        events = {}
+        for c in readers:
+            sc = c.user_context
+            events[sc.socket] = (selectors.EVENT_READ, sc)
+        for c in writers:
+            sc = c.user_context
+            mask = events.get(sc.socket, (0, sc))[0]
+            events[sc.socket] = (mask | selectors.EVENT_WRITE, sc)
+
+        # unregister first: a closed socket's file descriptor may already
+        # have been reused by a new socket
+        for sock in list(self._sockets):
+            if sock not in events:
+                self._selector.unregister(sock)
+                del self._sockets[sock]
+        for sock, (mask, sc) in events.items():
+            registered = self._sockets.get(sock)
+            if registered is None:
+                self._selector.register(sock, mask, sc)
+            elif registered != mask:
+                self._selector.modify(sock, mask, sc)
+            self._sockets[sock] = mask
+
     def run(self):
         """Run the proton event/timer loop."""
         LOG.debug("Starting Proton thread, container=%s",
                   self._container.name)
 
         while not self._shutdown:
-            readers, writers, timers = self._container.need_processing()
+            readers, writers, timers = [], [], []
+            for container in self._containers:
+                r, w, t = container.need_processing()
+                readers.extend(r)
+                writers.extend(w)
+                timers.extend(t)
+            if len(self._containers) > 1:
+                timers.sort(key=lambda t: t.deadline)
 
-            readfds = [c.user_context for c in readers]
-            # additionally, always check for readability of pipe we
-            # are using to wakeup processing thread by other threads
-            readfds.append(self._requests)
-            writefds = [c.user_context for c in writers]
+            self._update_selector(readers, writers)
 
             timeout = None
             if timers:
@@ -314,9 +425,9 @@ class Thread(threading.Thread):
             timeout = self._schedule.get_delay(timeout)
 
             try:
-                results = select.select(readfds, writefds, [], timeout)
-            except select.error as serror:
-                if serror[0] == errno.EINTR:
+                results = self._selector.select(timeout)
+            except (select.error, IOError, OSError) as serror:
+                if serror.args[0] == errno.EINTR:
                     LOG.warning(_LW("ignoring interrupt from select(): %s"),
                                 str(serror))
                     continue
@@ -328,21 +439,23 @@ class Thread(threading.Thread):
             if self._shutdown:
                 break
 
-            readable, writable, ignore = results
-
-            for r in readable:
-                r.read()
+            for key, mask in results:
+                if mask & selectors.EVENT_READ:
+                    key.data.read()
 
             for t in timers:
                 if t.deadline > time.time():
                     break
                 t.process(time.time())
 
-            for w in writable:
-                w.write()
+            for key, mask in results:
+                if mask & selectors.EVENT_WRITE:
+                    key.data.write()
 
             self._schedule.process()  # run any deferred requests
 
         LOG.info(_LI("eventloop thread exiting, container=%s"),
                  self._container.name)
-        self._container.destroy()
+        self._selector.close()
+        for container in self._containers:
+            container.destroy()
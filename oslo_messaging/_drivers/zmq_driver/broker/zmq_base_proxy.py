@@ -51,3 +51,6 @@ class BaseProxy(object):
 
     def wait(self):
         self.executor.wait()
+
+    def is_alive(self):
+        return self.executor.thread.is_alive()
@@ -13,18 +13,38 @@
 #    under the License.
 
 import logging
+import multiprocessing
 import os
+import signal
+import threading
+import time
 
+from oslo_utils import eventletutils
 from oslo_utils import excutils
-from stevedore import driver
 
 from oslo_messaging._drivers.zmq_driver.broker import zmq_queue_proxy
+from oslo_messaging._drivers.zmq_driver.matchmaker import matchmaker_cache
+from oslo_messaging._drivers.zmq_driver import zmq_address
 from oslo_messaging._drivers.zmq_driver import zmq_async
-from oslo_messaging._i18n import _LE, _LI
+from oslo_messaging._i18n import _LE, _LI, _LW
 
 zmq = zmq_async.import_zmq(zmq_concurrency='native')
 LOG = logging.getLogger(__name__)
 
+if eventletutils.EVENTLET_AVAILABLE:
+    import eventlet
+
+
+def _create_ipc_dirs(conf):
+    ipc_dir = conf.rpc_zmq_ipc_dir
+    try:
+        os.makedirs("%s/fanout" % ipc_dir)
+    except os.error:
+        if not os.path.isdir(ipc_dir):
+            with excutils.save_and_reraise_exception():
+                LOG.error(_LE("Required IPC directory does not exist at"
+                              " %s"), ipc_dir)
+
 
 class ZmqBroker(object):
     """Local messaging IPC broker (nodes are still peers).
@@ -40,31 +60,27 @@ class ZmqBroker(object):
            clients (staying in a separate process).
     """
 
-    def __init__(self, conf):
+    def __init__(self, conf, frontend_address=None):
         super(ZmqBroker, self).__init__()
         self.conf = conf
-        self._create_ipc_dirs()
-        self.matchmaker = driver.DriverManager(
-            'oslo.messaging.zmq.matchmaker',
-            self.conf.rpc_zmq_matchmaker,
-        ).driver(self.conf)
+        _create_ipc_dirs(conf)
+        self.matchmaker = matchmaker_cache.get_matchmaker(self.conf)
 
-        self.context = zmq.Context()
+        threads = conf.rpc_zmq_broker_threads
+        self.context = zmq.Context(io_threads=threads)
+        self.device = None
+        if frontend_address is None and threads > 1:
+            frontend_address = zmq_address.get_broker_backend_address()
+            self.device = zmq_queue_proxy.QueueDevice(conf, self.context,
+                                                      frontend_address)
         self.proxies = [zmq_queue_proxy.UniversalQueueProxy(
-            conf, self.context, self.matchmaker)
+            conf, self.context, self.matchmaker, frontend_address)
+            for _ in range(threads)
         ]
 
-    def _create_ipc_dirs(self):
-        ipc_dir = self.conf.rpc_zmq_ipc_dir
-        try:
-            os.makedirs("%s/fanout" % ipc_dir)
-        except os.error:
-            if not os.path.isdir(ipc_dir):
-                with excutils.save_and_reraise_exception():
-                    LOG.error(_LE("Required IPC directory does not exist at"
-                                  " %s"), ipc_dir)
-
     def start(self):
+        if self.device is not None:
+            self.device.start()
         for proxy in self.proxies:
             proxy.start()
 
@@ -72,7 +88,171 @@ class ZmqBroker(object):
         for proxy in self.proxies:
             proxy.wait()
 
+    def is_alive(self):
+        return all(proxy.is_alive() for proxy in self.proxies)
+
+    def stats(self):
+        """Return the number of requests routed by the proxies."""
+        return {'requests': sum(proxy.requests for proxy in self.proxies)}
+
     def close(self):
         LOG.info(_LI("Broker shutting down ..."))
         for proxy in self.proxies:
             proxy.stop()
+        for proxy in self.proxies:
+            proxy.wait()
+            proxy.cleanup()
+        if self.device is not None:
+            self.device.stop()
+        # terminating the context interrupts the device once all the sockets
+        # of the proxies are closed
+        self.context.term()
+        if self.device is not None:
+            self.device.wait()
+
+
+def _run_worker(conf, address, requests):
+    if eventletutils.EVENTLET_AVAILABLE:
+        # a new hub drops the green threads forked from the supervisor
+        eventlet.hubs.use_hub()
+    # the supervisor stops the workers, an interrupt of the terminal only
+    # reaches it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+
+    broker = ZmqBroker(conf, frontend_address=address)
+    broker.start()
+    reported = 0
+    while not stopped.wait(ZmqBrokerSupervisor.CHECK_INTERVAL):
+        count = broker.stats()['requests']
+        requests.value += count - reported
+        reported = count
+        if not broker.is_alive():
+            LOG.error(_LE("A proxy of the broker worker %d died"),
+                      os.getpid())
+            break
+    broker.close()
+
+
+def _run_device(conf, address):
+    if eventletutils.EVENTLET_AVAILABLE:
+        eventlet.hubs.use_hub()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    context = zmq.Context()
+    device = zmq_queue_proxy.QueueDevice(conf, context, address)
+    # runs until the supervisor terminates the process
+    device.run()
+
+
+class ZmqBrokerSupervisor(object):
+    """Run the proxies of the broker in several worker processes.
+
+    A device process binds the broker address and load balances the requests
+    between the workers connected to it over IPC. Each worker is a ZmqBroker
+    process, the workers which die are restarted, and the requests rate of
+    each worker is logged every report_interval seconds. The supervisor
+    itself never creates a zmq context, so that no process is forked while
+    zmq threads are running.
+    """
+
+    CHECK_INTERVAL = 1
+    STOP_TIMEOUT = 10
+
+    def __init__(self, conf, workers, report_interval=60):
+        super(ZmqBrokerSupervisor, self).__init__()
+        self.conf = conf
+        _create_ipc_dirs(conf)
+        self.report_interval = report_interval
+        self.address = zmq_address.get_broker_workers_address(conf)
+
+        self._stopped = threading.Event()
+        self._device = None
+        self._workers = [None] * workers
+        # requests routed by each worker, counted by the workers
+        self._requests = [multiprocessing.RawValue('L', 0)
+                          for _ in range(workers)]
+        self._reported = [0] * workers
+
+    def _start_process(self, target, name, *args):
+        process = multiprocessing.Process(
+            target=target, name=name, args=(self.conf, self.address) + args)
+        process.daemon = True
+        process.start()
+        return process
+
+    def _start_device(self):
+        self._device = self._start_process(_run_device, "zmq-broker-device")
+        LOG.info(_LI("Started broker device with pid %d"), self._device.pid)
+
+    def _start_worker(self, index):
+        process = self._start_process(
+            _run_worker, "zmq-broker-worker-%d" % index, self._requests[index])
+        self._workers[index] = process
+        LOG.info(_LI("Started broker worker %(index)d with pid %(pid)d"),
+                 {"index": index, "pid": process.pid})
+
+    def start(self):
+        self._start_device()
+        for index in range(len(self._workers)):
+            self._start_worker(index)
+
+    def wait(self):
+        last_report = time.time()
+        while not self._stopped.wait(self.CHECK_INTERVAL):
+            self.check_workers()
+            now = time.time()
+            if now - last_report >= self.report_interval:
+                self._report(now - last_report)
+                last_report = now
+
+    def check_workers(self):
+        """Restart the device and the workers which are not running
+        anymore.
+        """
+        if self._stopped.is_set():
+            return
+        if not self._device.is_alive():
+            LOG.warning(_LW("Broker device with pid %(pid)d exited with "
+                            "code %(code)s, restarting it"),
+                        {"pid": self._device.pid,
+                         "code": self._device.exitcode})
+            self._start_device()
+        for index, process in enumerate(self._workers):
+            if process.is_alive():
+                continue
+            LOG.warning(_LW("Broker worker %(index)d with pid %(pid)d exited "
+                            "with code %(code)s, restarting it"),
+                        {"index": index, "pid": process.pid,
+                         "code": process.exitcode})
+            self._start_worker(index)
+
+    def stats(self):
+        """Return the number of requests routed by each worker."""
+        return {'requests': [requests.value for requests in self._requests]}
+
+    def _report(self, interval):
+        for index, requests in enumerate(self.stats()['requests']):
+            LOG.info(_LI("Broker worker %(index)d routed %(rate).1f "
+                         "requests/s"),
+                     {"index": index,
+                      "rate": (requests - self._reported[index]) / interval})
+            self._reported[index] = requests
+
+    def close(self):
+        LOG.info(_LI("Broker supervisor shutting down ..."))
+        self._stopped.set()
+        # the device is stopped last, the workers are connected to it
+        processes = [process for process in self._workers + [self._device]
+                     if process is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(self.STOP_TIMEOUT)
+            if process.is_alive():
+                LOG.warning(_LW("Killing broker process with pid %d"),
+                            process.pid)
+                os.kill(process.pid, signal.SIGKILL)
+                process.join()
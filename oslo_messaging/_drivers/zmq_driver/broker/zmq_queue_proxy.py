@@ -21,31 +21,78 @@ from oslo_messaging._drivers.zmq_driver.client.publishers \
     import zmq_pub_publisher
 from oslo_messaging._drivers.zmq_driver import zmq_address
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
-from oslo_messaging._i18n import _LI
+from oslo_messaging._i18n import _LE, _LI
 
 zmq = zmq_async.import_zmq(zmq_concurrency='native')
 LOG = logging.getLogger(__name__)
 
 
+class QueueDevice(zmq_base_proxy.BaseProxy):
+
+    """Share the broker address between several proxies.
+
+    Requests received on the ROUTER frontend are load balanced between the
+    proxies connected to the backend address, and their replies are routed
+    back to the clients by the frontend. The device runs in libzmq, without
+    touching the frames.
+    """
+
+    def __init__(self, conf, context, backend_address):
+        super(QueueDevice, self).__init__(conf, context)
+        self.frontend = context.socket(zmq.ROUTER)
+        self.frontend.bind(zmq_address.get_broker_address(conf))
+        self.backend = context.socket(zmq.DEALER)
+        self.backend.bind(backend_address)
+        LOG.info(_LI("Queue device shares the broker address"))
+
+    def run(self):
+        try:
+            zmq.proxy(self.frontend, self.backend)
+        except zmq.ZMQError as e:
+            # the context was terminated by the broker
+            LOG.debug("Queue device terminated: %s", e)
+            self.frontend.close(linger=0)
+            self.backend.close(linger=0)
+            self.executor.done()
+
+
 class UniversalQueueProxy(zmq_base_proxy.BaseProxy):
 
-    def __init__(self, conf, context, matchmaker):
+    """Route the requests of the clients to the servers.
+
+    Only the header frames of the requests are read, the body frames are
+    forwarded without being copied. The proxy either binds the broker
+    address itself, or connects to the backend of a QueueDevice given as
+    frontend_address.
+    """
+
+    def __init__(self, conf, context, matchmaker, frontend_address=None):
         super(UniversalQueueProxy, self).__init__(conf, context)
         self.poller = zmq_async.get_poller(zmq_concurrency='native')
+        self.requests = 0
 
-        self.router_socket = context.socket(zmq.ROUTER)
-        self.router_socket.bind(zmq_address.get_broker_address(conf))
+        if frontend_address is not None:
+            # the device keeps the identity of the clients as first frame,
+            # so a DEALER worker sees the same frames as the ROUTER
+            self.router_socket = context.socket(zmq.DEALER)
+            self.router_socket.connect(frontend_address)
+        else:
+            self.router_socket = context.socket(zmq.ROUTER)
+            self.router_socket.bind(zmq_address.get_broker_address(conf))
 
         self.poller.register(self.router_socket, self._receive_in_request)
         LOG.info(_LI("Polling at universal proxy"))
 
         self.matchmaker = matchmaker
         reply_receiver = zmq_dealer_publisher_proxy.ReplyReceiver(self.poller)
+        # the publishers run in the thread of the proxy, so they use native
+        # sockets of the broker context rather than green ones
         self.direct_publisher = zmq_dealer_publisher_proxy \
-            .DealerPublisherProxy(conf, matchmaker, reply_receiver)
+            .DealerPublisherProxy(conf, matchmaker, reply_receiver, context)
         self.pub_publisher = zmq_pub_publisher.PubPublisherProxy(
-            conf, matchmaker)
+            conf, matchmaker, context)
 
     def run(self):
         message, socket = self.poller.poll(self.conf.rpc_poll_timeout)
@@ -58,35 +105,62 @@ class UniversalQueueProxy(zmq_base_proxy.BaseProxy):
             self._redirect_reply(message)
 
     def _redirect_in_request(self, multipart_message):
-        LOG.debug("-> Redirecting request %s to TCP publisher",
-                  multipart_message)
-        envelope = multipart_message[zmq_names.MULTIPART_IDX_ENVELOPE]
-        if self.conf.use_pub_sub and \
-                envelope[zmq_names.FIELD_MSG_TYPE] \
-                in zmq_names.MULTISEND_TYPES:
-            self.pub_publisher.send_request(multipart_message)
-        else:
-            self.direct_publisher.send_request(multipart_message)
+        self.requests += 1
+        try:
+            msg_type = zmq_codec.get_msg_type(multipart_message)
+            LOG.debug("-> Redirecting request %s to TCP publisher",
+                      multipart_message[zmq_codec.IDX_MSG_ID])
+            if self.conf.use_pub_sub and \
+                    msg_type in zmq_names.MULTISEND_TYPES:
+                self.pub_publisher.send_request(multipart_message)
+            else:
+                self.direct_publisher.send_request(multipart_message)
+        except zmq_codec.MalformedMessage as e:
+            LOG.error(_LE("Dropping request: %s"), e)
 
     def _redirect_reply(self, reply):
-        LOG.debug("Reply proxy %s", reply)
-        if reply[zmq_names.IDX_REPLY_TYPE] == zmq_names.ACK_TYPE:
-            LOG.debug("Acknowledge dropped %s", reply)
+        if len(reply) <= zmq_names.IDX_REPLY_BODY:
+            LOG.error(_LE("Dropping reply of %d frames"), len(reply))
+            return
+
+        if reply[zmq_names.IDX_REPLY_TYPE].bytes == \
+                zmq_names.ACK_TYPE.encode('utf-8'):
+            LOG.debug("Acknowledge dropped")
             return
 
-        LOG.debug("<- Redirecting reply to ROUTER: reply: %s",
-                  reply[zmq_names.IDX_REPLY_BODY:])
+        LOG.debug("<- Redirecting reply to ROUTER")
 
-        self.router_socket.send_multipart(reply[zmq_names.IDX_REPLY_BODY:])
+        self.router_socket.send_multipart(reply[zmq_names.IDX_REPLY_BODY:],
+                                          copy=False)
 
     def _receive_in_request(self, socket):
-        reply_id = socket.recv()
-        assert reply_id is not None, "Valid id expected"
-        empty = socket.recv()
-        assert empty == b'', "Empty delimiter expected"
-        envelope = socket.recv_pyobj()
-        if envelope[zmq_names.FIELD_MSG_TYPE] == zmq_names.CALL_TYPE:
-            envelope[zmq_names.FIELD_REPLY_ID] = reply_id
-        payload = socket.recv_multipart()
-        payload.insert(0, envelope)
-        return payload
+        frames = socket.recv_multipart(copy=False)
+        try:
+            return self._parse_in_request(frames)
+        except zmq_codec.MalformedMessage as e:
+            LOG.error(_LE("Dropping request: %s"), e)
+            return None
+
+    @staticmethod
+    def _parse_in_request(frames):
+        if len(frames) < 2 + zmq_codec.REQUEST_FRAMES:
+            raise zmq_codec.MalformedMessage(
+                "Expected %d request frames, got %d"
+                % (zmq_codec.REQUEST_FRAMES, len(frames) - 2))
+        reply_id = frames[0].bytes
+        if not reply_id:
+            raise zmq_codec.MalformedMessage("Client identity expected")
+        if frames[1].bytes:
+            raise zmq_codec.MalformedMessage("Empty delimiter expected")
+        # only the small header frames are copied, the body frame is sent
+        # as received
+        request = [frame.bytes for frame in frames[2:-1]] + frames[-1:]
+        # the identity of the client is only needed to route a reply back
+        if zmq_codec.get_msg_type(request) == zmq_names.CALL_TYPE:
+            request[zmq_codec.IDX_REPLY_ID] = reply_id
+        return request
+
+    def cleanup(self):
+        self.router_socket.close(linger=0)
+        self.direct_publisher.cleanup()
+        self.pub_publisher.cleanup()
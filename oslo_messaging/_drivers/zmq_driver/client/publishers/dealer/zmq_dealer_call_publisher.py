@@ -12,11 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import logging
-import threading
 
 from concurrent import futures
 import futurist
+from oslo_utils import eventletutils
 
 import oslo_messaging
 from oslo_messaging._drivers import common as rpc_common
@@ -24,13 +25,18 @@ from oslo_messaging._drivers.zmq_driver.client.publishers\
     import zmq_publisher_base
 from oslo_messaging._drivers.zmq_driver import zmq_address
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
 from oslo_messaging._drivers.zmq_driver import zmq_socket
-from oslo_messaging._i18n import _LW
+from oslo_messaging._i18n import _LE, _LW
 
 LOG = logging.getLogger(__name__)
 
 zmq = zmq_async.import_zmq()
+native_zmq = zmq_async.import_zmq(zmq_concurrency='native')
+
+if eventletutils.EVENTLET_AVAILABLE:
+    import eventlet
 
 
 class DealerCallPublisher(zmq_publisher_base.PublisherBase):
@@ -38,6 +44,12 @@ class DealerCallPublisher(zmq_publisher_base.PublisherBase):
 
         Used as faster and thread-safe publisher for CALL
         instead of ReqPublisher.
+
+        The replies are dispatched to the waiting calls by their message id,
+        all the replies ready on a wakeup at once.  With
+        rpc_zmq_native_reply_thread the requests are sent and the replies
+        received by a native thread owning the sockets, the green threads
+        only hand it the requests.
     """
 
     def __init__(self, conf, matchmaker):
@@ -66,42 +78,49 @@ class DealerCallPublisher(zmq_publisher_base.PublisherBase):
         else:
             return reply[zmq_names.FIELD_REPLY]
 
+    def cleanup(self):
+        self.sender.stop()
+        self.reply_waiter.cleanup()
+        self.sender.cleanup()
+        super(DealerCallPublisher, self).cleanup()
+
 
 class RequestSender(zmq_publisher_base.PublisherMultisend):
 
     def __init__(self, conf, matchmaker, reply_waiter):
-        super(RequestSender, self).__init__(conf, matchmaker, zmq.DEALER)
+        zmq_context = native_zmq.Context() if reply_waiter.native else None
+        super(RequestSender, self).__init__(conf, matchmaker, zmq.DEALER,
+                                            zmq_context=zmq_context)
         self.reply_waiter = reply_waiter
-        self.queue, self.empty_except = zmq_async.get_queue()
-        self.executor = zmq_async.get_executor(self.run_loop)
-        self.executor.execute()
+        self.executor = None
+        if not reply_waiter.native:
+            self.queue, self.empty_except = zmq_async.get_queue()
+            self.executor = zmq_async.get_executor(self.run_loop)
+            self.executor.execute()
 
     def send_request(self, request):
         reply_future = futurist.Future()
         self.reply_waiter.track_reply(reply_future, request.message_id)
-        self.queue.put(request)
+        if self.executor is None:
+            self.reply_waiter.run_in_thread(
+                functools.partial(self._send, request))
+        else:
+            self.queue.put(request)
         return reply_future
 
     def _do_send_request(self, socket, request):
-        socket.send(b'', zmq.SNDMORE)
-        socket.send_pyobj(request)
+        socket.send_multipart(
+            [b''] + zmq_codec.encode_request(request, self.codec))
 
         LOG.debug("Sending message_id %(message)s to a target %(target)s",
                   {"message": request.message_id, "target": request.target})
 
-    def _check_hosts_connections(self, target, listener_type):
-        if str(target) in self.outbound_sockets:
-            socket = self.outbound_sockets[str(target)]
-        else:
-            hosts = self.matchmaker.get_hosts(
-                target, listener_type)
-            socket = zmq_socket.ZmqSocket(self.zmq_context, self.socket_type)
-            self.outbound_sockets[str(target)] = socket
-
-            for host in hosts:
-                self._connect_to_host(socket, host, target)
+    def _send(self, request):
+        socket = self._check_hosts_connections(
+            request.target, zmq_names.socket_type_str(zmq.ROUTER))
 
-        return socket
+        self._do_send_request(socket, request)
+        self.reply_waiter.poll_socket(socket)
 
     def run_loop(self):
         try:
@@ -109,11 +128,15 @@ class RequestSender(zmq_publisher_base.PublisherMultisend):
         except self.empty_except:
             return
 
-        socket = self._check_hosts_connections(
-            request.target, zmq_names.socket_type_str(zmq.ROUTER))
+        self._send(request)
 
-        self._do_send_request(socket, request)
-        self.reply_waiter.poll_socket(socket)
+    def stop(self):
+        if self.executor is not None:
+            self.executor.stop()
+
+    def _close_socket(self, socket):
+        self.reply_waiter.unpoll_socket(socket)
+        super(RequestSender, self)._close_socket(socket)
 
 
 class RequestSenderLight(RequestSender):
@@ -133,66 +156,123 @@ class RequestSenderLight(RequestSender):
         self.socket = None
 
     def _check_hosts_connections(self, target, listener_type):
-        if self.socket is None:
-            self.socket = zmq_socket.ZmqSocket(self.zmq_context,
-                                               self.socket_type)
-            self.outbound_sockets[str(target)] = self.socket
-            address = zmq_address.get_broker_address(self.conf)
-            self._connect_to_address(self.socket, address, target)
+        with self._sockets_lock:
+            if self.socket is None:
+                socket = zmq_socket.ZmqSocket(self.zmq_context,
+                                              self.socket_type)
+                self.outbound_sockets[str(target)] = socket
+                address = zmq_address.get_broker_address(self.conf)
+                self._connect_to_address(socket, address, target)
+                self.socket = socket
         return self.socket
 
-    def _do_send_request(self, socket, request):
-        LOG.debug("Sending %(type)s message_id %(message)s"
-                  " to a target %(target)s",
-                  {"type": request.msg_type,
-                   "message": request.message_id,
-                   "target": request.target})
-
-        envelope = request.create_envelope()
-
-        socket.send(b'', zmq.SNDMORE)
-        socket.send_pyobj(envelope, zmq.SNDMORE)
-        socket.send_pyobj(request)
-
 
 class ReplyWaiter(object):
+    """Dispatch the replies to the futures of the calls by message id.
+
+    The futures are tracked without a lock, adding and removing a key of a
+    dict being atomic.  With rpc_zmq_native_reply_thread the sockets are
+    polled by a native thread, which also runs the sends handed to
+    run_in_thread().  When the threads are monkey patched a green thread
+    sets the results of the futures, as green threads can not be woken up
+    from a native one.
+    """
 
     def __init__(self, conf):
         self.conf = conf
+        self.native = conf.rpc_zmq_native_reply_thread
         self.replies = {}
-        self.poller = zmq_async.get_poller()
-        self.executor = zmq_async.get_executor(self.run_loop)
+        self._calls = None
+        self._results = None
+        self._dispatcher = None
+        if self.native:
+            self.poller = zmq_async.get_poller(zmq_concurrency='native')
+            self._calls = rpc_common.Handoff()
+            self.poller.register(self._calls.fileno(),
+                                 recv_method=self._run_calls)
+            if eventletutils.EVENTLET_AVAILABLE and \
+                    eventlet.patcher.is_monkey_patched('thread'):
+                self._results = rpc_common.Handoff()
+                self._dispatcher = zmq_async.get_executor(
+                    self._dispatch_loop)
+                self._dispatcher.execute()
+            self.executor = zmq_async.get_executor(
+                self.run_loop, zmq_concurrency='native')
+        else:
+            self.poller = zmq_async.get_poller()
+            self.executor = zmq_async.get_executor(self.run_loop)
         self.executor.execute()
-        self._lock = threading.Lock()
 
     def track_reply(self, reply_future, message_id):
-        self._lock.acquire()
         self.replies[message_id] = reply_future
-        self._lock.release()
 
     def untrack_id(self, message_id):
-        self._lock.acquire()
-        self.replies.pop(message_id)
-        self._lock.release()
+        self.replies.pop(message_id, None)
+
+    def run_in_thread(self, call):
+        self._calls.put(call)
+
+    def _run_calls(self, fd):
+        for call in self._calls.get_all():
+            try:
+                call()
+            except Exception:
+                LOG.exception(_LE("Failed to send a request"))
 
     def poll_socket(self, socket):
 
         def _receive_method(socket):
-            empty = socket.recv()
-            assert empty == b'', "Empty expected!"
-            reply = socket.recv_pyobj()
+            frames = socket.recv_multipart()
+            try:
+                if not frames or frames[0] != b'':
+                    raise zmq_codec.MalformedMessage(
+                        "Empty delimiter expected")
+                reply = zmq_codec.decode_reply(frames[1:])
+            except zmq_codec.MalformedMessage as e:
+                LOG.error(_LE("Dropping reply: %s"), e)
+                return None
             LOG.debug("Received reply %s", reply)
             return reply
 
-        self.poller.register(socket, recv_method=_receive_method)
+        self.poller.register(socket.handle, recv_method=_receive_method)
+
+    def unpoll_socket(self, socket):
+        self.poller.unregister(socket.handle)
+
+    def _dispatch(self, reply):
+        reply_id = reply[zmq_names.FIELD_MSG_ID]
+        call_future = self.replies.get(reply_id)
+        if call_future:
+            call_future.set_result(reply)
+        else:
+            LOG.warning(_LW("Received timed out reply: %s"), reply_id)
+
+    def _dispatch_loop(self):
+        eventlet.hubs.trampoline(self._results.fileno(), read=True)
+        for reply in self._results.get_all():
+            self._dispatch(reply)
 
     def run_loop(self):
         reply, socket = self.poller.poll(
             timeout=self.conf.rpc_poll_timeout)
-        if reply is not None:
-            reply_id = reply[zmq_names.FIELD_MSG_ID]
-            call_future = self.replies.get(reply_id)
-            if call_future:
-                call_future.set_result(reply)
-            else:
-                LOG.warning(_LW("Received timed out reply: %s"), reply_id)
+        # dispatch all the replies already received before waiting again
+        while socket is not None:
+            if reply is not None:
+                if self._results is not None:
+                    self._results.put(reply)
+                else:
+                    self._dispatch(reply)
+            reply, socket = self.poller.poll(timeout=0)
+
+    def cleanup(self):
+        self.executor.stop()
+        if self.native:
+            # wake the native thread up rather than waiting for its poll
+            # timeout
+            self.run_in_thread(lambda: None)
+            self.executor.wait()
+            self._calls.close()
+        if self._dispatcher is not None:
+            self._dispatcher.stop()
+            self._results.close()
+        self.poller.close()
@@ -17,6 +17,7 @@ import logging
 from oslo_messaging._drivers.zmq_driver.client.publishers\
     import zmq_publisher_base
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
 from oslo_messaging._i18n import _LW
 
@@ -27,8 +28,9 @@ zmq = zmq_async.import_zmq()
 
 class DealerPublisher(zmq_publisher_base.PublisherMultisend):
 
-    def __init__(self, conf, matchmaker):
-        super(DealerPublisher, self).__init__(conf, matchmaker, zmq.DEALER)
+    def __init__(self, conf, matchmaker, zmq_context=None):
+        super(DealerPublisher, self).__init__(conf, matchmaker, zmq.DEALER,
+                                              zmq_context)
 
     def send_request(self, request):
 
@@ -58,8 +60,8 @@ class DealerPublisher(zmq_publisher_base.PublisherMultisend):
 
     def _send_request(self, socket, request):
 
-        socket.send(b'', zmq.SNDMORE)
-        socket.send_pyobj(request)
+        socket.send_multipart(
+            [b''] + zmq_codec.encode_request(request, self.codec))
 
         LOG.debug("Sending message_id %(message)s to a target %(target)s",
                   {"message": request.message_id, "target": request.target})
@@ -82,11 +84,8 @@ class DealerPublisherLight(zmq_publisher_base.PublisherBase):
         if request.msg_type == zmq_names.CALL_TYPE:
             raise zmq_publisher_base.UnsupportedSendPattern(request.msg_type)
 
-        envelope = request.create_envelope()
-
-        self.socket.send(b'', zmq.SNDMORE)
-        self.socket.send_pyobj(envelope, zmq.SNDMORE)
-        self.socket.send_pyobj(request)
+        self.socket.send_multipart(
+            [b''] + zmq_codec.encode_request(request, self.codec))
 
         LOG.debug("->[proxy:%(addr)s] Sending message_id %(message)s to "
                   "a target %(target)s",
@@ -109,15 +108,15 @@ class AcknowledgementReceiver(object):
     def _receive_acknowledgement(self, socket):
         empty = socket.recv()
         assert empty == b"", "Empty delimiter expected"
-        ack_message = socket.recv_pyobj()
-        return ack_message
+        message_id = socket.recv()
+        return message_id
 
     def track_socket(self, socket):
         self.poller.register(socket, self._receive_acknowledgement)
 
     def poll_for_acknowledgements(self):
-        ack_message, socket = self.poller.poll()
-        LOG.debug("Message %s acknowledged", ack_message[zmq_names.FIELD_ID])
+        message_id, socket = self.poller.poll()
+        LOG.debug("Message %s acknowledged", message_id)
 
     def cleanup(self):
         self.thread.stop()
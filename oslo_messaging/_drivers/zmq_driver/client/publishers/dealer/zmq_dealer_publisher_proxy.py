@@ -17,6 +17,7 @@ import logging
 from oslo_messaging._drivers.zmq_driver.client.publishers.dealer \
     import zmq_dealer_publisher
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
 from oslo_messaging._i18n import _LI, _LW
 
@@ -27,17 +28,15 @@ LOG = logging.getLogger(__name__)
 
 class DealerPublisherProxy(zmq_dealer_publisher.DealerPublisher):
 
-    def __init__(self, conf, matchmaker, reply_receiver):
-        super(DealerPublisherProxy, self).__init__(conf, matchmaker)
+    def __init__(self, conf, matchmaker, reply_receiver, zmq_context=None):
+        super(DealerPublisherProxy, self).__init__(conf, matchmaker,
+                                                   zmq_context)
         self.reply_receiver = reply_receiver
 
     def send_request(self, multipart_message):
 
-        envelope = multipart_message[zmq_names.MULTIPART_IDX_ENVELOPE]
-
-        LOG.debug("Envelope: %s", envelope)
-
-        target = envelope[zmq_names.FIELD_TARGET]
+        msg_type = zmq_codec.get_msg_type(multipart_message)
+        target = zmq_codec.get_target(multipart_message)
         dealer_socket = self._check_hosts_connections(
             target, zmq_names.socket_type_str(zmq.ROUTER))
 
@@ -47,16 +46,16 @@ class DealerPublisherProxy(zmq_dealer_publisher.DealerPublisher):
             # when some listener appears. However such approach
             # being more reliable will consume additional memory.
             LOG.warning(_LW("Request %s was dropped because no connection"),
-                        envelope[zmq_names.FIELD_MSG_TYPE])
+                        msg_type)
             return
 
         self.reply_receiver.track_socket(dealer_socket.handle)
 
-        LOG.debug("Sending message %(message)s to a target %(target)s"
-                  % {"message": envelope[zmq_names.FIELD_MSG_ID],
-                     "target": envelope[zmq_names.FIELD_TARGET]})
+        LOG.debug("Sending message %(message)s to a target %(target)s",
+                  {"message": multipart_message[zmq_codec.IDX_MSG_ID],
+                   "target": target})
 
-        if envelope[zmq_names.FIELD_MSG_TYPE] in zmq_names.MULTISEND_TYPES:
+        if msg_type in zmq_names.MULTISEND_TYPES:
             for _ in range(dealer_socket.connections_count()):
                 self._send_request(dealer_socket, multipart_message)
         else:
@@ -64,11 +63,11 @@ class DealerPublisherProxy(zmq_dealer_publisher.DealerPublisher):
 
     def _send_request(self, socket, multipart_message):
 
-        socket.send(b'', zmq.SNDMORE)
-        socket.send_pyobj(
-            multipart_message[zmq_names.MULTIPART_IDX_ENVELOPE],
-            zmq.SNDMORE)
-        socket.send(multipart_message[zmq_names.MULTIPART_IDX_BODY])
+        socket.send_multipart([b''] + multipart_message, copy=False)
+
+    def _close_socket(self, socket):
+        self.reply_receiver.untrack_socket(socket.handle)
+        super(DealerPublisherProxy, self)._close_socket(socket)
 
 
 class ReplyReceiver(object):
@@ -78,10 +77,13 @@ class ReplyReceiver(object):
         LOG.info(_LI("Reply waiter created in broker"))
 
     def _receive_reply(self, socket):
-        return socket.recv_multipart()
+        return socket.recv_multipart(copy=False)
 
     def track_socket(self, socket):
         self.poller.register(socket, self._receive_reply)
 
+    def untrack_socket(self, socket):
+        self.poller.unregister(socket)
+
     def cleanup(self):
         self.poller.close()
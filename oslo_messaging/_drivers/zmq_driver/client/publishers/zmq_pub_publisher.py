@@ -18,6 +18,7 @@ from oslo_messaging._drivers.zmq_driver.client.publishers\
     import zmq_publisher_base
 from oslo_messaging._drivers.zmq_driver import zmq_address
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
 from oslo_messaging._drivers.zmq_driver import zmq_socket
 from oslo_messaging._i18n import _LI
@@ -41,8 +42,8 @@ class PubPublisherProxy(zmq_publisher_base.PublisherBase):
         Target object.
     """
 
-    def __init__(self, conf, matchmaker):
-        super(PubPublisherProxy, self).__init__(conf)
+    def __init__(self, conf, matchmaker, zmq_context=None):
+        super(PubPublisherProxy, self).__init__(conf, zmq_context)
         self.matchmaker = matchmaker
 
         self.socket = zmq_socket.ZmqRandomPortSocket(
@@ -62,17 +63,16 @@ class PubPublisherProxy(zmq_publisher_base.PublisherBase):
 
     def send_request(self, multipart_message):
 
-        envelope = multipart_message[zmq_names.MULTIPART_IDX_ENVELOPE]
-        msg_type = envelope[zmq_names.FIELD_MSG_TYPE]
-        target = envelope[zmq_names.FIELD_TARGET]
-        message_id = envelope[zmq_names.FIELD_MSG_ID]
+        msg_type = zmq_codec.get_msg_type(multipart_message)
+        target = zmq_codec.get_target(multipart_message)
+        message_id = multipart_message[zmq_codec.IDX_MSG_ID]
         if msg_type not in zmq_names.MULTISEND_TYPES:
             raise zmq_publisher_base.UnsupportedSendPattern(msg_type)
 
         topic_filter = zmq_address.target_to_subscribe_filter(target)
 
-        self.socket.send(topic_filter, zmq.SNDMORE)
-        self.socket.send(multipart_message[zmq_names.MULTIPART_IDX_BODY])
+        self.socket.send_multipart([topic_filter] + multipart_message,
+                                   copy=False)
 
         LOG.debug("Publishing message [%(topic)s] %(message_id)s to "
                   "a target %(target)s ",
@@ -85,6 +85,7 @@ class PubPublisherProxy(zmq_publisher_base.PublisherBase):
             (self.host, self.sync_channel.sync_host))
         self.socket.setsockopt(zmq.LINGER, 0)
         self.socket.close()
+        self.sync_channel.cleanup()
 
 
 class SyncChannel(object):
@@ -107,8 +108,8 @@ class SyncChannel(object):
         #  implement them
         self.sync_socket = zmq_socket.ZmqRandomPortSocket(
             self.conf, self.context, zmq.PULL)
-        self.poller = zmq_async.get_poller()
-        self.poller.register(self.sync_socket)
+        self.poller = zmq_async.get_poller(zmq_concurrency='native')
+        self.poller.register(self.sync_socket.handle)
 
         self.sync_host = zmq_address.combine_address(self.conf.rpc_zmq_host,
                                                      self.sync_socket.port)
@@ -121,3 +122,8 @@ class SyncChannel(object):
             LOG.debug("[%s] Received ready from first subscriber",
                       self.sync_host)
         return self._ready is not None
+
+    def cleanup(self):
+        self.sync_socket.setsockopt(zmq.LINGER, 0)
+        self.sync_socket.close()
+        self.poller.close()
@@ -13,7 +13,10 @@
 #    under the License.
 
 import abc
+import collections
 import logging
+import threading
+import time
 import uuid
 
 import six
@@ -21,6 +24,7 @@ import six
 from oslo_messaging._drivers import common as rpc_common
 from oslo_messaging._drivers.zmq_driver import zmq_address
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
 from oslo_messaging._drivers.zmq_driver import zmq_socket
 from oslo_messaging._i18n import _LE, _LI
@@ -57,7 +61,7 @@ class PublisherBase(object):
     Publisher can send request objects from zmq_request.
     """
 
-    def __init__(self, conf):
+    def __init__(self, conf, zmq_context=None):
 
         """Construct publisher
 
@@ -66,10 +70,14 @@ class PublisherBase(object):
 
         :param conf: configuration object
         :type conf: oslo_config.CONF
+        :param zmq_context: Optional context to create the sockets in,
+                            a new one by default
+        :type zmq_context: zmq.Context
         """
 
         self.conf = conf
-        self.zmq_context = zmq.Context()
+        self.codec = zmq_codec.get_codec(conf.rpc_zmq_serialization)
+        self.zmq_context = zmq_context or zmq.Context()
         self.outbound_sockets = {}
         super(PublisherBase, self).__init__()
 
@@ -95,7 +103,7 @@ class PublisherBase(object):
                   {"type": request.msg_type,
                    "message": request.message_id,
                    "target": request.target})
-        socket.send_pyobj(request)
+        socket.send_multipart(zmq_codec.encode_request(request, self.codec))
 
     def cleanup(self):
         """Cleanup publisher. Close allocated connections."""
@@ -106,34 +114,92 @@ class PublisherBase(object):
 
 class PublisherMultisend(PublisherBase):
 
-    def __init__(self, conf, matchmaker, socket_type):
+    def __init__(self, conf, matchmaker, socket_type, zmq_context=None):
 
         """Construct publisher multi-send
 
         Base class for fanout-sending publishers.
 
+        The sockets of the targets are kept from the least to the most
+        recently used one. The least recently used sockets are closed when
+        there are more than rpc_zmq_target_sockets of them, as are the
+        sockets unused for rpc_zmq_target_socket_idle_timeout seconds. The
+        hosts of a target are looked up in the matchmaker every
+        rpc_zmq_target_hosts_interval seconds, its socket then connects to
+        the new hosts and disconnects from the gone ones. The sockets are
+        created, updated and closed under a lock, as the publisher is shared
+        by the threads sending messages.
+
         :param conf: configuration object
         :type conf: oslo_config.CONF
         :param matchmaker: Name Service interface object
         :type matchmaker: matchmaker.MatchMakerBase
         """
-        super(PublisherMultisend, self).__init__(conf)
+        super(PublisherMultisend, self).__init__(conf, zmq_context)
         self.socket_type = socket_type
         self.matchmaker = matchmaker
+        self.outbound_sockets = collections.OrderedDict()
+        # (last use, last hosts lookup) of the sockets, indexed by target
+        self._sockets_times = {}
+        self._sockets_lock = threading.Lock()
 
     def _check_hosts_connections(self, target, listener_type):
-        #  TODO(ozamiatin): Place for significant optimization
-        #  Matchmaker cache should be implemented
-        if str(target) in self.outbound_sockets:
-            socket = self.outbound_sockets[str(target)]
-        else:
-            hosts = self.matchmaker.get_hosts(target, listener_type)
-            socket = zmq_socket.ZmqSocket(self.zmq_context, self.socket_type)
-            self.outbound_sockets[str(target)] = socket
-            for host in hosts:
-                self._connect_to_host(socket, host, target)
+        key = str(target)
+        with self._sockets_lock:
+            now = time.time()
+            socket = self.outbound_sockets.get(key)
+            if socket is None:
+                socket = zmq_socket.ZmqSocket(self.zmq_context,
+                                              self.socket_type)
+                looked_up = None
+            else:
+                # moved last, as the most recently used socket
+                del self.outbound_sockets[key]
+                looked_up = self._sockets_times[key][1]
+            self.outbound_sockets[key] = socket
+            self._sockets_times[key] = (now, looked_up)
+            # a target without any host is looked up again for every message
+            if looked_up is None or not socket.connections or \
+                    now - looked_up >= self.conf.rpc_zmq_target_hosts_interval:
+                self._update_hosts(socket, target, listener_type)
+                self._sockets_times[key] = (now, now)
+            self._evict_sockets(now, key)
         return socket
 
+    def _update_hosts(self, socket, target, listener_type):
+        hosts = self.matchmaker.get_hosts(target, listener_type)
+        addresses = set()
+        for host in hosts:
+            address = zmq_address.get_tcp_direct_address(host)
+            addresses.add(address)
+            if address not in socket.connections:
+                self._connect_to_host(socket, host, target)
+        for address in socket.connections - addresses:
+            LOG.info(_LI("Disconnecting from %(address)s for %(target)s"),
+                     {"address": address, "target": target})
+            socket.disconnect(address)
+
+    def _evict_sockets(self, now, used_key):
+        idle_timeout = self.conf.rpc_zmq_target_socket_idle_timeout
+        while self.outbound_sockets:
+            key = next(iter(self.outbound_sockets))
+            if key == used_key:
+                break
+            last_used = self._sockets_times[key][0]
+            if len(self.outbound_sockets) <= \
+                    self.conf.rpc_zmq_target_sockets and \
+                    (not idle_timeout or now - last_used < idle_timeout):
+                break
+            LOG.debug("Closing the socket of %s", key)
+            socket = self.outbound_sockets.pop(key)
+            del self._sockets_times[key]
+            self._close_socket(socket)
+
+    def _close_socket(self, socket):
+        """Close a socket evicted from outbound_sockets."""
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.close()
+
     def _connect_to_address(self, socket, address, target):
         stype = zmq_names.socket_type_str(self.socket_type)
         try:
@@ -14,13 +14,13 @@
 
 import abc
 import logging
-import uuid
 
 import six
 
 from oslo_messaging._drivers.zmq_driver import zmq_async
 from oslo_messaging._drivers.zmq_driver import zmq_names
 from oslo_messaging._i18n import _LE
+from oslo_messaging import _utils as utils
 
 LOG = logging.getLogger(__name__)
 
@@ -67,14 +67,9 @@ class Request(object):
             raise ValueError(
                 "retry must be an integer, not {0}".format(type(retry)))
 
-        self.message_id = str(uuid.uuid1())
+        self.message_id = utils.generate_id()
         self.proxy_reply_id = None
 
-    def create_envelope(self):
-        return {'msg_type': self.msg_type,
-                'message_id': self.message_id,
-                'target': self.target}
-
     @abc.abstractproperty
     def msg_type(self):
         """ZMQ message type"""
@@ -102,11 +97,6 @@ class RpcRequest(Request):
 
         super(RpcRequest, self).__init__(*args, **kwargs)
 
-    def create_envelope(self):
-        envelope = super(RpcRequest, self).create_envelope()
-        envelope['timeout'] = self.timeout
-        return envelope
-
 
 class CallRequest(RpcRequest):
 
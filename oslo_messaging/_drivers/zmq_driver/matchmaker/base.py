@@ -107,6 +107,18 @@ class MatchMakerBase(object):
        :returns: a list of "hostname:port" hosts
        """
 
+    def watch(self, callback):
+        """Watch the updates of the nameserver.
+
+       The callback is invoked with the key of each updated list of hosts,
+       or with None when any key may have been updated, from another thread.
+
+       :param callback: invoked with the updated key
+       :type callback: callable
+       :returns: True if the updates are watched, False if not supported
+       """
+        return False
+
 
 class DummyMatchMaker(MatchMakerBase):
 
@@ -0,0 +1,109 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import time
+
+from stevedore import driver
+
+from oslo_messaging._drivers.zmq_driver.matchmaker import base
+from oslo_messaging._drivers.zmq_driver import zmq_address
+
+
+LOG = logging.getLogger(__name__)
+
+
+def get_matchmaker(conf):
+    """Load the configured matchmaker, wrapped by a cache if enabled."""
+    matchmaker = driver.DriverManager(
+        'oslo.messaging.zmq.matchmaker',
+        conf.rpc_zmq_matchmaker,
+    ).driver(conf)
+    if conf.rpc_zmq_matchmaker_cache_ttl or \
+            conf.rpc_zmq_matchmaker_negative_ttl:
+        matchmaker = CachedMatchMaker(conf, matchmaker,
+                                      conf.rpc_zmq_matchmaker_cache_ttl,
+                                      conf.rpc_zmq_matchmaker_negative_ttl)
+    return matchmaker
+
+
+class CachedMatchMaker(base.MatchMakerBase):
+    """Cache the hosts of the targets looked up in another matchmaker.
+
+    Hosts are kept for ttl seconds, and targets without any host for
+    negative_ttl seconds. Registrations done through this matchmaker
+    invalidate the cached keys at once, and the keys updated by other
+    processes are invalidated when the wrapped matchmaker can watch the
+    updates of the name service.
+    """
+
+    _CACHE_SIZE = 1024
+
+    def __init__(self, conf, matchmaker, ttl, negative_ttl, *args, **kwargs):
+        super(CachedMatchMaker, self).__init__(conf, *args, **kwargs)
+        self.matchmaker = matchmaker
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        # (hosts, expiration time) indexed by key
+        self._cache = {}
+        self._watching = matchmaker.watch(self._invalidate)
+
+    def _invalidate(self, key):
+        LOG.debug("Matchmaker key %s updated", key)
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    def _invalidate_target(self, target, listener_type):
+        self._invalidate(zmq_address.target_to_key(target, listener_type))
+        if target.topic:
+            self._invalidate(zmq_address.prefix_str(target.topic,
+                                                    listener_type))
+        if target.server:
+            self._invalidate(zmq_address.prefix_str(target.server,
+                                                    listener_type))
+
+    def register_publisher(self, hostname):
+        self.matchmaker.register_publisher(hostname)
+
+    def unregister_publisher(self, hostname):
+        self.matchmaker.unregister_publisher(hostname)
+
+    def get_publishers(self):
+        return self.matchmaker.get_publishers()
+
+    def register(self, target, hostname, listener_type):
+        self.matchmaker.register(target, hostname, listener_type)
+        self._invalidate_target(target, listener_type)
+
+    def unregister(self, target, hostname, listener_type):
+        self.matchmaker.unregister(target, hostname, listener_type)
+        self._invalidate_target(target, listener_type)
+
+    def get_hosts(self, target, listener_type):
+        key = zmq_address.target_to_key(target, listener_type)
+        entry = self._cache.get(key)
+        now = time.time()
+        if entry is not None and entry[1] > now:
+            return list(entry[0])
+
+        hosts = self.matchmaker.get_hosts(target, listener_type)
+        ttl = self._ttl if hosts else self._negative_ttl
+        if ttl > 0:
+            if len(self._cache) >= self._CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = (list(hosts), now + ttl)
+        return hosts
+
+    def watch(self, callback):
+        return self.matchmaker.watch(callback)
@@ -12,12 +12,15 @@
 #    under the License.
 
 import logging
+import threading
+import time
 
 from oslo_config import cfg
 from oslo_utils import importutils
 
 from oslo_messaging._drivers.zmq_driver.matchmaker import base
 from oslo_messaging._drivers.zmq_driver import zmq_address
+from oslo_messaging._i18n import _LW
 
 redis = importutils.try_import('redis')
 LOG = logging.getLogger(__name__)
@@ -37,6 +40,8 @@ matchmaker_redis_opts = [
 ]
 
 _PUBLISHERS_KEY = "PUBLISHERS"
+# the updated keys are published on this channel
+_UPDATES_CHANNEL = "UPDATES"
 
 
 class RedisMatchMaker(base.MatchMakerBase):
@@ -50,15 +55,31 @@ class RedisMatchMaker(base.MatchMakerBase):
             port=self.conf.matchmaker_redis.port,
             password=self.conf.matchmaker_redis.password,
         )
+        self._watcher = None
+        self._callbacks = []
+
+    def _add_host(self, pipe, key, hostname):
+        # removing the host first avoids a round trip to check whether it is
+        # already registered
+        pipe.lrem(key, 0, hostname)
+        pipe.lpush(key, hostname)
+        pipe.publish(_UPDATES_CHANNEL, key)
+
+    def _remove_host(self, pipe, key, hostname):
+        pipe.lrem(key, 0, hostname)
+        pipe.publish(_UPDATES_CHANNEL, key)
 
     def register_publisher(self, hostname):
         host_str = ",".join(hostname)
-        if host_str not in self._get_hosts_by_key(_PUBLISHERS_KEY):
-            self._redis.lpush(_PUBLISHERS_KEY, host_str)
+        pipe = self._redis.pipeline(transaction=False)
+        self._add_host(pipe, _PUBLISHERS_KEY, host_str)
+        pipe.execute()
 
     def unregister_publisher(self, hostname):
         host_str = ",".join(hostname)
-        self._redis.lrem(_PUBLISHERS_KEY, 0, host_str)
+        pipe = self._redis.pipeline(transaction=False)
+        self._remove_host(pipe, _PUBLISHERS_KEY, host_str)
+        pipe.execute()
 
     def get_publishers(self):
         hosts = []
@@ -71,28 +92,67 @@ class RedisMatchMaker(base.MatchMakerBase):
         return self._redis.lrange(key, 0, -1)
 
     def register(self, target, hostname, listener_type):
+        pipe = self._redis.pipeline(transaction=False)
 
         if target.topic and target.server:
             key = zmq_address.target_to_key(target, listener_type)
-            if hostname not in self._get_hosts_by_key(key):
-                self._redis.lpush(key, hostname)
+            self._add_host(pipe, key, hostname)
 
         if target.topic:
             key = zmq_address.prefix_str(target.topic, listener_type)
-            if hostname not in self._get_hosts_by_key(key):
-                self._redis.lpush(key, hostname)
+            self._add_host(pipe, key, hostname)
 
         if target.server:
             key = zmq_address.prefix_str(target.server, listener_type)
-            if hostname not in self._get_hosts_by_key(key):
-                self._redis.lpush(key, hostname)
+            self._add_host(pipe, key, hostname)
+
+        pipe.execute()
 
     def unregister(self, target, hostname, listener_type):
         key = zmq_address.target_to_key(target, listener_type)
-        self._redis.lrem(key, 0, hostname)
+        pipe = self._redis.pipeline(transaction=False)
+        self._remove_host(pipe, key, hostname)
+        pipe.execute()
 
     def get_hosts(self, target, listener_type):
         hosts = []
         key = zmq_address.target_to_key(target, listener_type)
         hosts.extend(self._get_hosts_by_key(key))
         return hosts
+
+    def watch(self, callback):
+        self._callbacks.append(callback)
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch_updates,
+                                             name="matchmaker_redis watcher")
+            self._watcher.daemon = True
+            self._watcher.start()
+        return True
+
+    def _watch_updates(self):
+        pubsub = self._redis.pubsub()
+        subscribed = False
+        connected = True
+        while True:
+            try:
+                if not subscribed:
+                    pubsub.subscribe(_UPDATES_CHANNEL)
+                    subscribed = True
+                for message in pubsub.listen():
+                    connected = True
+                    if message['type'] != 'message':
+                        continue
+                    key = message['data']
+                    if isinstance(key, bytes):
+                        key = key.decode('utf-8')
+                    for callback in self._callbacks:
+                        callback(key)
+            except redis.exceptions.ConnectionError as e:
+                # the subscription is restored when listening again, but
+                # the updates published meanwhile are lost
+                if connected:
+                    LOG.warning(_LW("Lost the matchmaker updates: %s"), e)
+                    connected = False
+                time.sleep(1)
+                for callback in self._callbacks:
+                    callback(None)
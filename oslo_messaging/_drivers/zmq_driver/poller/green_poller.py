@@ -34,6 +34,11 @@ class GreenPoller(zmq_poller.ZmqPoller):
             self.thread_by_socket[socket] = self.green_pool.spawn(
                 self._socket_receive, socket, recv_method)
 
+    def unregister(self, socket):
+        thread = self.thread_by_socket.pop(socket, None)
+        if thread is not None:
+            thread.kill()
+
     def _socket_receive(self, socket, recv_method=None):
         while True:
             if recv_method:
@@ -67,6 +72,10 @@ class HoldReplyPoller(GreenPoller):
         super(HoldReplyPoller, self).register(socket, recv_method)
         self.event_by_socket[socket] = threading.Event()
 
+    def unregister(self, socket):
+        super(HoldReplyPoller, self).unregister(socket)
+        self.event_by_socket.pop(socket, None)
+
     def resume_polling(self, socket):
         pause = self.event_by_socket[socket]
         pause.set()
@@ -45,6 +45,14 @@ class ThreadingPoller(zmq_poller.ZmqPoller):
             self.recv_methods[socket] = recv_method
         self.poller.register(socket, zmq.POLLIN)
 
+    def unregister(self, socket):
+        if socket in self.recv_methods:
+            del self.recv_methods[socket]
+        try:
+            self.poller.unregister(socket)
+        except KeyError:
+            pass
+
     def poll(self, timeout=None):
 
         if timeout:
@@ -18,6 +18,7 @@ from oslo_messaging._drivers import base
 from oslo_messaging._drivers.zmq_driver.server.consumers\
     import zmq_consumer_base
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
 from oslo_messaging._i18n import _LE, _LI
 
@@ -52,17 +53,19 @@ class PullConsumer(zmq_consumer_base.SingleSocketConsumer):
 
     def receive_message(self, socket):
         try:
-            msg_type = socket.recv_string()
-            assert msg_type is not None, 'Bad format: msg type expected'
-            context = socket.recv_pyobj()
-            message = socket.recv_pyobj()
+            request = zmq_codec.ReceivedRequest(socket.recv_multipart())
             LOG.debug("Received %(msg_type)s message %(msg)s",
-                      {"msg_type": msg_type, "msg": str(message)})
+                      {"msg_type": request.msg_type,
+                       "msg": str(request.message)})
 
-            if msg_type in (zmq_names.CAST_TYPES + zmq_names.NOTIFY_TYPES):
-                return PullIncomingMessage(self.server, context, message)
+            if request.msg_type in (zmq_names.CAST_TYPES +
+                                    zmq_names.NOTIFY_TYPES):
+                return PullIncomingMessage(self.server, request.context,
+                                           request.message)
             else:
-                LOG.error(_LE("Unknown message type: %s"), msg_type)
+                LOG.error(_LE("Unknown message type: %s"), request.msg_type)
 
         except zmq.ZMQError as e:
             LOG.error(_LE("Receiving message failed: %s"), str(e))
+        except zmq_codec.MalformedMessage as e:
+            LOG.error(_LE("Dropping malformed message: %s"), e)
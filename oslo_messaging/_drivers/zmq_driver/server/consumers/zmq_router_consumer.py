@@ -20,6 +20,7 @@ from oslo_messaging._drivers.zmq_driver.server.consumers\
 from oslo_messaging._drivers.zmq_driver.server import zmq_incoming_message
 from oslo_messaging._drivers.zmq_driver import zmq_address
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
 from oslo_messaging._i18n import _LE, _LI
 
@@ -75,10 +76,11 @@ class RouterConsumer(zmq_consumer_base.SingleSocketConsumer):
                                        zmq_names.socket_type_str(zmq.ROUTER))
 
     def _receive_request(self, socket):
-        reply_id = socket.recv()
-        empty = socket.recv()
-        assert empty == b'', 'Bad format: empty delimiter expected'
-        request = socket.recv_pyobj()
+        frames = socket.recv_multipart()
+        if len(frames) < 2 or frames[1] != b'':
+            raise zmq_codec.MalformedMessage("Empty delimiter expected")
+        reply_id = frames[0]
+        request = zmq_codec.ReceivedRequest(frames[2:])
         return request, reply_id
 
     def receive_message(self, socket):
@@ -102,20 +104,13 @@ class RouterConsumer(zmq_consumer_base.SingleSocketConsumer):
 
         except zmq.ZMQError as e:
             LOG.error(_LE("Receiving message failed: %s"), str(e))
+        except zmq_codec.MalformedMessage as e:
+            LOG.error(_LE("Dropping malformed message: %s"), e)
+            self.poller.resume_polling(socket)
 
 
 class RouterConsumerBroker(RouterConsumer):
-
-    def __init__(self, conf, poller, server):
-        super(RouterConsumerBroker, self).__init__(conf, poller, server)
-
-    def _receive_request(self, socket):
-        reply_id = socket.recv()
-        empty = socket.recv()
-        assert empty == b'', 'Bad format: empty delimiter expected'
-        envelope = socket.recv_pyobj()
-        request = socket.recv_pyobj()
-
-        if zmq_names.FIELD_REPLY_ID in envelope:
-            request.proxy_reply_id = envelope[zmq_names.FIELD_REPLY_ID]
-        return request, reply_id
+    """Receives the requests redirected by the proxy, which use the same
+    wire format as the direct ones, the identity of the client of a call
+    being kept in the request.
+    """
@@ -23,6 +23,7 @@ from oslo_messaging._drivers.zmq_driver.server.consumers\
     import zmq_consumer_base
 from oslo_messaging._drivers.zmq_driver import zmq_address
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
 from oslo_messaging._drivers.zmq_driver import zmq_socket
 from oslo_messaging._i18n import _LE
@@ -95,11 +96,16 @@ class SubConsumer(zmq_consumer_base.ConsumerBase):
             self._subscribe_on_target(target)
 
     def _receive_request(self, socket):
-        topic_filter = socket.recv()
-        LOG.debug("[%(id)s] Received %(topict_filter)s topic",
+        frames = socket.recv_multipart()
+        if not frames:
+            raise zmq_codec.MalformedMessage("Topic filter expected")
+        topic_filter = frames[0]
+        LOG.debug("[%(id)s] Received %(topic_filter)s topic",
                   {'id': self.id, 'topic_filter': topic_filter})
-        assert topic_filter in self.subscriptions
-        request = socket.recv_pyobj()
+        if topic_filter not in self.subscriptions:
+            raise zmq_codec.MalformedMessage(
+                "Not subscribed to topic %r" % topic_filter)
+        request = zmq_codec.ReceivedRequest(frames[1:])
         return request
 
     def receive_message(self, socket):
@@ -119,6 +125,9 @@ class SubConsumer(zmq_consumer_base.ConsumerBase):
                                           self.poller)
         except zmq.ZMQError as e:
             LOG.error(_LE("Receiving message failed: %s"), str(e))
+        except zmq_codec.MalformedMessage as e:
+            LOG.error(_LE("Dropping malformed message: %s"), e)
+            self.poller.resume_polling(socket)
 
 
 class MatchmakerPoller(object):
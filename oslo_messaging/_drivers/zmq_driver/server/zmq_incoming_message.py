@@ -18,6 +18,7 @@ import logging
 from oslo_messaging._drivers import base
 from oslo_messaging._drivers import common as rpc_common
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_names
 
 
@@ -41,23 +42,16 @@ class ZmqIncomingRequest(base.IncomingMessage):
         if failure is not None:
             failure = rpc_common.serialize_remote_exception(failure,
                                                             log_failure)
-        message_reply = {zmq_names.FIELD_TYPE: zmq_names.REPLY_TYPE,
-                         zmq_names.FIELD_REPLY: reply,
-                         zmq_names.FIELD_FAILURE: failure,
-                         zmq_names.FIELD_LOG_FAILURE: log_failure,
-                         zmq_names.FIELD_ID: self.request.proxy_reply_id,
-                         zmq_names.FIELD_MSG_ID: self.request.message_id}
-
         LOG.debug("Replying %s", (str(self.request.message_id)))
 
         self.received = True
-        self.reply_socket.send(self.reply_id, zmq.SNDMORE)
-        self.reply_socket.send(b'', zmq.SNDMORE)
+        frames = [self.reply_id, b'']
         if self.request.proxy_reply_id:
-            self.reply_socket.send_string(zmq_names.REPLY_TYPE, zmq.SNDMORE)
-            self.reply_socket.send(self.request.proxy_reply_id, zmq.SNDMORE)
-            self.reply_socket.send(b'', zmq.SNDMORE)
-        self.reply_socket.send_pyobj(message_reply)
+            frames += [zmq_names.REPLY_TYPE.encode('utf-8'),
+                       self.request.proxy_reply_id, b'']
+        frames += zmq_codec.encode_reply(self.request.message_id,
+                                         self.request.codec, reply, failure)
+        self.reply_socket.send_multipart(frames)
         self.poller.resume_polling(self.reply_socket)
 
     def requeue(self):
@@ -31,6 +31,14 @@ def get_broker_address(conf):
     return "ipc://%s/zmq-broker" % conf.rpc_zmq_ipc_dir
 
 
+def get_broker_backend_address():
+    return "inproc://zmq-broker-backend"
+
+
+def get_broker_workers_address(conf):
+    return "ipc://%s/zmq-broker-workers" % conf.rpc_zmq_ipc_dir
+
+
 def prefix_str(key, listener_type):
     return listener_type + "_" + key
 
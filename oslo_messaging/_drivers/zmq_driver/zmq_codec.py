@@ -0,0 +1,187 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Wire format of the zmq driver messages.
+
+A request is sent as the multipart message:
+
+    msg_type | message_id | reply_id | topic | server | codec | body
+
+and a reply as:
+
+    message_id | codec | body
+
+All the frames but the body are plain bytes, so the proxy routes the requests
+without decoding them.  reply_id is set by the proxy to the identity of the
+client of a call, and is empty otherwise.  The body is a mapping encoded by
+the codec named in the codec frame; the reply is encoded by the codec of the
+request.
+"""
+
+from oslo_serialization import jsonutils
+from oslo_utils import importutils
+import six
+
+import oslo_messaging
+from oslo_messaging._drivers import common as rpc_common
+from oslo_messaging._drivers.zmq_driver import zmq_names
+
+msgpackutils = importutils.try_import('oslo_serialization.msgpackutils')
+
+IDX_MSG_TYPE = 0
+IDX_MSG_ID = 1
+IDX_REPLY_ID = 2
+IDX_TOPIC = 3
+IDX_SERVER = 4
+IDX_CODEC = 5
+IDX_BODY = 6
+REQUEST_FRAMES = 7
+
+IDX_REPLY_MSG_ID = 0
+IDX_REPLY_CODEC = 1
+IDX_REPLY_BODY = 2
+REPLY_FRAMES = 3
+
+# raised when parsing frames which do not follow the wire format
+FRAME_ERRORS = (ValueError, IndexError, UnicodeDecodeError)
+
+
+class MalformedMessage(rpc_common.RPCException):
+    """Raised when a received message does not follow the wire format."""
+
+
+class JsonCodec(object):
+
+    name = b'json'
+
+    def dumps(self, obj):
+        return jsonutils.dump_as_bytes(obj)
+
+    def loads(self, data):
+        return jsonutils.loads(data)
+
+
+class MsgpackCodec(object):
+
+    name = b'msgpack'
+
+    def dumps(self, obj):
+        return msgpackutils.dumps(obj)
+
+    def loads(self, data):
+        return msgpackutils.loads(data)
+
+
+CODECS = {JsonCodec.name: JsonCodec()}
+if msgpackutils is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+
+def get_codec(name):
+    """Get a codec by name, raise MalformedMessage if unknown."""
+    if isinstance(name, six.text_type):
+        name = name.encode('utf-8')
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise MalformedMessage("Unsupported codec %r" % name)
+
+
+def _to_bytes(value):
+    if value is None:
+        return b''
+    if isinstance(value, six.text_type):
+        return value.encode('utf-8')
+    return value
+
+
+def _to_text(value):
+    return value.decode('utf-8') if value else None
+
+
+def _decode(frames, index, name):
+    try:
+        return _to_text(frames[index])
+    except FRAME_ERRORS as e:
+        raise MalformedMessage("Invalid %s frame: %s" % (name, e))
+
+
+def encode_request(request, codec):
+    """Return the frames of a zmq_request.Request."""
+    body = {'context': request.context, 'message': request.message}
+    return [_to_bytes(request.msg_type),
+            _to_bytes(request.message_id),
+            _to_bytes(request.proxy_reply_id),
+            _to_bytes(request.target.topic),
+            _to_bytes(request.target.server),
+            codec.name,
+            codec.dumps(body)]
+
+
+def _check_request(frames):
+    if len(frames) != REQUEST_FRAMES:
+        raise MalformedMessage("Expected %d request frames, got %d"
+                               % (REQUEST_FRAMES, len(frames)))
+
+
+def get_msg_type(frames):
+    """Get the message type of request frames, without decoding the body."""
+    _check_request(frames)
+    return _decode(frames, IDX_MSG_TYPE, 'message type')
+
+
+def get_target(frames):
+    """Get the target of request frames, without decoding the body."""
+    _check_request(frames)
+    return oslo_messaging.Target(topic=_decode(frames, IDX_TOPIC, 'topic'),
+                                 server=_decode(frames, IDX_SERVER, 'server'))
+
+
+class ReceivedRequest(object):
+    """A request decoded from its frames by a consumer."""
+
+    def __init__(self, frames):
+        self.msg_type = get_msg_type(frames)
+        self.target = get_target(frames)
+        self.message_id = _decode(frames, IDX_MSG_ID, 'message id')
+        self.proxy_reply_id = frames[IDX_REPLY_ID] or None
+        self.codec = get_codec(frames[IDX_CODEC])
+        try:
+            body = self.codec.loads(frames[IDX_BODY])
+            self.context = body['context']
+            self.message = body['message']
+        except FRAME_ERRORS + (TypeError, KeyError) as e:
+            raise MalformedMessage("Invalid body of request %s: %s"
+                                   % (self.message_id, e))
+
+
+def encode_reply(message_id, codec, reply=None, failure=None):
+    """Return the frames of the reply to a call."""
+    body = {zmq_names.FIELD_REPLY: reply, zmq_names.FIELD_FAILURE: failure}
+    return [_to_bytes(message_id), codec.name, codec.dumps(body)]
+
+
+def decode_reply(frames):
+    """Return a reply as a mapping of its message id, reply and failure."""
+    if len(frames) != REPLY_FRAMES:
+        raise MalformedMessage("Expected %d reply frames, got %d"
+                               % (REPLY_FRAMES, len(frames)))
+    codec = get_codec(frames[IDX_REPLY_CODEC])
+    try:
+        reply = codec.loads(frames[IDX_REPLY_BODY])
+    except FRAME_ERRORS + (TypeError,) as e:
+        raise MalformedMessage("Invalid reply body: %s" % e)
+    if not isinstance(reply, dict):
+        raise MalformedMessage("Invalid reply body: %r" % reply)
+    reply[zmq_names.FIELD_MSG_ID] = _decode(frames, IDX_REPLY_MSG_ID,
+                                            'message id')
+    return reply
@@ -64,6 +64,13 @@ class ZmqPoller(object):
         :type recv_method: callable
         """
 
+    def unregister(self, socket):
+        """Stop polling a socket, before closing it
+
+        :param socket: Socket registered for polling
+        :type socket: zmq.Socket
+        """
+
     @abc.abstractmethod
     def poll(self, timeout=None):
         """Poll for messages
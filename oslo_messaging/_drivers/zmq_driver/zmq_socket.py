@@ -44,6 +44,11 @@ class ZmqSocket(object):
             self.handle.connect(address)
             self.connections.add(address)
 
+    def disconnect(self, address):
+        if address in self.connections:
+            self.handle.disconnect(address)
+            self.connections.discard(address)
+
     def setsockopt(self, *args, **kwargs):
         self.handle.setsockopt(*args, **kwargs)
 
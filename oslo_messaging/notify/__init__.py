@@ -15,6 +15,7 @@
 
 __all__ = ['Notifier',
            'LoggingNotificationHandler',
+           'BufferedLoggingNotificationHandler',
            'get_notification_transport',
            'get_notification_listener',
            'get_batch_notification_listener',
@@ -0,0 +1,184 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import atexit
+import collections
+import inspect
+import logging
+import threading
+import weakref
+
+from oslo_utils import timeutils
+import six
+
+from oslo_messaging._i18n import _LE
+
+LOG = logging.getLogger(__name__)
+
+DROP = 'drop'
+BLOCK = 'block'
+OVERFLOW_POLICIES = (DROP, BLOCK)
+
+_SENDERS = weakref.WeakSet()
+
+
+class BufferedSender(object):
+    """Hand items over to a background thread which sends them in batches.
+
+    Items are queued in a bounded buffer by put(). A single background thread
+    takes up to batch_size items at a time and passes them to the send
+    callable, which may return the number of items of the batch it failed to
+    send. When the buffer is full, the new item is either dropped or the
+    caller blocks until there is room, depending on the overflow policy.
+
+    The background thread is started on the first put() and buffered items
+    are flushed when the interpreter exits. When send is a bound method, its
+    object is only referenced by the sender while items are queued, and the
+    background thread stops once that object is garbage collected.
+    """
+
+    def __init__(self, send, max_size=1000, batch_size=100, overflow=DROP,
+                 name=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy %r' % overflow)
+        if max_size < 1 or batch_size < 1:
+            raise ValueError('max_size and batch_size must be positive')
+        # the object of a bound method is weakly referenced, and only
+        # referenced by _owner while items are queued, for the background
+        # thread not to keep it alive
+        self._owner = None
+        self._owner_ref = None
+        if inspect.ismethod(send) and six.get_method_self(send) is not None:
+            self._owner_ref = weakref.ref(six.get_method_self(send),
+                                          self._owner_collected)
+            send = six.get_method_function(send)
+        self._send = send
+        self._max_size = max_size
+        self._batch_size = batch_size
+        self._overflow = overflow
+        self._name = name or 'oslo.messaging buffered sender'
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._dropped = 0
+        self._sent = 0
+        self._failed = 0
+        self._thread = None
+        self._stopping = False
+        _SENDERS.add(self)
+
+    def put(self, item):
+        """Queue an item, return False if it has been dropped."""
+        with self._cond:
+            if self._stopping:
+                self._dropped += 1
+                return False
+            if self._thread is None:
+                self._start()
+            while len(self._queue) >= self._max_size:
+                # NOTE: the sender thread itself must never wait for room in
+                # its own buffer, for example when a driver logs through a
+                # handler which notifies through this sender.
+                if (self._overflow == DROP or
+                        self._thread is threading.current_thread()):
+                    self._dropped += 1
+                    return False
+                self._cond.wait()
+            self._queue.append(item)
+            if self._owner_ref is not None:
+                self._owner = self._owner_ref()
+            self._cond.notify_all()
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until all queued items have been sent.
+
+        :param timeout: maximum number of seconds to wait, None means forever
+        :returns: True if the buffer has been emptied
+        """
+        with timeutils.StopWatch(duration=timeout) as w, self._cond:
+            while self._queue or self._in_flight:
+                if self._thread is None or w.expired():
+                    return False
+                self._cond.wait(w.leftover(return_none=True))
+            return True
+
+    def stop(self, flush=True, timeout=None):
+        """Stop the background thread.
+
+        :param flush: send the queued items before stopping, otherwise they
+                      are dropped
+        :param timeout: maximum number of seconds to wait for the thread
+        """
+        with self._cond:
+            self._stopping = True
+            if not flush:
+                self._dropped += len(self._queue)
+                self._queue.clear()
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def stats(self):
+        """Return the number of queued, sent, failed and dropped items."""
+        with self._cond:
+            return {'queued': len(self._queue) + self._in_flight,
+                    'sent': self._sent,
+                    'failed': self._failed,
+                    'dropped': self._dropped}
+
+    def _owner_collected(self, ref):
+        self.stop(timeout=0)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name=self._name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._owner = None
+                    self._cond.wait()
+                if not self._queue:
+                    self._owner = None
+                    self._thread = None
+                    self._cond.notify_all()
+                    return
+                count = min(len(self._queue), self._batch_size)
+                batch = [self._queue.popleft() for __ in range(count)]
+                owner = self._owner
+                self._in_flight = count
+                self._cond.notify_all()
+            try:
+                if self._owner_ref is None:
+                    failed = self._send(batch) or 0
+                else:
+                    failed = self._send(owner, batch) or 0
+            except Exception:
+                LOG.exception(_LE("Failed to send %d buffered items"), count)
+                failed = count
+            owner = None
+            with self._cond:
+                self._in_flight = 0
+                self._sent += count - failed
+                self._failed += failed
+                self._cond.notify_all()
+
+
+@atexit.register
+def _stop_all():
+    for sender in list(_SENDERS):
+        sender.stop(flush=True, timeout=5)
@@ -15,13 +15,16 @@
 
 import fnmatch
 import logging
+import os
+import re
+import time
 
 from oslo_config import cfg
 import six
 from stevedore import dispatch
 import yaml
 
-from oslo_messaging._i18n import _LI, _LW
+from oslo_messaging._i18n import _LE, _LI, _LW
 from oslo_messaging.notify import notifier
 
 
@@ -32,8 +35,15 @@ router_config = cfg.StrOpt('routing_config', default='',
                            deprecated_name='routing_notifier_config',
                            help='RoutingNotifier configuration file location.')
 
+router_config_check_interval = cfg.IntOpt(
+    'routing_config_check_interval', default=0, min=0,
+    help='Interval in seconds between checks of the RoutingNotifier '
+         'configuration file for modifications. The file is reloaded when '
+         'it has been modified. 0 disables the checks.')
+
 CONF = cfg.CONF
-CONF.register_opt(router_config, group='oslo_messaging_notifications')
+CONF.register_opts([router_config, router_config_check_interval],
+                   group='oslo_messaging_notifications')
 
 
 class RoutingDriver(notifier.Driver):
@@ -43,6 +53,17 @@ class RoutingDriver(notifier.Driver):
     routing_groups = None  # The routing groups from the config file.
     used_drivers = None  # Used driver names, extracted from config file.
 
+    _CACHE_SIZE = 1024
+
+    def __init__(self, conf, topics, transport):
+        super(RoutingDriver, self).__init__(conf, topics, transport)
+        # Compiled rules of the routing groups, keyed by id(group).
+        self._compiled_groups = {}
+        # Accepted drivers, keyed by (event_type, priority).
+        self._decisions = {}
+        self._config_mtime = None
+        self._next_config_check = None
+
     def _should_load_plugin(self, ext, *args, **kwargs):
         # Hack to keep stevedore from circular importing since these
         # endpoints are used for different purposes.
@@ -52,58 +73,152 @@ class RoutingDriver(notifier.Driver):
 
     def _get_notifier_config_file(self, filename):
         """Broken out for testing."""
-        return file(filename, 'r')
+        return open(filename, 'r')
+
+    @staticmethod
+    def _get_notifier_config_mtime(filename):
+        try:
+            return os.path.getmtime(filename)
+        except OSError:
+            return None
 
     def _load_notifiers(self):
-        """One-time load of notifier config file."""
-        self.routing_groups = {}
-        self.used_drivers = set()
+        """Load the notifier config file.
+
+        The new config is only used once it has been loaded: when a reload
+        fails the previous config is kept, and the file is loaded again at
+        the next check.
+        """
         filename = CONF.oslo_messaging_notifications.routing_config
-        if not filename:
+        mtime = None
+        routing_groups = {}
+        used_drivers = set()
+        if filename:
+            mtime = self._get_notifier_config_mtime(filename)
+            try:
+                routing_groups = yaml.safe_load(
+                    self._get_notifier_config_file(filename))
+                # In case we got None from load()
+                routing_groups = routing_groups or {}
+                # Infer which drivers are used from the config file.
+                for group in routing_groups.values():
+                    used_drivers.update(group.keys())
+            except Exception:
+                if self.routing_groups is None:
+                    raise
+                LOG.exception(_LE("Failed to reload the notifier routing "
+                                  "config from %s, keeping the previous "
+                                  "one"), filename)
+                return
+
+        plugin_manager = self.plugin_manager
+        if used_drivers:
+            LOG.debug('loading notifiers from %s',
+                      self.NOTIFIER_PLUGIN_NAMESPACE)
+            self.used_drivers = used_drivers
+            plugin_manager = dispatch.DispatchExtensionManager(
+                namespace=self.NOTIFIER_PLUGIN_NAMESPACE,
+                check_func=self._should_load_plugin,
+                invoke_on_load=True,
+                invoke_args=None)
+            if not list(plugin_manager):
+                LOG.warning(_LW("Failed to load any notifiers for %s"),
+                            self.NOTIFIER_PLUGIN_NAMESPACE)
+
+        # NOTE: notify() may run concurrently: the routing groups are
+        # replaced before the cache of decisions, which is read first.
+        self.used_drivers = used_drivers
+        self.plugin_manager = plugin_manager
+        self.routing_groups = routing_groups
+        self._compiled_groups = {}
+        self._decisions = {}
+        self._config_mtime = mtime
+
+    def _check_notifier_config(self):
+        """Reload the config file if it has been modified."""
+        interval = CONF.oslo_messaging_notifications.\
+            routing_config_check_interval
+        filename = CONF.oslo_messaging_notifications.routing_config
+        if not interval or not filename:
             return
 
-        # Infer which drivers are used from the config file.
-        self.routing_groups = yaml.safe_load(
-            self._get_notifier_config_file(filename))
-        if not self.routing_groups:
-            self.routing_groups = {}  # In case we got None from load()
+        now = time.time()
+        if self._next_config_check is None:
+            self._next_config_check = now + interval
+            return
+        if now < self._next_config_check:
             return
+        self._next_config_check = now + interval
 
-        for group in self.routing_groups.values():
-            self.used_drivers.update(group.keys())
+        mtime = self._get_notifier_config_mtime(filename)
+        if mtime is not None and mtime != self._config_mtime:
+            LOG.info(_LI("Reloading notifier routing config from %s"),
+                     filename)
+            self._load_notifiers()
 
-        LOG.debug('loading notifiers from %s', self.NOTIFIER_PLUGIN_NAMESPACE)
-        self.plugin_manager = dispatch.DispatchExtensionManager(
-            namespace=self.NOTIFIER_PLUGIN_NAMESPACE,
-            check_func=self._should_load_plugin,
-            invoke_on_load=True,
-            invoke_args=None)
-        if not list(self.plugin_manager):
-            LOG.warning(_LW("Failed to load any notifiers for %s"),
-                        self.NOTIFIER_PLUGIN_NAMESPACE)
+    @staticmethod
+    def _compile_patterns(patterns, lower=False):
+        if not patterns:
+            # matches nothing, as no pattern of the empty list matches
+            return re.compile('(?!)')
+        if lower:
+            patterns = [p.lower() for p in patterns]
+        return re.compile('|'.join('(?:%s)' % fnmatch.translate(p)
+                                   for p in patterns))
 
-    def _get_drivers_for_message(self, group, event_type, priority):
-        """Which drivers should be called for this event_type
-           or priority.
+    def _compile_group(self, group):
+        """Translate the glob patterns of a group into regexes, once.
+
+        The group is compiled the first time a message is routed through it.
         """
-        accepted_drivers = set()
+        cached = self._compiled_groups.get(id(group))
+        if cached is not None and cached[0] is group:
+            return cached[1]
 
+        compiled = []
         for driver, rules in six.iteritems(group):
             checks = []
             for key, patterns in six.iteritems(rules):
                 if key == 'accepted_events':
-                    c = [fnmatch.fnmatch(event_type, p)
-                         for p in patterns]
-                    checks.append(any(c))
+                    checks.append((0, self._compile_patterns(patterns)))
                 if key == 'accepted_priorities':
-                    c = [fnmatch.fnmatch(priority, p.lower())
-                         for p in patterns]
-                    checks.append(any(c))
-            if all(checks):
+                    checks.append((1, self._compile_patterns(patterns,
+                                                             lower=True)))
+            compiled.append((driver, checks))
+        self._compiled_groups[id(group)] = (group, compiled)
+        return compiled
+
+    def _get_drivers_for_message(self, group, event_type, priority):
+        """Which drivers should be called for this event_type
+           or priority.
+        """
+        accepted_drivers = set()
+
+        values = (event_type, priority)
+        for driver, checks in self._compile_group(group):
+            if all(regex.match(values[i]) for i, regex in checks):
                 accepted_drivers.add(driver)
 
         return list(accepted_drivers)
 
+    def _get_accepted_drivers(self, event_type, priority):
+        """The drivers of all groups accepting this event_type and priority.
+        """
+        key = (event_type, priority)
+        decisions = self._decisions
+        accepted_drivers = decisions.get(key)
+        if accepted_drivers is None:
+            accepted_drivers = set()
+            for group in self.routing_groups.values():
+                accepted_drivers.update(
+                    self._get_drivers_for_message(group, event_type,
+                                                  priority))
+            accepted_drivers = list(accepted_drivers)
+            if len(decisions) >= self._CACHE_SIZE:
+                decisions.clear()
+            decisions[key] = accepted_drivers
+        return accepted_drivers
+
     def _filter_func(self, ext, context, message, priority, retry,
                      accepted_drivers):
         """True/False if the driver should be called for this message.
@@ -116,23 +231,21 @@ class RoutingDriver(notifier.Driver):
         """Emit the notification.
         """
         # accepted_drivers is passed in as a result of the map() function
-        LOG.info(_LI("Routing '%(event)s' notification to '%(driver)s' "
-                     "driver"),
-                 {'event': message.get('event_type'), 'driver': ext.name})
+        LOG.debug("Routing '%(event)s' notification to '%(driver)s' driver",
+                  {'event': message.get('event_type'), 'driver': ext.name})
         ext.obj.notify(context, message, priority, retry)
 
     def notify(self, context, message, priority, retry):
         if not self.plugin_manager:
             self._load_notifiers()
+        else:
+            self._check_notifier_config()
 
         # Fail if these aren't present ...
         event_type = message['event_type']
 
-        accepted_drivers = set()
-        for group in self.routing_groups.values():
-            accepted_drivers.update(
-                self._get_drivers_for_message(group, event_type,
-                                              priority.lower()))
+        accepted_drivers = self._get_accepted_drivers(event_type,
+                                                      priority.lower())
         self.plugin_manager.map(self._filter_func, self._call_notify, context,
                                 message, priority, retry,
-                                list(accepted_drivers))
+                                accepted_drivers)
@@ -0,0 +1,148 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import fnmatch
+import re
+import threading
+
+from oslo_utils import timeutils
+import yaml
+
+
+class _OneInN(object):
+    """Keep the first notification of every n."""
+
+    def __init__(self, n):
+        self._n = n
+        self._count = 0
+
+    def accept(self):
+        keep = self._count == 0
+        self._count = (self._count + 1) % self._n
+        return keep
+
+
+class _TokenBucket(object):
+    """Keep up to rate notifications per second, with bursts up to burst."""
+
+    def __init__(self, rate, burst=None):
+        self._rate = float(rate)
+        self._burst = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self._burst
+        self._last = timeutils.now()
+
+    def accept(self):
+        now = timeutils.now()
+        self._tokens = min(self._burst,
+                           self._tokens + (now - self._last) * self._rate)
+        self._last = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class _Rule(object):
+    def __init__(self, event_type, priority, policy):
+        self.event_type = re.compile(fnmatch.translate(event_type))
+        self.priority = re.compile(fnmatch.translate(priority.lower()))
+        self.policy = policy
+
+    def matches(self, event_type, priority):
+        return bool(self.event_type.match(event_type) and
+                    self.priority.match(priority))
+
+
+def _build_rule(entry):
+    if not isinstance(entry, dict):
+        raise ValueError('A sampling rule must be a mapping, got %r' % entry)
+    keep_one_in = entry.get('keep_one_in')
+    rate = entry.get('rate')
+    if (keep_one_in is None) == (rate is None):
+        raise ValueError('A sampling rule needs one of keep_one_in or rate: '
+                         '%r' % entry)
+    if keep_one_in is not None:
+        if int(keep_one_in) < 1:
+            raise ValueError('keep_one_in must be positive: %r' % entry)
+        policy = _OneInN(int(keep_one_in))
+    else:
+        if float(rate) <= 0:
+            raise ValueError('rate must be positive: %r' % entry)
+        policy = _TokenBucket(float(rate), entry.get('burst'))
+    return _Rule(str(entry.get('event_type', '*')),
+                 str(entry.get('priority', '*')), policy)
+
+
+class NotificationSampler(object):
+    """Decide which notifications are sent, before any driver runs.
+
+    Each rule matches the event_type and priority of the notification against
+    glob patterns, and either keeps one notification in keep_one_in or keeps
+    up to rate notifications per second, with bursts of up to burst
+    notifications. The first matching rule applies, notifications not
+    matching any rule and those whose priority is exempt are always kept.
+    """
+
+    _CACHE_SIZE = 1024
+
+    def __init__(self, rules, exempt_priorities=('error', 'critical')):
+        self._rules = [_build_rule(entry) for entry in rules]
+        self._exempt_priorities = set(p.lower() for p in exempt_priorities)
+        self._lock = threading.Lock()
+        # Index of the first matching rule, keyed by (event_type, priority).
+        self._rule_cache = {}
+        self._sampled = 0
+        self._dropped = 0
+
+    @classmethod
+    def from_file(cls, filename, exempt_priorities=('error', 'critical')):
+        """Load the sampling rules from a YAML list of mappings."""
+        with open(filename, 'r') as f:
+            rules = yaml.safe_load(f) or []
+        if not isinstance(rules, list):
+            raise ValueError('%s must contain a list of sampling rules'
+                             % filename)
+        return cls(rules, exempt_priorities)
+
+    def _find_rule(self, event_type, priority):
+        key = (event_type, priority)
+        index = self._rule_cache.get(key)
+        if index is None:
+            index = -1
+            for i, rule in enumerate(self._rules):
+                if rule.matches(event_type, priority):
+                    index = i
+                    break
+            if len(self._rule_cache) >= self._CACHE_SIZE:
+                self._rule_cache.clear()
+            self._rule_cache[key] = index
+        return self._rules[index] if index >= 0 else None
+
+    def accept(self, event_type, priority):
+        """Return True if the notification must be sent."""
+        priority = priority.lower()
+        if priority in self._exempt_priorities:
+            return True
+        rule = self._find_rule(event_type or '', priority)
+        if rule is None:
+            return True
+        with self._lock:
+            self._sampled += 1
+            keep = rule.policy.accept()
+            if not keep:
+                self._dropped += 1
+        return keep
+
+    def stats(self):
+        """Return the number of sampled notifications and of dropped ones."""
+        with self._lock:
+            return {'sampled': self._sampled, 'dropped': self._dropped}
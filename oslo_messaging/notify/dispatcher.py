@@ -14,6 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import itertools
 import logging
 
@@ -35,6 +36,53 @@ class NotificationResult(object):
     REQUEUE = 'requeue'
 
 
+class _CallbackIndex(object):
+    """The endpoint callbacks of one priority, indexed by event_type.
+
+    A callback whose filter_rule matches event_type against a regex with a
+    literal prefix can only be interested in messages whose event_type starts
+    with that prefix. Such callbacks are stored in a prefix map so that, for
+    each message, the filters of most endpoints are never evaluated.
+    """
+
+    _CACHE_SIZE = 1024
+
+    def __init__(self):
+        self.callbacks = []
+        self._unindexed = []
+        self._by_prefix = {}
+        self._prefix_lengths = []
+        self._cache = {}
+
+    def add(self, screen, method):
+        position = len(self.callbacks)
+        self.callbacks.append((screen, method))
+        prefix = getattr(screen, 'event_type_prefix', None)
+        if not prefix or not isinstance(prefix, six.string_types):
+            self._unindexed.append(position)
+            return
+        self._by_prefix.setdefault(prefix, []).append(position)
+        self._prefix_lengths = sorted(set(len(p) for p in self._by_prefix))
+        self._cache.clear()
+
+    def candidates(self, event_type):
+        """Return the positions of the callbacks which may match event_type."""
+        if not isinstance(event_type, six.string_types):
+            return frozenset(six.moves.range(len(self.callbacks)))
+        found = self._cache.get(event_type)
+        if found is None:
+            found = set(self._unindexed)
+            for length in self._prefix_lengths:
+                if length > len(event_type):
+                    break
+                found.update(self._by_prefix.get(event_type[:length], ()))
+            found = frozenset(found)
+            if len(self._cache) >= self._CACHE_SIZE:
+                self._cache.clear()
+            self._cache[event_type] = found
+        return found
+
+
 class _NotificationDispatcherBase(dispatcher.DispatcherBase):
     def __init__(self, targets, endpoints, serializer, allow_requeue,
                  pool=None):
@@ -49,8 +97,8 @@ class _NotificationDispatcherBase(dispatcher.DispatcherBase):
             if hasattr(endpoint, prio):
                 method = getattr(endpoint, prio)
                 screen = getattr(endpoint, 'filter_rule', None)
-                self._callbacks_by_priority.setdefault(prio, []).append(
-                    (screen, method))
+                self._callbacks_by_priority.setdefault(
+                    prio, _CallbackIndex()).add(screen, method)
 
         priorities = self._callbacks_by_priority.keys()
         self._targets_priorities = set(itertools.product(self.targets,
@@ -90,41 +138,49 @@ class _NotificationDispatcherBase(dispatcher.DispatcherBase):
 
     def _dispatch(self, incoming, executor_callback=None):
         """Dispatch notification messages to the appropriate endpoint method.
+
+        Messages are bucketed by priority, keeping their arrival order, so
+        that each endpoint method is invoked at most once per priority. Only
+        the messages handed to a callback which asked for a requeue are
+        requeued, they are not passed to the remaining endpoints.
         """
 
-        messages_grouped = itertools.groupby((
-            self._extract_user_message(m)
-            for m in incoming), lambda x: x[0])
+        messages_by_priority = collections.OrderedDict()
+        for m in incoming:
+            priority, raw_message, message = self._extract_user_message(m)
+            messages_by_priority.setdefault(priority, []).append(
+                (raw_message, message))
 
         requeues = set()
-        for priority, messages in messages_grouped:
-            __, raw_messages, messages = six.moves.zip(*messages)
-            raw_messages = list(raw_messages)
-            messages = list(messages)
+        for priority, messages in six.iteritems(messages_by_priority):
             if priority not in PRIORITIES:
                 LOG.warning(_LW('Unknown priority "%s"'), priority)
                 continue
-            for screen, callback in self._callbacks_by_priority.get(priority,
-                                                                    []):
-                if screen:
-                    filtered_messages = [message for message in messages
-                                         if screen.match(
-                                             message["ctxt"],
-                                             message["publisher_id"],
-                                             message["event_type"],
-                                             message["metadata"],
-                                             message["payload"])]
-                else:
-                    filtered_messages = messages
-
-                if not filtered_messages:
+            index = self._callbacks_by_priority.get(priority)
+            if index is None:
+                continue
+            candidates = [index.candidates(message["event_type"])
+                          for __, message in messages]
+            for position, (screen, callback) in enumerate(index.callbacks):
+                selected = [
+                    (raw_message, message)
+                    for (raw_message, message), found in zip(messages,
+                                                             candidates)
+                    if position in found and raw_message not in requeues and (
+                        not screen or screen.match(message["ctxt"],
+                                                   message["publisher_id"],
+                                                   message["event_type"],
+                                                   message["metadata"],
+                                                   message["payload"]))]
+
+                if not selected:
                     continue
 
+                raw_messages, filtered_messages = six.moves.zip(*selected)
                 ret = self._exec_callback(executor_callback, callback,
-                                          filtered_messages)
+                                          list(filtered_messages))
                 if self.allow_requeue and ret == NotificationResult.REQUEUE:
                     requeues.update(raw_messages)
-                    break
         return requeues
 
     def _exec_callback(self, executor_callback, callback, *args):
@@ -15,6 +15,42 @@
 
 import re
 
+_REGEX_META = frozenset('.^$*+?{}[]\\|()')
+_REGEX_QUANTIFIERS = frozenset('*+?{')
+
+
+def _literal_prefix(pattern):
+    """Return the literal string every match of pattern must start with.
+
+    Only a conservative subset of the regex syntax is understood: the
+    leading run of plain or backslash-escaped punctuation characters of a
+    pattern without alternation. An empty string is returned whenever no
+    prefix can be safely extracted.
+    """
+    if '|' in pattern or '(?' in pattern:
+        return ''
+    prefix = []
+    i = 0
+    if pattern.startswith('^'):
+        i = 1
+    while i < len(pattern):
+        char = pattern[i]
+        step = 1
+        if char == '\\':
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break
+            char = pattern[i + 1]
+            step = 2
+        elif char in _REGEX_META:
+            break
+        if (i + step < len(pattern) and
+                pattern[i + step] in _REGEX_QUANTIFIERS):
+            # the last literal character is optional or repeated
+            break
+        prefix.append(char)
+        i += step
+    return ''.join(prefix)
+
 
 class NotificationFilter(object):
 
@@ -42,11 +78,13 @@ class NotificationFilter(object):
                  metadata=None, payload=None):
         self._regex_publisher_id = None
         self._regex_event_type = None
+        self.event_type_prefix = ''
 
         if publisher_id is not None:
             self._regex_publisher_id = re.compile(publisher_id)
         if event_type is not None:
             self._regex_event_type = re.compile(event_type)
+            self.event_type_prefix = _literal_prefix(event_type)
         self._regexs_context = self._build_regex_dict(context)
         self._regexs_metadata = self._build_regex_dict(metadata)
         self._regexs_payload = self._build_regex_dict(payload)
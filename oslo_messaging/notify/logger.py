@@ -14,10 +14,12 @@
 """
 Driver for the Python logging package that sends log records as a notification.
 """
+import collections
 import logging
 
 from oslo_config import cfg
 
+from oslo_messaging.notify import _buffer
 from oslo_messaging.notify import notifier
 
 
@@ -63,21 +65,87 @@ class LoggingNotificationHandler(logging.Handler):
         if not method:
             return
 
-        method(
-            {},
-            'logrecord',
-            {
-                'name': record.name,
-                'levelno': record.levelno,
-                'levelname': record.levelname,
-                'exc_info': record.exc_info,
-                'pathname': record.pathname,
-                'lineno': record.lineno,
-                'msg': record.getMessage(),
-                'funcName': record.funcName,
-                'thread': record.thread,
-                'processName': record.processName,
-                'process': record.process,
-                'extra': getattr(record, 'extra', None),
-            }
-        )
+        method({}, 'logrecord', self._record_payload(record))
+
+    @staticmethod
+    def _record_payload(record):
+        return {
+            'name': record.name,
+            'levelno': record.levelno,
+            'levelname': record.levelname,
+            'exc_info': record.exc_info,
+            'pathname': record.pathname,
+            'lineno': record.lineno,
+            'msg': record.getMessage(),
+            'funcName': record.funcName,
+            'thread': record.thread,
+            'processName': record.processName,
+            'process': record.process,
+            'extra': getattr(record, 'extra', None),
+        }
+
+
+class BufferedLoggingNotificationHandler(LoggingNotificationHandler):
+    """Handler sending log records as notifications from a background thread.
+
+    emit() only queues the log record in a bounded buffer, so logging is not
+    delayed by the messaging transport. A background thread takes up to
+    batch_size records at a time and sends, for each level, a single
+    'logrecords' notification whose payload is a dict with the list of
+    records under the 'records' key.
+
+    When the buffer is full, new records are dropped or the logging thread
+    blocks, according to overflow ('drop' or 'block'). Buffered records are
+    sent when the handler is flushed or closed, which logging does at
+    interpreter exit.
+
+    This can be used into a Python logging configuration this way::
+
+      [handler_notifier]
+      class=oslo_messaging.BufferedLoggingNotificationHandler
+      level=ERROR
+      args=('rabbit:///',)
+
+    """
+
+    def __init__(self, url, publisher_id=None, driver=None,
+                 topic=None, serializer=None, max_size=1000,
+                 batch_size=100, overflow=_buffer.DROP, flush_timeout=5):
+        super(BufferedLoggingNotificationHandler, self).__init__(
+            url, publisher_id, driver, topic, serializer)
+        self.flush_timeout = flush_timeout
+        self._sender = _buffer.BufferedSender(
+            self._send_records, max_size=max_size, batch_size=batch_size,
+            overflow=overflow, name='oslo.messaging logging notifications')
+
+    def emit(self, record):
+        """Queue the log record to be sent to the notification system.
+
+        :param record: A log record to emit.
+
+        """
+        priority = record.levelname.lower()
+        if getattr(self.notifier, priority, None) is None:
+            return
+        self._sender.put((priority, self._record_payload(record)))
+
+    def _send_records(self, records):
+        records_by_priority = collections.OrderedDict()
+        for priority, payload in records:
+            records_by_priority.setdefault(priority, []).append(payload)
+        for priority, payloads in records_by_priority.items():
+            method = getattr(self.notifier, priority)
+            method({}, 'logrecords', {'records': payloads})
+
+    def flush(self):
+        """Wait, up to flush_timeout seconds, for the queued records."""
+        self._sender.flush(self.flush_timeout)
+
+    def close(self):
+        """Send the queued records and stop the background thread."""
+        self._sender.stop(flush=True, timeout=self.flush_timeout)
+        super(BufferedLoggingNotificationHandler, self).close()
+
+    def get_stats(self):
+        """Return the number of queued, sent and dropped log records."""
+        return self._sender.stats()
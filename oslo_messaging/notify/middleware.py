@@ -23,6 +23,7 @@ import traceback as tb
 
 from oslo_config import cfg
 from oslo_middleware import base
+from oslo_utils import strutils
 import six
 import webob.dec
 
@@ -44,7 +45,18 @@ def log_and_ignore_error(fn):
 
 
 class RequestNotifier(base.Middleware):
-    """Send notification on request."""
+    """Send notification on request.
+
+    The middleware accepts the following options, besides url, publisher_id,
+    service_name and ignore_req_list:
+
+    * async_send: if true, the notifications are queued and sent by a
+      background thread instead of delaying the request. Defaults to the
+      async_send option of the [oslo_messaging_notifications] section, whose
+      async_* options also size the buffer.
+    * environ_keys: a comma separated list of the environ keys to include in
+      the notifications, instead of all the upper case ones.
+    """
 
     @classmethod
     def factory(cls, global_conf, **local_conf):
@@ -57,22 +69,35 @@ class RequestNotifier(base.Middleware):
         return _factory
 
     def __init__(self, app, **conf):
+        async_send = conf.get('async_send')
+        if async_send is not None:
+            async_send = strutils.bool_from_string(async_send)
         self.notifier = notify.Notifier(
             oslo_messaging.get_notification_transport(cfg.CONF,
                                                       conf.get('url')),
             publisher_id=conf.get('publisher_id',
-                                  os.path.basename(sys.argv[0])))
+                                  os.path.basename(sys.argv[0])),
+            async_send=async_send)
         self.service_name = conf.get('service_name')
         self.ignore_req_list = [x.upper().strip() for x in
                                 conf.get('ignore_req_list', '').split(',')]
+        self.environ_keys = None
+        if conf.get('environ_keys'):
+            self.environ_keys = frozenset(
+                x.strip() for x in conf['environ_keys'].split(',')
+                if x.strip())
         super(RequestNotifier, self).__init__(app)
 
     @staticmethod
-    def environ_to_dict(environ):
+    def environ_to_dict(environ, allowed_keys=None):
         """Following PEP 333, server variables are lower case, so don't
         include them.
 
+        If allowed_keys is given, only these keys are included.
         """
+        if allowed_keys is not None:
+            return dict((k, environ[k]) for k in allowed_keys
+                        if k in environ and k != 'HTTP_X_AUTH_TOKEN')
         return dict((k, v) for k, v in six.iteritems(environ)
                     if k.isupper() and k != 'HTTP_X_AUTH_TOKEN')
 
@@ -81,7 +106,8 @@ class RequestNotifier(base.Middleware):
         request.environ['HTTP_X_SERVICE_NAME'] = \
             self.service_name or request.host
         payload = {
-            'request': self.environ_to_dict(request.environ),
+            'request': self.environ_to_dict(request.environ,
+                                            self.environ_keys),
         }
 
         self.notifier.info({},
@@ -92,7 +118,8 @@ class RequestNotifier(base.Middleware):
     def process_response(self, request, response,
                          exception=None, traceback=None):
         payload = {
-            'request': self.environ_to_dict(request.environ),
+            'request': self.environ_to_dict(request.environ,
+                                            self.environ_keys),
         }
 
         if response:
@@ -17,7 +17,6 @@
 
 import abc
 import logging
-import uuid
 
 from oslo_config import cfg
 from oslo_utils import timeutils
@@ -25,6 +24,9 @@ import six
 from stevedore import named
 
 from oslo_messaging._i18n import _LE
+from oslo_messaging import _utils as utils
+from oslo_messaging.notify import _buffer
+from oslo_messaging.notify import _sampling
 from oslo_messaging import serializer as msg_serializer
 from oslo_messaging import transport as msg_transport
 
@@ -51,6 +53,40 @@ _notifier_opts = [
                                       group='DEFAULT')
                 ],
                 help='AMQP topic used for OpenStack notifications.'),
+    cfg.BoolOpt('async_send',
+                default=False,
+                help='Send notifications from a background thread instead '
+                     'of the thread emitting them. Notifications are '
+                     'buffered in a bounded queue and may be lost on '
+                     'overflow or if the process is killed.'),
+    cfg.IntOpt('async_queue_size',
+               default=1000,
+               min=1,
+               help='Maximum number of notifications buffered when '
+                    'async_send is enabled.'),
+    cfg.IntOpt('async_batch_size',
+               default=100,
+               min=1,
+               help='Maximum number of buffered notifications sent by the '
+                    'background thread each time it wakes up.'),
+    cfg.StrOpt('async_overflow_policy',
+               default=_buffer.DROP,
+               choices=_buffer.OVERFLOW_POLICIES,
+               help='What to do when the notification buffer is full: '
+                    'drop the new notification or block the emitting '
+                    'thread until there is room.'),
+    cfg.StrOpt('sampling_config',
+               help='Location of a YAML file with a list of sampling rules '
+                    'applied before any notification driver runs. Each rule '
+                    'has event_type and priority glob patterns and either '
+                    'keep_one_in, to keep one notification in N, or rate '
+                    'and an optional burst, to keep up to rate '
+                    'notifications per second. The first matching rule '
+                    'applies.'),
+    cfg.ListOpt('sampling_exempt_priorities',
+                default=['error', 'critical'],
+                help='Priorities of the notifications which are never '
+                     'dropped by the sampling rules.'),
 ]
 
 _LOG = logging.getLogger(__name__)
@@ -140,11 +176,23 @@ class Notifier(object):
 
         notifier = notifier.prepare(publisher_id='compute')
         notifier.info(ctxt, event_type, payload)
+
+    With the async_send config option, or the async_send argument, the
+    notification drivers are run by a background thread. The emitting thread
+    only serializes the notification and queues it, so a slow or unreachable
+    broker does not delay it. Queued notifications can be waited for with
+    flush() and are flushed when the interpreter exits. The background thread
+    stops once the notifier, and the notifiers prepared from it, have been
+    garbage collected.
+
+    High-volume notifications can be sampled or rate limited with the rules
+    of the sampling_config file. Notifications dropped by these rules never
+    reach the drivers.
     """
 
     def __init__(self, transport, publisher_id=None,
                  driver=None, topic=None,
-                 serializer=None, retry=None):
+                 serializer=None, retry=None, async_send=None):
         """Construct a Notifier object.
 
         :param transport: the transport to use for sending messages
@@ -163,6 +211,9 @@ class Notifier(object):
                       0 means no retry
                       N means N retries
         :type retry: int
+        :param async_send: send notifications from a background thread,
+                           defaults to the async_send config option
+        :type async_send: bool
         """
         conf = transport.conf
         conf.register_opts(_notifier_opts,
@@ -190,6 +241,25 @@ class Notifier(object):
             }
         )
 
+        self._sampler = None
+        sampling_config = conf.oslo_messaging_notifications.sampling_config
+        if sampling_config:
+            self._sampler = _sampling.NotificationSampler.from_file(
+                sampling_config,
+                conf.oslo_messaging_notifications.sampling_exempt_priorities)
+
+        if async_send is None:
+            async_send = conf.oslo_messaging_notifications.async_send
+        self._sender = None
+        if async_send:
+            notifications_conf = conf.oslo_messaging_notifications
+            self._sender = _buffer.BufferedSender(
+                self._send_batch,
+                max_size=notifications_conf.async_queue_size,
+                batch_size=notifications_conf.async_batch_size,
+                overflow=notifications_conf.async_overflow_policy,
+                name='oslo.messaging notifier')
+
     _marker = object()
 
     def prepare(self, publisher_id=_marker, retry=_marker):
@@ -212,26 +282,84 @@ class Notifier(object):
 
     def _notify(self, ctxt, event_type, payload, priority, publisher_id=None,
                 retry=None):
+        if (self._sampler is not None and
+                not self._sampler.accept(event_type, priority)):
+            return
+
         payload = self._serializer.serialize_entity(ctxt, payload)
         ctxt = self._serializer.serialize_context(ctxt)
 
-        msg = dict(message_id=six.text_type(uuid.uuid4()),
+        msg = dict(message_id=six.text_type(utils.generate_uuid()),
                    publisher_id=publisher_id or self.publisher_id,
                    event_type=event_type,
                    priority=priority,
                    payload=payload,
                    timestamp=six.text_type(timeutils.utcnow()))
 
+        if self._sender is not None:
+            self._sender.put((ctxt, msg, priority, retry or self.retry))
+        else:
+            self._do_notify(ctxt, msg, priority, retry or self.retry)
+
+    def _do_notify(self, ctxt, msg, priority, retry):
+        """Send a notification to the drivers, return False if one failed."""
         def do_notify(ext):
             try:
-                ext.obj.notify(ctxt, msg, priority, retry or self.retry)
+                ext.obj.notify(ctxt, msg, priority, retry)
+                return True
             except Exception as e:
                 _LOG.exception(_LE("Problem '%(e)s' attempting to send to "
                                    "notification system. Payload=%(payload)s"),
-                               dict(e=e, payload=payload))
+                               dict(e=e, payload=msg['payload']))
+                return False
 
         if self._driver_mgr.extensions:
-            self._driver_mgr.map(do_notify)
+            return all(self._driver_mgr.map(do_notify))
+        return True
+
+    def _send_batch(self, notifications):
+        failed = 0
+        for ctxt, msg, priority, retry in notifications:
+            if not self._do_notify(ctxt, msg, priority, retry):
+                failed += 1
+        return failed
+
+    def flush(self, timeout=None):
+        """Wait until the notifications sent in background have been sent.
+
+        This is a no-op unless notifications are sent asynchronously.
+
+        :param timeout: maximum number of seconds to wait, None means forever
+        :type timeout: float
+        :returns: True if no notification is waiting to be sent
+        """
+        if self._sender is None:
+            return True
+        return self._sender.flush(timeout)
+
+    def get_async_stats(self):
+        """Return statistics about the notifications sent in background.
+
+        The returned dict contains the number of notifications still
+        'queued', the number 'sent', the number 'failed' because a driver
+        failed to send them and the number 'dropped' because the buffer was
+        full. None is returned unless notifications are sent
+        asynchronously.
+        """
+        if self._sender is None:
+            return None
+        return self._sender.stats()
+
+    def get_sampling_stats(self):
+        """Return statistics about the sampling of notifications.
+
+        The returned dict contains the number of notifications 'sampled', that
+        matched a sampling rule, and the number of those 'dropped'. None is
+        returned unless sampling rules are configured.
+        """
+        if self._sampler is None:
+            return None
+        return self._sampler.stats()
 
     def audit(self, ctxt, event_type, payload):
         """Send a notification at audit level.
@@ -352,6 +480,8 @@ class _SubNotifier(Notifier):
 
         self._serializer = self._base._serializer
         self._driver_mgr = self._base._driver_mgr
+        self._sender = self._base._sender
+        self._sampler = self._base._sampler
 
     def _notify(self, ctxt, event_type, payload, priority):
         super(_SubNotifier, self)._notify(ctxt, event_type, payload, priority)
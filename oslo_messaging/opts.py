@@ -22,7 +22,10 @@ import itertools
 
 from oslo_messaging._drivers import amqp
 from oslo_messaging._drivers import base as drivers_base
+from oslo_messaging._drivers import impl_hybrid
+from oslo_messaging._drivers import impl_memory
 from oslo_messaging._drivers import impl_rabbit
+from oslo_messaging._drivers import impl_unix
 from oslo_messaging._drivers import impl_zmq
 from oslo_messaging._drivers.protocols.amqp import opts as amqp_opts
 from oslo_messaging._drivers.zmq_driver.matchmaker import matchmaker_redis
@@ -44,9 +47,12 @@ _opts = [
     (None, list(itertools.chain(*_global_opt_lists))),
     ('matchmaker_redis', matchmaker_redis.matchmaker_redis_opts),
     ('oslo_messaging_amqp', amqp_opts.amqp1_opts),
+    ('oslo_messaging_hybrid', impl_hybrid.hybrid_opts),
+    ('oslo_messaging_memory', impl_memory.memory_opts),
     ('oslo_messaging_notifications', notifier._notifier_opts),
     ('oslo_messaging_rabbit', list(itertools.chain(amqp.amqp_opts,
                                                    impl_rabbit.rabbit_opts))),
+    ('oslo_messaging_unix', impl_unix.unix_opts),
 ]
 
 
@@ -0,0 +1,81 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sys
+import threading
+
+import oslo_messaging
+
+
+class DriverTestMixin(object):
+    """Tests every driver serving the servers of the host passes.
+
+    The test case sets self.driver, the driver of the transport URL of its
+    url attribute, and self.target, a target with a server.  A call without
+    listener raises the no_listener_error exception.
+    """
+
+    no_listener_error = oslo_messaging.MessagingTimeout
+
+    def _get_driver(self, url):
+        transport = oslo_messaging.get_transport(self.conf, url)
+        self.addCleanup(transport.cleanup)
+        return transport._driver
+
+    def _listen(self, target, driver=None):
+        listener = (driver or self.driver).listen(target)
+        self.addCleanup(listener.cleanup)
+        return listener
+
+    def _serve(self, listener, failure=None):
+        def _reply():
+            incoming = listener.poll(timeout=5)[0]
+            if failure is not None:
+                try:
+                    raise failure
+                except Exception:
+                    incoming.reply(failure=sys.exc_info())
+            else:
+                incoming.reply(incoming.message['value'] * 2)
+
+        thread = threading.Thread(target=_reply)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def test_call(self):
+        self._serve(self._listen(self.target))
+
+        result = self.driver.send(self.target, {}, {'value': 21},
+                                  wait_for_reply=True, timeout=5)
+        self.assertEqual(42, result)
+
+    def test_call_failure(self):
+        self._serve(self._listen(self.target), failure=ValueError('boom'))
+
+        self.assertRaises(ValueError, self.driver.send, self.target, {},
+                          {'value': 21}, wait_for_reply=True, timeout=5)
+
+    def test_call_without_listener(self):
+        self.assertRaises(self.no_listener_error, self.driver.send,
+                          self.target, {}, {'value': 21},
+                          wait_for_reply=True, timeout=0.1)
+
+    def test_fanout(self):
+        listener_1 = self._listen(self.target)
+        listener_2 = self._listen(
+            oslo_messaging.Target(topic='topic', server='other'))
+
+        self.driver.send(oslo_messaging.Target(topic='topic', fanout=True),
+                         {}, {'value': 1})
+
+        self.assertEqual(1, len(listener_1.poll(timeout=5)))
+        self.assertEqual(1, len(listener_2.poll(timeout=5)))
@@ -0,0 +1,124 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import unittest
+
+import mock
+
+from oslo_messaging._drivers.pika_driver import pika_listener
+from oslo_messaging import exceptions
+
+
+class _FakeReplyPoller(object):
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.started = False
+        self.stopped = threading.Event()
+        self.messages = []
+        self.polled = threading.Event()
+
+    def start(self, timeout=None):
+        self.started = True
+
+    def poll(self, timeout=None, prefetch_size=1):
+        if self.messages:
+            return [self.messages.pop(0)]
+        self.polled.set()
+        self.stopped.wait(0.01)
+        return []
+
+    def stop(self):
+        self.stopped.set()
+
+    def cleanup(self):
+        pass
+
+
+class RpcReplyPikaListenerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._pika_engine = mock.Mock()
+        self._pika_engine.rpc_reply_listener_consumers = 3
+        self._pika_engine.host_connection_reconnect_delay = 0.01
+        self._pollers = []
+
+        def create_poller(**kwargs):
+            poller = _FakeReplyPoller(**kwargs)
+            self._pollers.append(poller)
+            return poller
+
+        patcher = mock.patch(
+            "oslo_messaging._drivers.pika_driver.pika_poller."
+            "RpcReplyPikaPoller", side_effect=create_poller
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._listener = pika_listener.RpcReplyPikaListener(self._pika_engine)
+        self.addCleanup(self._listener.cleanup)
+
+    def test_start_creates_consumers(self):
+        self._listener.start()
+        qname = self._listener.get_reply_qname(timeout=5)
+
+        self.assertEqual(3, len(self._pollers))
+        for poller in self._pollers:
+            self.assertTrue(poller.started)
+            self.assertEqual(qname, poller.kwargs['queue'])
+            self.assertTrue(poller.polled.wait(5))
+
+    def test_get_reply_qname_retries_initialization(self):
+        with mock.patch(
+                "oslo_messaging._drivers.pika_driver.pika_poller."
+                "RpcReplyPikaPoller",
+                side_effect=[Exception("no broker")] + [
+                    _FakeReplyPoller() for __ in range(3)]):
+            self.assertIsNotNone(self._listener.get_reply_qname(timeout=5))
+
+    def test_get_reply_qname_timeout(self):
+        with mock.patch(
+                "oslo_messaging._drivers.pika_driver.pika_poller."
+                "RpcReplyPikaPoller", side_effect=Exception("no broker")):
+            self.assertRaises(exceptions.MessagingTimeout,
+                              self._listener.get_reply_qname, timeout=0.05)
+
+    def test_reply_dispatched_by_msg_id(self):
+        self._listener.get_reply_qname(timeout=5)
+        future_1 = self._listener.register_reply_waiter("msg_1")
+        future_2 = self._listener.register_reply_waiter("msg_2")
+
+        reply_2 = mock.Mock(msg_id="msg_2")
+        reply_1 = mock.Mock(msg_id="msg_1")
+        self._pollers[0].messages.append(reply_2)
+        self._pollers[2].messages.append(reply_1)
+
+        self.assertIs(reply_1, future_1.result(5))
+        self.assertIs(reply_2, future_2.result(5))
+        self.assertTrue(reply_1.acknowledge.called)
+        self.assertTrue(reply_2.acknowledge.called)
+
+        stats = self._listener.stats()
+        self.assertEqual(0, stats['waiting'])
+        self.assertEqual(2, stats['replies'])
+        self.assertTrue(stats['latency_max'] >= stats['latency_avg'] >= 0)
+
+    def test_unregister_reply_waiter(self):
+        self._listener.register_reply_waiter("msg_1")
+        self.assertEqual(1, self._listener.stats()['waiting'])
+
+        self._listener.unregister_reply_waiter("msg_1")
+        self._listener.unregister_reply_waiter("msg_1")
+
+        stats = self._listener.stats()
+        self.assertEqual(0, stats['waiting'])
+        self.assertEqual(1, stats['unregistered'])
+        self.assertEqual(0, stats['replies'])
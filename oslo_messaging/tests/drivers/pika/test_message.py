@@ -23,6 +23,7 @@ from pika import spec
 
 import oslo_messaging
 from oslo_messaging._drivers.pika_driver import pika_engine
+from oslo_messaging._drivers.pika_driver import pika_exceptions as pika_drv_exc
 from oslo_messaging._drivers.pika_driver import pika_message as pika_drv_msg
 
 
@@ -54,6 +55,62 @@ class PikaIncomingMessageTestCase(unittest.TestCase):
         self.assertEqual(message.message.get("payload_key", None),
                          "payload_value")
 
+    def test_message_body_parsing_nested_context(self):
+        properties = pika.BasicProperties(
+            content_type="application/json",
+            headers={"version": "1.1"},
+        )
+        body = (
+            b'{"c": {"key_context": "context_value"},'
+            b'"m": {"payload_key": "payload_value"}}'
+        )
+        message = pika_drv_msg.PikaIncomingMessage(
+            self._pika_engine, self._channel, self._method, properties, body
+        )
+
+        self.assertEqual({"key_context": "context_value"}, message.ctxt)
+        self.assertEqual({"payload_key": "payload_value"}, message.message)
+
+    def test_message_unsupported_version(self):
+        properties = pika.BasicProperties(
+            content_type="application/json",
+            headers={"version": "2.0"},
+        )
+        self.assertRaises(
+            pika_drv_exc.UnsupportedDriverVersion,
+            pika_drv_msg.PikaIncomingMessage, self._pika_engine,
+            self._channel, self._method, properties, self._body
+        )
+
+    def test_message_round_trip_large_context(self):
+        # a keystone like service catalog, which is carried by the context
+        # of many requests
+        catalog = [
+            {"type": "service-%d" % i, "name": "service-%d" % i,
+             "endpoints": [
+                 {"region": "region-%d" % r, "interface": interface,
+                  "url": "http://service-%d.region-%d:%d/v2" % (i, r, i)}
+                 for r in range(5)
+                 for interface in ("public", "internal", "admin")]}
+            for i in range(30)
+        ]
+        context = {"request_id": "req-1", "service_catalog": catalog}
+        payload = {"method": "do", "args": {"key": "value"}}
+
+        outgoing = pika_drv_msg.PikaOutgoingMessage(
+            self._pika_engine, payload, context
+        )
+        msg_dict, props = outgoing._prepare_message_to_send()
+        self.assertIs(payload, msg_dict["m"])
+        self.assertIs(context, msg_dict["c"])
+
+        message = pika_drv_msg.PikaIncomingMessage(
+            self._pika_engine, self._channel, self._method, props,
+            jsonutils.dump_as_bytes(msg_dict)
+        )
+        self.assertEqual(context, message.ctxt)
+        self.assertEqual(payload, message.message)
+
     def test_message_acknowledge(self):
         message = pika_drv_msg.PikaIncomingMessage(
             self._pika_engine, self._channel, self._method, self._properties,
@@ -311,6 +368,7 @@ class RpcReplyPikaIncomingMessageTestCase(unittest.TestCase):
 class PikaOutgoingMessageTestCase(unittest.TestCase):
     def setUp(self):
         self._pika_engine = mock.MagicMock()
+        self._pika_engine.nested_message_context = True
         self._exchange = "it is exchange"
         self._routing_key = "it is routing key"
         self._expiration = 1
@@ -349,8 +407,8 @@ class PikaOutgoingMessageTestCase(unittest.TestCase):
         ).__enter__().channel.publish.call_args[1]["body"]
 
         self.assertEqual(
-            b'{"_$_request_id": 555, "_$_token": "it is a token", '
-            b'"msg_str": "hello", "msg_type": 1}',
+            b'{"c": {"request_id": 555, "token": "it is a token"}, '
+            b'"m": {"msg_str": "hello", "msg_type": 1}}',
             body
         )
 
@@ -362,7 +420,7 @@ class PikaOutgoingMessageTestCase(unittest.TestCase):
         self.assertEqual(props.delivery_mode, 2)
         self.assertTrue(self._expiration * 1000 - float(props.expiration) <
                         100)
-        self.assertEqual(props.headers, {'version': '1.0'})
+        self.assertEqual(props.headers, {'version': '1.1'})
         self.assertTrue(props.message_id)
 
     @patch("oslo_serialization.jsonutils.dumps",
@@ -394,8 +452,8 @@ class PikaOutgoingMessageTestCase(unittest.TestCase):
         ).__enter__().channel.publish.call_args[1]["body"]
 
         self.assertEqual(
-            b'{"_$_request_id": 555, "_$_token": "it is a token", '
-            b'"msg_str": "hello", "msg_type": 1}',
+            b'{"c": {"request_id": 555, "token": "it is a token"}, '
+            b'"m": {"msg_str": "hello", "msg_type": 1}}',
             body
         )
 
@@ -407,9 +465,39 @@ class PikaOutgoingMessageTestCase(unittest.TestCase):
         self.assertEqual(props.delivery_mode, 1)
         self.assertTrue(self._expiration * 1000 - float(props.expiration)
                         < 100)
-        self.assertEqual(props.headers, {'version': '1.0'})
+        self.assertEqual(props.headers, {'version': '1.1'})
         self.assertTrue(props.message_id)
 
+    @patch("oslo_serialization.jsonutils.dumps",
+           new=functools.partial(jsonutils.dumps, sort_keys=True))
+    def test_send_legacy_format(self):
+        self._pika_engine.nested_message_context = False
+        message = pika_drv_msg.PikaOutgoingMessage(
+            self._pika_engine, self._message, self._context
+        )
+
+        message.send(
+            exchange=self._exchange,
+            routing_key=self._routing_key,
+            confirm=True,
+            mandatory=self._mandatory,
+            persistent=True,
+            expiration_time=self._expiration_time,
+            retrier=None
+        )
+
+        publish = self._pika_engine.connection_with_confirmation_pool.acquire(
+        ).__enter__().channel.publish
+
+        self.assertEqual(
+            b'{"_$_request_id": 555, "_$_token": "it is a token", '
+            b'"msg_str": "hello", "msg_type": 1}',
+            publish.call_args[1]["body"]
+        )
+        self.assertEqual(publish.call_args[1]["properties"].headers,
+                         {'version': '1.0'})
+        self.assertEqual({"msg_type": 1, "msg_str": "hello"}, self._message)
+
 
 class RpcPikaOutgoingMessageTestCase(unittest.TestCase):
     def setUp(self):
@@ -417,6 +505,7 @@ class RpcPikaOutgoingMessageTestCase(unittest.TestCase):
         self._routing_key = "it is routing key"
 
         self._pika_engine = mock.MagicMock()
+        self._pika_engine.nested_message_context = True
         self._pika_engine.get_rpc_exchange_name.return_value = self._exchange
         self._pika_engine.get_rpc_queue_name.return_value = self._routing_key
 
@@ -453,8 +542,8 @@ class RpcPikaOutgoingMessageTestCase(unittest.TestCase):
         ).__enter__().channel.publish.call_args[1]["body"]
 
         self.assertEqual(
-            b'{"_$_request_id": 555, "_$_token": "it is a token", '
-            b'"msg_str": "hello", "msg_type": 1}',
+            b'{"c": {"request_id": 555, "token": "it is a token"}, '
+            b'"m": {"msg_str": "hello", "msg_type": 1}}',
             body
         )
 
@@ -465,7 +554,7 @@ class RpcPikaOutgoingMessageTestCase(unittest.TestCase):
         self.assertEqual(props.content_type, 'application/json')
         self.assertEqual(props.delivery_mode, 1)
         self.assertTrue(expiration * 1000 - float(props.expiration) < 100)
-        self.assertEqual(props.headers, {'version': '1.0'})
+        self.assertEqual(props.headers, {'version': '1.1'})
         self.assertIsNone(props.correlation_id)
         self.assertIsNone(props.reply_to)
         self.assertTrue(props.message_id)
@@ -511,8 +600,8 @@ class RpcPikaOutgoingMessageTestCase(unittest.TestCase):
         ).__enter__().channel.publish.call_args[1]["body"]
 
         self.assertEqual(
-            b'{"_$_request_id": 555, "_$_token": "it is a token", '
-            b'"msg_str": "hello", "msg_type": 1}',
+            b'{"c": {"request_id": 555, "token": "it is a token"}, '
+            b'"m": {"msg_str": "hello", "msg_type": 1}}',
             body
         )
 
@@ -523,7 +612,7 @@ class RpcPikaOutgoingMessageTestCase(unittest.TestCase):
         self.assertEqual(props.content_type, 'application/json')
         self.assertEqual(props.delivery_mode, 1)
         self.assertTrue(expiration * 1000 - float(props.expiration) < 100)
-        self.assertEqual(props.headers, {'version': '1.0'})
+        self.assertEqual(props.headers, {'version': '1.1'})
         self.assertEqual(props.correlation_id, message.msg_id)
         self.assertEquals(props.reply_to, reply_queue_name)
         self.assertTrue(props.message_id)
@@ -537,6 +626,7 @@ class RpcReplyPikaOutgoingMessageTestCase(unittest.TestCase):
         self._expiration_time = time.time() + self._expiration
 
         self._pika_engine = mock.MagicMock()
+        self._pika_engine.nested_message_context = True
 
         self._rpc_reply_exchange = "rpc_reply_exchange"
         self._pika_engine.rpc_reply_exchange = self._rpc_reply_exchange
@@ -555,7 +645,7 @@ class RpcReplyPikaOutgoingMessageTestCase(unittest.TestCase):
 
         self._pika_engine.connection_with_confirmation_pool.acquire(
         ).__enter__().channel.publish.assert_called_once_with(
-            body=b'{"s": "all_fine"}',
+            body=b'{"m": {"s": "all_fine"}}',
             exchange=self._rpc_reply_exchange, mandatory=True,
             properties=mock.ANY,
             routing_key=self._reply_q
@@ -569,7 +659,7 @@ class RpcReplyPikaOutgoingMessageTestCase(unittest.TestCase):
         self.assertEqual(props.delivery_mode, 1)
         self.assertTrue(self._expiration * 1000 - float(props.expiration) <
                         100)
-        self.assertEqual(props.headers, {'version': '1.0'})
+        self.assertEqual(props.headers, {'version': '1.1'})
         self.assertEqual(props.correlation_id, message.msg_id)
         self.assertIsNone(props.reply_to)
         self.assertTrue(props.message_id)
@@ -602,9 +692,9 @@ class RpcReplyPikaOutgoingMessageTestCase(unittest.TestCase):
         body = self._pika_engine.connection_with_confirmation_pool.acquire(
         ).__enter__().channel.publish.call_args[1]["body"]
         self.assertEqual(
-            b'{"e": {"c": "MessagingException", '
+            b'{"m": {"e": {"c": "MessagingException", '
             b'"m": "oslo_messaging.exceptions", "s": "Error message", '
-            b'"t": ["It is a trace"]}}',
+            b'"t": ["It is a trace"]}}}',
             body
         )
 
@@ -616,7 +706,7 @@ class RpcReplyPikaOutgoingMessageTestCase(unittest.TestCase):
         self.assertEqual(props.delivery_mode, 1)
         self.assertTrue(self._expiration * 1000 - float(props.expiration) <
                         100)
-        self.assertEqual(props.headers, {'version': '1.0'})
+        self.assertEqual(props.headers, {'version': '1.1'})
         self.assertEqual(props.correlation_id, message.msg_id)
         self.assertIsNone(props.reply_to)
         self.assertTrue(props.message_id)
@@ -12,6 +12,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+import socket
+import threading
 import time
 import unittest
 
@@ -33,6 +36,14 @@ class PikaPollerTestCase(unittest.TestCase):
         )
         self._prefetch_count = 123
 
+        # the poller waits for data on the connection socket, make it always
+        # readable
+        self._socket, self._peer_socket = socket.socketpair()
+        self.addCleanup(self._socket.close)
+        self.addCleanup(self._peer_socket.close)
+        self._peer_socket.send(b'x')
+        self._poller_connection_mock._impl.socket = self._socket
+
     @mock.patch("oslo_messaging._drivers.pika_driver.pika_poller.PikaPoller."
                 "_declare_queue_binding")
     def test_poll(self, declare_queue_binding_mock):
@@ -217,6 +228,80 @@ class PikaPollerTestCase(unittest.TestCase):
         self.assertTrue(declare_queue_binding_mock.called)
 
 
+    @mock.patch("oslo_messaging._drivers.pika_driver.pika_poller.PikaPoller."
+                "_declare_queue_binding")
+    def test_stop_wakes_up_poll(self, declare_queue_binding_mock):
+        poller = pika_poller.PikaPoller(
+            self._pika_engine, self._prefetch_count,
+            incoming_message_class=mock.Mock()
+        )
+        # no data on the connection socket
+        self._socket.recv(1)
+
+        poller.start()
+        result = []
+        thread = threading.Thread(target=lambda: result.append(poller.poll()))
+        thread.start()
+        time.sleep(0.1)
+
+        start = time.time()
+        poller.stop()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([[]], result)
+        self.assertTrue(time.time() - start < poller._MAX_IO_WAIT)
+        self.assertEqual(
+            1, self._poller_connection_mock.process_data_events.call_count)
+
+    @mock.patch("oslo_messaging._drivers.pika_driver.pika_poller.PikaPoller."
+                "_declare_queue_binding")
+    def test_poll_returns_when_data_arrives(self, declare_queue_binding_mock):
+        incoming_message_class_mock = mock.Mock()
+        poller = pika_poller.PikaPoller(
+            self._pika_engine, self._prefetch_count,
+            incoming_message_class=incoming_message_class_mock
+        )
+        self._socket.recv(1)
+
+        def f(time_limit):
+            if self._poller_connection_mock.process_data_events.call_count > 1:
+                self._socket.recv(1)
+                poller._on_message_no_ack_callback(
+                    object(), object(), object(), object()
+                )
+
+        self._poller_connection_mock.process_data_events.side_effect = f
+
+        poller.start()
+        threading.Timer(0.1, self._peer_socket.send, (b'x',)).start()
+        start = time.time()
+        res = poller.poll(timeout=5)
+
+        self.assertEqual(1, len(res))
+        self.assertTrue(time.time() - start < poller._MAX_IO_WAIT)
+
+    @mock.patch("oslo_messaging._drivers.pika_driver.pika_poller.PikaPoller."
+                "_declare_queue_binding")
+    def test_cleanup_closes_wakeup_pipe(self, declare_queue_binding_mock):
+        poller = pika_poller.PikaPoller(
+            self._pika_engine, self._prefetch_count,
+            incoming_message_class=mock.Mock()
+        )
+        self._socket.recv(1)
+
+        poller.start()
+        self.assertEqual([], poller.poll(timeout=0.05))
+        wakeup_fds = poller._wakeup_fds
+        self.assertIsNotNone(wakeup_fds)
+
+        poller.cleanup()
+
+        self.assertIsNone(poller._wakeup_fds)
+        for fd in wakeup_fds:
+            self.assertRaises(OSError, os.fstat, fd)
+
+
 class RpcServicePikaPollerTestCase(unittest.TestCase):
     def setUp(self):
         self._pika_engine = mock.Mock()
@@ -0,0 +1,217 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+import fixtures
+from six.moves import mock
+import testscenarios
+
+import oslo_messaging
+from oslo_messaging._drivers import impl_fake
+from oslo_messaging._drivers import impl_hybrid
+from oslo_messaging._drivers import impl_memory
+from oslo_messaging._drivers import impl_unix
+from oslo_messaging.tests.drivers import driver_common
+from oslo_messaging.tests import utils as test_utils
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestHybridDriverLoad(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestHybridDriverLoad, self).setUp()
+        self.conf.register_opts(impl_hybrid.hybrid_opts,
+                                group='oslo_messaging_hybrid')
+        self.config(local_transport_url='memory://',
+                    group='oslo_messaging_hybrid')
+
+    def test_driver_load(self):
+        transport = oslo_messaging.get_transport(self.conf,
+                                                 'hybrid+fake:///vhost')
+        self.addCleanup(transport.cleanup)
+        driver = transport._driver
+        self.assertIsInstance(driver, impl_hybrid.HybridDriver)
+        self.assertIsInstance(driver._broker, impl_fake.FakeDriver)
+        self.assertIsInstance(driver._local, impl_memory.MemoryDriver)
+        self.assertEqual('vhost', driver._local._virtual_host)
+
+    def test_no_broker_transport(self):
+        self.assertRaises(oslo_messaging.InvalidTransportURL,
+                          oslo_messaging.get_transport, self.conf,
+                          'hybrid://')
+
+    def test_invalid_local_transport(self):
+        self.config(local_transport_url='fake://',
+                    group='oslo_messaging_hybrid')
+        self.assertRaises(oslo_messaging.InvalidTransportURL,
+                          oslo_messaging.get_transport, self.conf,
+                          'hybrid+fake://')
+
+
+class TestHybridDriver(test_utils.BaseTestCase,
+                       driver_common.DriverTestMixin):
+
+    scenarios = [
+        ('memory', {'local_url': 'memory://'}),
+        ('unix', {'local_url': 'unix://'}),
+    ]
+
+    url = 'hybrid+fake://'
+
+    def setUp(self):
+        super(TestHybridDriver, self).setUp()
+        self.useFixture(fixtures.MonkeyPatch(
+            'oslo_messaging._drivers.impl_memory._exchanges', {}))
+        self.conf.register_opts(impl_hybrid.hybrid_opts,
+                                group='oslo_messaging_hybrid')
+        self.conf.register_opts(impl_unix.unix_opts,
+                                group='oslo_messaging_unix')
+        self.config(local_transport_url=self.local_url,
+                    group='oslo_messaging_hybrid')
+        self.config(socket_dir=self.useFixture(fixtures.TempDir()).path,
+                    group='oslo_messaging_unix')
+        self.driver = self._get_driver(self.url)
+        self.local_send = self._spy(self.driver._local, 'send')
+        self.broker_send = self._spy(self.driver._broker, 'send')
+        self.target = oslo_messaging.Target(topic='topic', server='server')
+
+    def _spy(self, driver, name):
+        patcher = mock.patch.object(driver, name,
+                                    side_effect=getattr(driver, name))
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_call_to_local_server(self):
+        self._serve(self._listen(self.target))
+
+        result = self.driver.send(self.target, {}, {'value': 21},
+                                  wait_for_reply=True, timeout=5)
+
+        self.assertEqual(42, result)
+        self.assertEqual(1, self.local_send.call_count)
+        self.assertFalse(self.broker_send.called)
+
+    def test_call_not_delivered_locally(self):
+        self._serve(self._listen(self.target, driver=self.driver._broker))
+        self.local_send.side_effect = impl_memory.MessageNotDelivered('dead')
+
+        with mock.patch.object(self.driver._local, 'has_listeners',
+                               return_value=True):
+            result = self.driver.send(self.target, {}, {'value': 21},
+                                      wait_for_reply=True, timeout=5)
+
+        self.assertEqual(42, result)
+        self.assertEqual(1, self.local_send.call_count)
+        self.assertEqual(1, self.broker_send.call_count)
+
+    def test_call_to_dead_local_server(self):
+        if self.local_url != 'unix://':
+            self.skipTest('only the unix listeners die with their process')
+        listener = self._listen(self.target)
+        # a local listener killed without cleaning up leaves its files behind
+        local_listener = listener._listeners[0]
+        local_listener._closing = True
+        local_listener._sock.close()
+        self._serve(listener)
+
+        result = self.driver.send(self.target, {}, {'value': 21},
+                                  wait_for_reply=True, timeout=5)
+
+        self.assertEqual(42, result)
+        self.assertEqual(1, self.broker_send.call_count)
+
+    def test_call_failure_not_retried(self):
+        self.local_send.side_effect = oslo_messaging.MessageDeliveryFailure(
+            'connection lost')
+
+        with mock.patch.object(self.driver._local, 'has_listeners',
+                               return_value=True):
+            self.assertRaises(oslo_messaging.MessageDeliveryFailure,
+                              self.driver.send, self.target, {},
+                              {'value': 21}, wait_for_reply=True, timeout=5)
+        self.assertFalse(self.broker_send.called)
+
+    def test_call_to_remote_server(self):
+        self._serve(self._listen(self.target, driver=self.driver._broker))
+
+        result = self.driver.send(self.target, {}, {'value': 21},
+                                  wait_for_reply=True, timeout=5)
+
+        self.assertEqual(42, result)
+        self.assertFalse(self.local_send.called)
+
+    def test_cast_to_topic(self):
+        listener = self._listen(self.target)
+
+        self.driver.send(oslo_messaging.Target(topic='topic'), {},
+                         {'value': 1})
+
+        self.assertEqual(1, listener.poll(timeout=5)[0].message['value'])
+        self.assertFalse(self.local_send.called)
+
+    def test_cast_to_topic_delivered_locally(self):
+        self.driver._local_topic_delivery = True
+        listener = self._listen(self.target)
+
+        self.driver.send(oslo_messaging.Target(topic='topic'), {},
+                         {'value': 1})
+
+        self.assertEqual(1, listener.poll(timeout=5)[0].message['value'])
+        self.assertFalse(self.broker_send.called)
+
+    def test_fanout_through_broker(self):
+        listener = self._listen(self.target)
+
+        self.driver.send(oslo_messaging.Target(topic='topic', fanout=True),
+                         {}, {'value': 1})
+
+        self.assertEqual(1, len(listener.poll(timeout=5)))
+        self.assertEqual([], listener.poll(timeout=0.1))
+        self.assertFalse(self.local_send.called)
+
+    def test_batch_poll_from_both_transports(self):
+        listener = self._listen(self.target)
+        self.driver._local.send(self.target, {}, {'value': 1})
+        self.driver._broker.send(self.target, {}, {'value': 2})
+
+        incomings = listener.poll(timeout=5, prefetch_size=2)
+
+        self.assertEqual([1, 2],
+                         sorted(i.message['value'] for i in incomings))
+
+    def test_poll_woken_up_by_stop(self):
+        listener = self._listen(self.target)
+        thread = threading.Thread(target=listener.poll)
+        thread.start()
+
+        listener.stop()
+
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_notifications_through_broker(self):
+        target = oslo_messaging.Target(topic='notifications')
+        listener = self.driver.listen_for_notifications([(target, 'info')],
+                                                        None)
+        self.addCleanup(listener.cleanup)
+
+        with mock.patch.object(self.driver._local,
+                               'send_notification') as local_notify:
+            self.driver.send_notification(
+                oslo_messaging.Target(topic='notifications.info'), {},
+                {'event_type': 'event'}, 2.0)
+
+        self.assertEqual('event',
+                         listener.poll(timeout=5)[0].message['event_type'])
+        self.assertFalse(local_notify.called)
@@ -17,6 +17,7 @@ from kafka.common import KafkaError
 import mock
 import testscenarios
 from testtools.testcase import unittest
+import threading
 import time
 
 import oslo_messaging
@@ -124,15 +125,45 @@ class TestKafkaConnection(test_utils.BaseTestCase):
                          {"fake_text": "fake_message_1"}, 10)
         self.assertEqual(1, len(fake_send.mock_calls))
 
+    @mock.patch('time.sleep')
     @mock.patch.object(kafka_driver.Connection, '_ensure_connection')
     @mock.patch.object(kafka_driver.Connection, '_send')
-    def test_notify_with_retry(self, fake_send, fake_ensure_connection):
+    def test_notify_with_retry(self, fake_send, fake_ensure_connection,
+                               fake_sleep):
         conn = self.driver._get_connection(kafka_driver.PURPOSE_SEND)
         fake_send.side_effect = KafkaError("fake_exception")
         conn.notify_send("fake_topic", {"fake_ctxt": "fake_param"},
                          {"fake_text": "fake_message_2"}, 10)
         self.assertEqual(10, len(fake_send.mock_calls))
 
+    @mock.patch('time.sleep')
+    @mock.patch.object(kafka_driver.Connection, '_ensure_connection')
+    @mock.patch.object(kafka_driver.Connection, '_send')
+    def test_notify_retry_backoff(self, fake_send, fake_ensure_connection,
+                                  fake_sleep):
+        conn = self.driver._get_connection(kafka_driver.PURPOSE_SEND)
+        fake_send.side_effect = ([KafkaError("fake_exception")] * 9 +
+                                 [None])
+        conn.notify_send("fake_topic", {"fake_ctxt": "fake_param"},
+                         {"fake_text": "fake_message_2"}, None)
+        self.assertEqual(10, len(fake_send.mock_calls))
+        self.assertEqual([0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 6.4, 10, 10],
+                         [round(c[0][0], 1)
+                          for c in fake_sleep.call_args_list])
+
+    @mock.patch.object(kafka_driver.Connection, '_ensure_connection')
+    @mock.patch.object(kafka_driver.Connection, '_send')
+    def test_send_given_up_when_stopping(self, fake_send,
+                                         fake_ensure_connection):
+        conn = self.driver._get_connection(kafka_driver.PURPOSE_SEND)
+        fake_send.side_effect = KafkaError("fake_exception")
+        stopping = threading.Event()
+        stopping.set()
+
+        self.assertFalse(conn._send_and_retry(['message'], "fake_topic",
+                                              None, stopping=stopping))
+        self.assertEqual(1, len(fake_send.mock_calls))
+
     @mock.patch.object(kafka_driver.Connection, '_ensure_connection')
     @mock.patch.object(kafka_driver.Connection, '_parse_url')
     def test_consume(self, fake_parse_url, fake_ensure_connection):
@@ -147,9 +178,27 @@ class TestKafkaConnection(test_utils.BaseTestCase):
         conn.consumer.fetch_messages = mock.MagicMock(
             return_value=iter([json.dumps(fake_message)]))
 
-        self.assertEqual(fake_message, json.loads(conn.consume()[0]))
+        self.assertEqual(fake_message, json.loads(next(conn.consume())))
         self.assertEqual(1, len(conn.consumer.fetch_messages.mock_calls))
 
+    @mock.patch.object(kafka_driver.Connection, '_ensure_connection')
+    @mock.patch.object(kafka_driver.Connection, '_parse_url')
+    def test_consume_max_fetch_messages(self, fake_parse_url,
+                                        fake_ensure_connection):
+        self.config(kafka_max_fetch_messages=2, group='oslo_messaging_kafka')
+        conn = kafka_driver.Connection(
+            self.conf, '', kafka_driver.PURPOSE_LISTEN)
+
+        conn.consumer = mock.MagicMock()
+        conn.consumer.fetch_messages = mock.MagicMock(
+            side_effect=[iter(['1', '2', '3']), iter(['4'])])
+
+        self.assertEqual(['1', '2'], list(conn.consume()))
+        self.assertEqual(['3'], list(conn.consume()))
+        self.assertEqual(['4'], list(conn.consume()))
+        self.assertEqual(2, len(conn.consumer.fetch_messages.mock_calls))
+        self.assertFalse(conn.consumer.configure.called)
+
     @mock.patch.object(kafka_driver.Connection, '_ensure_connection')
     @mock.patch.object(kafka_driver.Connection, '_parse_url')
     def test_consume_timeout(self, fake_parse_url, fake_ensure_connection):
@@ -190,6 +239,91 @@ class TestKafkaConnection(test_utils.BaseTestCase):
         self.assertEqual(0, int(deadline - time.time()))
 
 
+class TestKafkaBatchingProducer(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestKafkaBatchingProducer, self).setUp()
+        self.conn = mock.Mock()
+        self.sent = []
+        self.conn._send_and_retry.side_effect = self._send_and_retry
+
+    def _send_and_retry(self, messages, topic, retry, stopping):
+        self.sent.append((topic, [json.loads(m)['message'] for m in messages]))
+        return True
+
+    def _producer(self, linger=0.05, max_batch_bytes=16384, max_queued=100):
+        producer = kafka_driver.BatchingProducer(
+            self.conn, linger, max_batch_bytes, max_queued)
+        self.addCleanup(producer.stop)
+        return producer
+
+    def test_batch_per_topic(self):
+        producer = self._producer()
+        for i in range(3):
+            producer.send('topic_a', {'message': i, 'context': {}}, None)
+            producer.send('topic_b', {'message': -i, 'context': {}}, None)
+        producer.stop()
+
+        self.assertEqual([('topic_a', [0, 1, 2]), ('topic_b', [0, -1, -2])],
+                         sorted(self.sent))
+        self.conn.close.assert_called_once_with()
+
+    def test_linger(self):
+        producer = self._producer(linger=0.01)
+        producer.send('topic_a', {'message': 0, 'context': {}}, None)
+        deadline = time.time() + 10
+        while not self.sent and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([('topic_a', [0])], self.sent)
+
+    def test_max_batch_bytes(self):
+        producer = self._producer(linger=60, max_batch_bytes=1)
+        producer.send('topic_a', {'message': 0, 'context': {}}, None)
+        deadline = time.time() + 10
+        while not self.sent and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([('topic_a', [0])], self.sent)
+
+    def test_stop_drops_batches_not_sent(self):
+        closed_while_sending = []
+
+        def _send_and_retry(messages, topic, retry, stopping):
+            # the broker is down, the batch is retried until stopping
+            stopping.wait()
+            closed_while_sending.append(self.conn.close.called)
+            return False
+
+        self.conn._send_and_retry.side_effect = _send_and_retry
+        producer = self._producer(linger=60)
+        producer.send('topic_a', {'message': 0, 'context': {}}, None)
+        producer.send('topic_b', {'message': 1, 'context': {}}, None)
+
+        producer.stop(timeout=10)
+
+        self.assertIsNone(producer._thread)
+        self.assertEqual([False], closed_while_sending)
+        self.assertEqual(0, producer._queued)
+        self.conn.close.assert_called_once_with()
+
+    def test_driver_batching(self):
+        self.messaging_conf.transport_driver = 'kafka'
+        driver = oslo_messaging.get_transport(self.conf)._driver
+        self.config(producer_batch_timeout=0.01,
+                    group='oslo_messaging_kafka')
+        target = oslo_messaging.Target(topic="topic_test")
+
+        with mock.patch.object(kafka_driver.BatchingProducer,
+                               'send') as fake_send:
+            driver.send_notification(target, {}, {'fake': 1}, None)
+            fake_send.assert_called_once_with(
+                'topic_test', {'message': {'fake': 1}, 'context': {}}, None)
+        with mock.patch.object(kafka_driver.BatchingProducer,
+                               'stop') as fake_stop:
+            driver.cleanup()
+            fake_stop.assert_called_once_with(
+                timeout=kafka_driver._PRODUCER_STOP_TIMEOUT)
+
+
 class TestKafkaListener(test_utils.BaseTestCase):
 
     def setUp(self):
@@ -228,6 +362,161 @@ class TestKafkaListener(test_utils.BaseTestCase):
         self.assertEqual(1, len(listener.conn.consume.mock_calls))
         self.assertEqual([], fake_response)
 
+    def _kafka_message(self, partition, offset):
+        return kafka.common.KafkaMessage(
+            topic='fake_topic', partition=partition, offset=offset, key=None,
+            value='{"message": {"offset": %d}, "context": {}}' % offset)
+
+    def _create_listener(self, messages):
+        fake_target = oslo_messaging.Target(topic='fake_topic')
+        with mock.patch.object(kafka_driver.Connection,
+                               'declare_topic_consumer'):
+            listener = self.driver.listen_for_notifications(
+                [(fake_target, 'info')])
+        fetches = [messages]
+
+        def fake_consume(timeout=None):
+            if fetches:
+                return iter(fetches.pop())
+            time.sleep(timeout or 0)
+            raise driver_common.Timeout()
+
+        listener.conn.consume = mock.Mock(side_effect=fake_consume)
+        listener.conn.task_done = mock.Mock()
+        listener.conn.commit = mock.Mock()
+        return listener
+
+    def _offsets(self, messages):
+        return [(m.kafka_message.partition, m.kafka_message.offset)
+                for m in messages]
+
+    def test_partition_busy_until_acknowledged(self):
+        listener = self._create_listener([self._kafka_message(0, 0),
+                                          self._kafka_message(0, 1),
+                                          self._kafka_message(1, 0)])
+
+        first = listener.poll(timeout=0.1)
+        self.assertEqual([(0, 0)], self._offsets(first))
+        self.assertEqual([(1, 0)], self._offsets(listener.poll(timeout=0.1)))
+        self.assertEqual([], listener.poll(timeout=0.1))
+
+        first[0].acknowledge()
+        received = listener.poll(timeout=0.1)
+        self.assertEqual([(0, 1)], self._offsets(received))
+        self.assertEqual({'offset': 1}, received[0].message)
+
+    def test_batch_keeps_partition_order(self):
+        listener = self._create_listener([self._kafka_message(0, 0),
+                                          self._kafka_message(0, 1),
+                                          self._kafka_message(1, 0)])
+
+        received = listener.poll(timeout=0.1, prefetch_size=3)
+        self.assertEqual([(0, 0), (1, 0), (0, 1)], self._offsets(received))
+        self.assertEqual([], listener.poll(timeout=0.1))
+
+    def test_commit_batched(self):
+        self.config(consumer_commit_batch_size=2,
+                    consumer_commit_interval=60,
+                    group='oslo_messaging_kafka')
+        messages = [self._kafka_message(0, 0), self._kafka_message(1, 0)]
+        listener = self._create_listener(messages)
+        received = listener.poll(timeout=0.1, prefetch_size=2)
+
+        received[0].acknowledge()
+        listener.poll(timeout=0)
+        listener.conn.task_done.assert_called_once_with(messages[0])
+        self.assertFalse(listener.conn.commit.called)
+
+        received[1].acknowledge()
+        listener.poll(timeout=0)
+        self.assertEqual(2, listener.conn.task_done.call_count)
+        listener.conn.commit.assert_called_once_with()
+
+    def test_cleanup_commits(self):
+        self.config(consumer_commit_interval=60,
+                    group='oslo_messaging_kafka')
+        messages = [self._kafka_message(0, 0)]
+        listener = self._create_listener(messages)
+        listener.poll(timeout=0.1)[0].acknowledge()
+        self.assertFalse(listener.conn.commit.called)
+
+        listener.cleanup()
+        listener.conn.task_done.assert_called_once_with(messages[0])
+        listener.conn.commit.assert_called_once_with()
+
+
+class _StandInConsumer(object):
+    """Serve messages from memory in place of a KafkaConsumer."""
+
+    def __init__(self, count, partitions, fetch_size):
+        self.fetches = 0
+        self.committed = 0
+        self._messages = [
+            kafka.common.KafkaMessage(
+                topic='fake_topic', partition=i % partitions,
+                offset=i // partitions, key=None,
+                value='{"message": {"id": %d}, "context": {}}' % i)
+            for i in range(count)]
+        self._fetch_size = fetch_size
+        self.done = {}
+
+    def fetch_messages(self):
+        self.fetches += 1
+        response = self._messages[:self._fetch_size]
+        del self._messages[:self._fetch_size]
+        return iter(response)
+
+    def task_done(self, message):
+        self.done[message.partition] = message.offset
+
+    def commit(self):
+        self.committed += 1
+
+
+class TestKafkaConsumerThroughput(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestKafkaConsumerThroughput, self).setUp()
+        self.messaging_conf.transport_driver = 'kafka'
+        transport = oslo_messaging.get_transport(self.conf)
+        self.driver = transport._driver
+
+    def test_throughput(self):
+        self.config(kafka_max_fetch_messages=50,
+                    consumer_commit_batch_size=100,
+                    consumer_commit_interval=60,
+                    group='oslo_messaging_kafka')
+        fake_target = oslo_messaging.Target(topic='fake_topic')
+        with mock.patch.object(kafka_driver.Connection,
+                               'declare_topic_consumer'):
+            listener = self.driver.listen_for_notifications(
+                [(fake_target, 'info')], pool='fake_pool')
+        conn = listener.conn.connection
+        conn.group = 'fake_pool'
+        consumer = conn.consumer = _StandInConsumer(
+            count=3000, partitions=4, fetch_size=500)
+
+        received = []
+        start = time.time()
+        while len(received) < 3000:
+            incoming = listener.poll(timeout=1, prefetch_size=10)
+            self.assertNotEqual([], incoming)
+            for message in incoming:
+                received.append(message.message['id'])
+                message.acknowledge()
+        listener.commit()
+        elapsed = time.time() - start
+
+        # Each fetch response is streamed out in several polls
+        self.assertEqual(6, consumer.fetches)
+        self.assertEqual(list(range(3000)), sorted(received))
+        for partition in range(4):
+            ids = [i for i in received if i % 4 == partition]
+            self.assertEqual(sorted(ids), ids)
+        self.assertEqual({0: 749, 1: 749, 2: 749, 3: 749}, consumer.done)
+        self.assertTrue(consumer.committed <= 31)
+        self.assertTrue(elapsed < 10, elapsed)
+
 
 class TestWithRealKafkaBroker(test_utils.BaseTestCase):
 
@@ -0,0 +1,178 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+import fixtures
+from six.moves import mock
+import testscenarios
+
+import oslo_messaging
+from oslo_messaging._drivers import impl_memory
+from oslo_messaging.tests.drivers import driver_common
+from oslo_messaging.tests import utils as test_utils
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestMemoryDriverLoad(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestMemoryDriverLoad, self).setUp()
+        self.messaging_conf.transport_driver = 'memory'
+
+    def test_driver_load(self):
+        transport = oslo_messaging.get_transport(self.conf)
+        self.assertIsInstance(transport._driver, impl_memory.MemoryDriver)
+
+
+class TestMemoryDriver(test_utils.BaseTestCase,
+                       driver_common.DriverTestMixin):
+
+    scenarios = [
+        ('serialized', {'serialize': True}),
+        ('by_reference', {'serialize': False}),
+    ]
+
+    url = 'memory://'
+
+    def setUp(self):
+        super(TestMemoryDriver, self).setUp()
+        self.useFixture(fixtures.MonkeyPatch(
+            'oslo_messaging._drivers.impl_memory._exchanges', {}))
+        self.conf.register_opts(impl_memory.memory_opts,
+                                group='oslo_messaging_memory')
+        self.config(serialize_messages=self.serialize,
+                    group='oslo_messaging_memory')
+        self.driver = self._get_driver(self.url)
+        self.target = oslo_messaging.Target(topic='topic', server='server')
+
+    def test_cast_copied_when_serialized(self):
+        listener = self._listen(self.target)
+        message = {'value': [1, 2]}
+
+        self.driver.send(self.target, {'user': 'bob'}, message)
+
+        incoming = listener.poll(timeout=1)[0]
+        self.assertEqual({'user': 'bob'}, incoming.ctxt)
+        self.assertEqual(message, incoming.message)
+        self.assertEqual(not self.serialize, incoming.message is message)
+
+    def test_batch_poll(self):
+        listener = self._listen(self.target)
+        for value in range(5):
+            self.driver.send(self.target, {}, {'value': value})
+
+        incomings = listener.poll(timeout=1, prefetch_size=3)
+        self.assertEqual([0, 1, 2], [i.message['value'] for i in incomings])
+        incomings = listener.poll(timeout=0.1, prefetch_size=3)
+        self.assertEqual([3, 4], [i.message['value'] for i in incomings])
+        self.assertEqual([], listener.poll(timeout=0))
+
+    def test_poll_woken_up_by_message(self):
+        listener = self._listen(self.target)
+        incomings = []
+        thread = threading.Thread(
+            target=lambda: incomings.extend(listener.poll()))
+        thread.start()
+
+        self.driver.send(self.target, {}, {'value': 1})
+
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(1, incomings[0].message['value'])
+
+    def test_poll_woken_up_by_stop(self):
+        listener = self._listen(self.target)
+        thread = threading.Thread(target=listener.poll)
+        thread.start()
+
+        listener.stop()
+
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([], listener.poll())
+
+    def test_topic_shared_by_servers(self):
+        listener_1 = self._listen(self.target)
+        listener_2 = self._listen(
+            oslo_messaging.Target(topic='topic', server='other'))
+        target = oslo_messaging.Target(topic='topic')
+        for value in range(2):
+            self.driver.send(target, {}, {'value': value})
+
+        self.assertEqual(1, len(listener_1.poll(timeout=0)))
+        self.assertEqual(1, len(listener_2.poll(timeout=0)))
+
+    def test_requeue(self):
+        listener = self._listen(self.target)
+        self.driver.send(self.target, {}, {'value': 1})
+        self.driver.send(self.target, {}, {'value': 2})
+
+        listener.poll(timeout=0)[0].requeue()
+
+        incomings = listener.poll(timeout=0, prefetch_size=2)
+        self.assertEqual([1, 2], [i.message['value'] for i in incomings])
+
+    def test_notifications_kept_for_listeners(self):
+        target = oslo_messaging.Target(topic='notifications')
+        self.driver.send_notification(
+            oslo_messaging.Target(topic='notifications.info'), {},
+            {'event_type': 'early'}, 2.0)
+        listener = self.driver.listen_for_notifications([(target, 'info')],
+                                                        None)
+        pool_listener = self.driver.listen_for_notifications(
+            [(target, 'info')], 'pool')
+        self.addCleanup(listener.cleanup)
+        self.addCleanup(pool_listener.cleanup)
+
+        self.driver.send_notification(
+            oslo_messaging.Target(topic='notifications.info'), {},
+            {'event_type': 'late'}, 2.0)
+
+        self.assertEqual(
+            ['early', 'late'],
+            [i.message['event_type']
+             for i in listener.poll(timeout=0, prefetch_size=3)])
+        self.assertEqual(
+            ['late'],
+            [i.message['event_type']
+             for i in pool_listener.poll(timeout=0, prefetch_size=3)])
+
+    def test_kept_notifications_capped(self):
+        self.config(max_queued_notifications=2, group='oslo_messaging_memory')
+        driver = self._get_driver('memory://')
+        target = oslo_messaging.Target(topic='notifications')
+
+        with mock.patch.object(impl_memory.LOG, 'warning') as warning:
+            for event_type in ('first', 'second', 'third', 'fourth'):
+                driver.send_notification(
+                    oslo_messaging.Target(topic='notifications.info'), {},
+                    {'event_type': event_type}, 2.0)
+        self.assertEqual(1, warning.call_count)
+
+        listener = driver.listen_for_notifications([(target, 'info')], None)
+        self.addCleanup(listener.cleanup)
+        self.assertEqual(
+            ['third', 'fourth'],
+            [i.message['event_type']
+             for i in listener.poll(timeout=0, prefetch_size=4)])
+
+    def test_transports_by_virtual_host(self):
+        listener = self._listen(self.target)
+        other = self._listen(self.target,
+                             driver=self._get_driver('memory:///other'))
+
+        self._get_driver('memory://').send(self.target, {}, {'value': 1})
+
+        self.assertEqual(1, len(listener.poll(timeout=0)))
+        self.assertEqual([], other.poll(timeout=0))
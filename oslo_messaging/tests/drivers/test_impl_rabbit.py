@@ -31,6 +31,7 @@ import oslo_messaging
 from oslo_messaging._drivers import amqpdriver
 from oslo_messaging._drivers import common as driver_common
 from oslo_messaging._drivers import impl_rabbit as rabbit_driver
+from oslo_messaging import _utils as utils
 from oslo_messaging.tests import utils as test_utils
 from six.moves import mock
 
@@ -689,13 +690,14 @@ class TestRequestWireFormat(test_utils.BaseTestCase):
 
     def setUp(self):
         super(TestRequestWireFormat, self).setUp()
-        self.uuids = []
-        self.orig_uuid4 = uuid.uuid4
-        self.useFixture(fixtures.MonkeyPatch('uuid.uuid4', self.mock_uuid4))
+        self.ids = []
+        self.orig_generate_id = utils.generate_id
+        self.useFixture(fixtures.MonkeyPatch(
+            'oslo_messaging._utils.generate_id', self.mock_generate_id))
 
-    def mock_uuid4(self):
-        self.uuids.append(self.orig_uuid4())
-        return self.uuids[-1]
+    def mock_generate_id(self):
+        self.ids.append(self.orig_generate_id())
+        return self.ids[-1]
 
     def test_request_wire_format(self):
 
@@ -735,7 +737,7 @@ class TestRequestWireFormat(test_utils.BaseTestCase):
 
         # FIXME(markmc): add _msg_id and _reply_q check
         expected_msg = {
-            '_unique_id': self.uuids[0].hex,
+            '_unique_id': self.ids[0],
         }
         expected_msg.update(self.expected)
         expected_msg.update(self.expected_ctxt)
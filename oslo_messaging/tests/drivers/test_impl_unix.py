@@ -0,0 +1,263 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import grp
+import os
+import stat
+import threading
+import time
+
+import fixtures
+from six.moves import mock
+
+import oslo_messaging
+from oslo_messaging._drivers import impl_memory
+from oslo_messaging._drivers import impl_unix
+from oslo_messaging.tests.drivers import driver_common
+from oslo_messaging.tests import utils as test_utils
+
+
+class TestUnixDriverLoad(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestUnixDriverLoad, self).setUp()
+        self.messaging_conf.transport_driver = 'unix'
+
+    def test_driver_load(self):
+        transport = oslo_messaging.get_transport(self.conf)
+        self.assertIsInstance(transport._driver, impl_unix.UnixDriver)
+
+
+class TestUnixDriver(test_utils.BaseTestCase,
+                     driver_common.DriverTestMixin):
+
+    url = 'unix://'
+    no_listener_error = impl_memory.MessageNotDelivered
+
+    def setUp(self):
+        super(TestUnixDriver, self).setUp()
+        self.socket_dir = self.useFixture(fixtures.TempDir()).path
+        self.conf.register_opts(impl_unix.unix_opts,
+                                group='oslo_messaging_unix')
+        self.config(socket_dir=self.socket_dir, group='oslo_messaging_unix')
+        self.driver = self._get_driver(self.url)
+        self.target = oslo_messaging.Target(topic='topic', server='server')
+
+    def test_cast_without_listener_not_delivered(self):
+        self.assertRaises(impl_memory.MessageNotDelivered, self.driver.send,
+                          self.target, {}, {'value': 21})
+
+    def test_call_to_closed_listener(self):
+        listener = self.driver.listen(self.target)
+        self.driver.send(self.target, {}, {'value': 1})
+        listener.poll(timeout=5)
+        result = []
+
+        def _call():
+            try:
+                self.driver.send(self.target, {}, {'value': 2},
+                                 wait_for_reply=True, timeout=5)
+            except Exception as e:
+                result.append(e)
+
+        thread = threading.Thread(target=_call)
+        thread.start()
+        listener.poll(timeout=5)
+        listener.cleanup()
+        thread.join(5)
+
+        self.assertIsInstance(result[0],
+                              oslo_messaging.MessageDeliveryFailure)
+
+    def test_cast(self):
+        listener = self._listen(self.target)
+
+        self.driver.send(self.target, {'user': 'bob'}, {'value': [1, 2]})
+
+        incoming = listener.poll(timeout=5)[0]
+        self.assertEqual({'user': 'bob'}, incoming.ctxt)
+        self.assertEqual({'value': [1, 2]}, incoming.message)
+
+    def test_cast_from_other_process_driver(self):
+        listener = self._listen(self.target)
+
+        self._get_driver('unix://').send(self.target, {}, {'value': 1})
+
+        self.assertEqual(1, listener.poll(timeout=5)[0].message['value'])
+
+    def test_batch_poll(self):
+        listener = self._listen(self.target)
+        for value in range(5):
+            self.driver.send(self.target, {}, {'value': value})
+
+        incomings = listener.poll(timeout=5, prefetch_size=5)
+        self.assertEqual([0, 1, 2, 3, 4],
+                         [i.message['value'] for i in incomings])
+
+    def test_topic_shared_by_servers(self):
+        listener_1 = self._listen(self.target)
+        listener_2 = self._listen(
+            oslo_messaging.Target(topic='topic', server='other'))
+        target = oslo_messaging.Target(topic='topic')
+        for value in range(2):
+            self.driver.send(target, {}, {'value': value})
+
+        self.assertEqual(1, len(listener_1.poll(timeout=5)))
+        self.assertEqual(1, len(listener_2.poll(timeout=5)))
+
+    def test_dead_listener_skipped(self):
+        listener = self._listen(self.target)
+        dead = self.driver.listen(
+            oslo_messaging.Target(topic='topic', server='dead'))
+        # a listener killed without cleaning up leaves its files behind
+        dead._closing = True
+        dead._sock.close()
+        markers = self.driver._markers(
+            self.driver._topic_dir(None, 'topic'), 'server:', 'dead')
+        self.assertEqual(1, len(markers))
+
+        for value in range(2):
+            self.driver.send(oslo_messaging.Target(topic='topic'), {},
+                             {'value': value})
+
+        self.assertEqual(2, len(listener.poll(timeout=5, prefetch_size=2)))
+        self.assertFalse(os.path.exists(markers[0]))
+
+    def test_notifications_by_pool(self):
+        target = oslo_messaging.Target(topic='notifications')
+        listeners = [
+            self.driver.listen_for_notifications([(target, 'info')], pool)
+            for pool in (None, 'pool', 'pool')]
+        for listener in listeners:
+            self.addCleanup(listener.cleanup)
+
+        for event_type in ('first', 'second'):
+            self.driver.send_notification(
+                oslo_messaging.Target(topic='notifications.info'), {},
+                {'event_type': event_type}, 2.0)
+
+        self.assertEqual(
+            ['first', 'second'],
+            [i.message['event_type']
+             for i in listeners[0].poll(timeout=5, prefetch_size=2)])
+        self.assertEqual(1, len(listeners[1].poll(timeout=5)))
+        self.assertEqual(1, len(listeners[2].poll(timeout=5)))
+
+    def test_notifications_to_pool_prefix_of_another(self):
+        target = oslo_messaging.Target(topic='notifications')
+        listeners = [
+            self.driver.listen_for_notifications([(target, 'info')], pool)
+            for pool in ('a', 'ab')]
+        for listener in listeners:
+            self.addCleanup(listener.cleanup)
+
+        for event_type in ('first', 'second'):
+            self.driver.send_notification(
+                oslo_messaging.Target(topic='notifications.info'), {},
+                {'event_type': event_type}, 2.0)
+
+        for listener in listeners:
+            self.assertEqual(
+                ['first', 'second'],
+                [i.message['event_type']
+                 for i in listener.poll(timeout=5, prefetch_size=2)])
+            self.assertEqual([], listener.poll(timeout=0.1))
+
+    def test_transports_by_virtual_host(self):
+        listener = self._listen(self.target)
+        other = self._listen(self.target,
+                             driver=self._get_driver('unix:///other'))
+
+        self._get_driver('unix://').send(self.target, {}, {'value': 1})
+
+        self.assertEqual(1, len(listener.poll(timeout=5)))
+        self.assertEqual([], other.poll(timeout=0.1))
+
+    def test_virtual_host_quoted(self):
+        for virtual_host in ('../other', '/other'):
+            url = oslo_messaging.TransportURL(self.conf, 'unix',
+                                              virtual_host)
+            driver = self._get_driver(url)
+            self.assertEqual(self.socket_dir,
+                             os.path.dirname(driver._root))
+
+    def test_cleanup_removes_files(self):
+        listener = self.driver.listen(self.target)
+
+        listener.cleanup()
+
+        self.assertEqual([], self.driver._markers(
+            self.driver._topic_dir(None, 'topic'), 'server:'))
+        self.assertFalse(os.path.exists(listener._path))
+
+    def _mode(self, path):
+        return stat.S_IMODE(os.stat(path).st_mode)
+
+    def test_files_only_for_user(self):
+        listener = self._listen(self.target)
+
+        self.assertEqual(0o700, self._mode(
+            self.driver._topic_dir(None, 'topic')))
+        self.assertEqual(0o600, self._mode(listener._path))
+
+    def test_files_for_group(self):
+        group = grp.getgrgid(os.getgid())
+        self.config(socket_group=group.gr_name, group='oslo_messaging_unix')
+        driver = self._get_driver('unix://')
+
+        listener = self._listen(self.target, driver=driver)
+
+        topic_dir = driver._topic_dir(None, 'topic')
+        self.assertEqual(0o2770, self._mode(topic_dir))
+        self.assertEqual(0o660, self._mode(listener._path))
+        self.assertEqual(group.gr_gid, os.stat(listener._path).st_gid)
+
+    def _peer(self, uid, gid):
+        sock = mock.Mock()
+        sock.getsockopt.return_value = impl_unix._PEERCRED.pack(1, uid, gid)
+        return sock
+
+    def test_peer_allowed(self):
+        self.assertTrue(self.driver._peer_allowed(self._peer(0, 0)))
+        self.assertTrue(self.driver._peer_allowed(
+            self._peer(os.getuid(), 12345)))
+        self.assertFalse(self.driver._peer_allowed(self._peer(12345, 12345)))
+
+    def test_peer_allowed_by_group(self):
+        self.driver._group = grp.struct_group(('group', 'x', 12345, []))
+
+        self.assertTrue(self.driver._peer_allowed(self._peer(12345, 12345)))
+        self.assertFalse(self.driver._peer_allowed(self._peer(12345, 54321)))
+
+    def test_call_from_refused_peer(self):
+        self._listen(self.target)
+
+        with mock.patch.object(self.driver, '_peer_allowed',
+                               return_value=False):
+            self.assertRaises(oslo_messaging.MessageDeliveryFailure,
+                              self.driver.send, self.target, {},
+                              {'value': 21}, wait_for_reply=True, timeout=5)
+
+    def test_frame_above_max_drops_connection(self):
+        self.config(max_frame_size=100, group='oslo_messaging_unix')
+        driver = self._get_driver('unix://')
+        listener = self._listen(self.target, driver=driver)
+
+        driver.send(self.target, {}, {'value': 'x' * 100})
+
+        self.assertEqual([], listener.poll(timeout=0.5))
+        deadline = time.time() + 5
+        while driver._connections and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual({}, driver._connections)
+        driver.send(self.target, {}, {'value': 1})
+        self.assertEqual(1, listener.poll(timeout=5)[0].message['value'])
@@ -12,11 +12,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
+import mock
+from six import moves
 from stevedore import driver
 import testscenarios
 import testtools
 
 import oslo_messaging
+from oslo_messaging._drivers.zmq_driver.matchmaker import base
+from oslo_messaging._drivers.zmq_driver.matchmaker import matchmaker_cache
+from oslo_messaging._drivers.zmq_driver.matchmaker import matchmaker_redis
 from oslo_messaging.tests import utils as test_utils
 from oslo_utils import importutils
 
@@ -93,3 +100,170 @@ class TestImplMatchmaker(test_utils.BaseTestCase):
     def test_get_hosts_wrong_topic(self):
         target = oslo_messaging.Target(topic="no_such_topic")
         self.assertEqual(self.test_matcher.get_hosts(target, "test"), [])
+
+
+class _FakeRedis(object):
+    """In-memory stand-in for the redis commands used by the matchmaker."""
+
+    def __init__(self):
+        self.lists = collections.defaultdict(list)
+        self.subscribers = []
+        self.round_trips = 0
+
+    def lrange(self, key, start, end):
+        self.round_trips += 1
+        return list(self.lists[key])
+
+    def lpush(self, key, value):
+        self.lists[key].insert(0, value)
+
+    def lrem(self, key, count, value):
+        self.lists[key] = [v for v in self.lists[key] if v != value]
+
+    def publish(self, channel, message):
+        for subscriber in self.subscribers:
+            subscriber.put({'type': 'message', 'channel': channel,
+                            'data': message.encode('utf-8')})
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def pubsub(self):
+        return _FakePubSub(self)
+
+    def flushdb(self):
+        self.lists.clear()
+
+
+class _FakePipeline(object):
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self._commands.append((getattr(self._redis, name), args))
+        return command
+
+    def execute(self):
+        self._redis.round_trips += 1
+        return [method(*args) for method, args in self._commands]
+
+
+class _FakePubSub(object):
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._messages = moves.queue.Queue()
+
+    def subscribe(self, channel):
+        self._redis.subscribers.append(self._messages)
+        self._messages.put({'type': 'subscribe', 'channel': channel,
+                            'data': 1})
+
+    def listen(self):
+        while True:
+            yield self._messages.get()
+
+
+@testtools.skipIf(not redis, "redis not available")
+class TestRedisMatchMakerUpdates(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestRedisMatchMakerUpdates, self).setUp()
+        self.redis = _FakeRedis()
+        patcher = mock.patch.object(matchmaker_redis.redis, 'StrictRedis',
+                                    return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.matchmaker = matchmaker_redis.RedisMatchMaker(self.conf)
+        self.target = oslo_messaging.Target(topic="topic", server="server")
+
+    def test_register_single_round_trip(self):
+        self.matchmaker.register(self.target, "host1", "test")
+        self.matchmaker.register(self.target, "host1", "test")
+
+        self.assertEqual(2, self.redis.round_trips)
+        for key in ("test_topic.server", "test_topic", "test_server"):
+            self.assertEqual(["host1"], self.redis.lists[key])
+
+    def test_unregister_single_round_trip(self):
+        self.matchmaker.register(self.target, "host1", "test")
+        self.matchmaker.unregister(self.target, "host1", "test")
+
+        self.assertEqual(2, self.redis.round_trips)
+        self.assertEqual([], self.matchmaker.get_hosts(self.target, "test"))
+
+    def test_watch_updates(self):
+        updated = moves.queue.Queue()
+        self.assertTrue(self.matchmaker.watch(updated.put))
+
+        other = matchmaker_redis.RedisMatchMaker(self.conf)
+        other.unregister(self.target, "host1", "test")
+
+        self.assertEqual("test_topic.server", updated.get(timeout=5))
+
+
+class TestCachedMatchMaker(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestCachedMatchMaker, self).setUp()
+        self.matchmaker = base.DummyMatchMaker(self.conf)
+        self.get_hosts = mock.Mock(side_effect=self.matchmaker.get_hosts)
+        self.matchmaker.get_hosts = self.get_hosts
+        self.watched = []
+        self.matchmaker.watch = self.watched.append
+        self.cache = matchmaker_cache.CachedMatchMaker(
+            self.conf, self.matchmaker, ttl=30, negative_ttl=1)
+        self.target = oslo_messaging.Target(topic="topic")
+        self.now = 1000.0
+        patcher = mock.patch.object(matchmaker_cache.time, 'time',
+                                    side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_hosts_cached(self):
+        self.matchmaker.register(self.target, "host1", "test")
+
+        self.assertEqual(["host1"], self.cache.get_hosts(self.target, "test"))
+        self.matchmaker.register(self.target, "host2", "test")
+        self.assertEqual(["host1"], self.cache.get_hosts(self.target, "test"))
+        self.assertEqual(1, self.get_hosts.call_count)
+
+        self.now += 31
+        self.assertEqual(["host1", "host2"],
+                         self.cache.get_hosts(self.target, "test"))
+        self.assertEqual(2, self.get_hosts.call_count)
+
+    def test_negative_ttl(self):
+        self.assertEqual([], self.cache.get_hosts(self.target, "test"))
+        self.matchmaker.register(self.target, "host1", "test")
+        self.assertEqual([], self.cache.get_hosts(self.target, "test"))
+
+        self.now += 2
+        self.assertEqual(["host1"], self.cache.get_hosts(self.target, "test"))
+
+    def test_register_invalidates(self):
+        target = oslo_messaging.Target(topic="topic", server="server")
+        self.assertEqual([], self.cache.get_hosts(self.target, "test"))
+
+        self.cache.register(target, "host1", "test")
+        self.cache.register(self.target, "host1", "test")
+        self.assertEqual(["host1"], self.cache.get_hosts(self.target, "test"))
+
+        self.cache.unregister(self.target, "host1", "test")
+        self.assertEqual([], self.cache.get_hosts(self.target, "test"))
+
+    def test_watched_updates_invalidate(self):
+        self.assertEqual([], self.cache.get_hosts(self.target, "test"))
+        self.matchmaker.register(self.target, "host1", "test")
+
+        invalidate, = self.watched
+        invalidate("test_topic")
+        self.assertEqual(["host1"], self.cache.get_hosts(self.target, "test"))
+
+        self.matchmaker.register(self.target, "host2", "test")
+        invalidate(None)
+        self.assertEqual(["host1", "host2"],
+                         self.cache.get_hosts(self.target, "test"))
@@ -13,7 +13,6 @@
 #    under the License.
 
 import logging
-import pickle
 import time
 
 import contextlib
@@ -24,6 +23,7 @@ import testtools
 import oslo_messaging
 from oslo_messaging._drivers import impl_zmq
 from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
 from oslo_messaging._drivers.zmq_driver import zmq_socket
 from oslo_messaging._drivers.zmq_driver.client import zmq_request
 from oslo_messaging._drivers.zmq_driver.client.publishers \
@@ -60,8 +60,8 @@ class TestPubSub(zmq_common.ZmqBaseTestCase):
         with contextlib.closing(zmq_request.FanoutRequest(
                 target, context={}, message={'method': 'hello-world'},
                 timeout=0, retry=None)) as request:
-            self.publisher.send_request([request.create_envelope(),
-                                         pickle.dumps(request)])
+            self.publisher.send_request(
+                zmq_codec.encode_request(request, self.publisher.codec))
 
     def _check_listener(self, listener):
         listener._received.wait(timeout=5)
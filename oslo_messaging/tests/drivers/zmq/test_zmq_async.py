@@ -11,6 +11,7 @@
 #    under the License.
 
 import mock
+import fixtures
 import testtools
 
 from oslo_messaging._drivers.zmq_driver.poller import green_poller
@@ -29,7 +30,9 @@ class TestImportZmq(test_utils.BaseTestCase):
 
     def test_config_short_names_are_converted_to_correct_module_names(self):
         mock_try_import = mock.Mock()
-        zmq_async.importutils.try_import = mock_try_import
+        self.useFixture(fixtures.MonkeyPatch(
+            'oslo_messaging._drivers.zmq_driver.zmq_async.importutils.'
+            'try_import', mock_try_import))
 
         zmq_async.importutils.try_import.return_value = 'mock zmq module'
         self.assertEqual('mock zmq module', zmq_async.import_zmq('native'))
@@ -42,7 +45,9 @@ class TestImportZmq(test_utils.BaseTestCase):
 
     def test_when_no_args_then_default_zmq_module_is_loaded(self):
         mock_try_import = mock.Mock()
-        zmq_async.importutils.try_import = mock_try_import
+        self.useFixture(fixtures.MonkeyPatch(
+            'oslo_messaging._drivers.zmq_driver.zmq_async.importutils.'
+            'try_import', mock_try_import))
 
         zmq_async.import_zmq()
 
@@ -61,6 +66,11 @@ class TestGetPoller(test_utils.BaseTestCase):
     @testtools.skipIf(zmq is None, "zmq not available")
     def setUp(self):
         super(TestGetPoller, self).setUp()
+        # the tests replace the function, restore it for the other tests
+        self.useFixture(fixtures.MonkeyPatch(
+            'oslo_messaging._drivers.zmq_driver.zmq_async.'
+            '_is_eventlet_zmq_available',
+            zmq_async._is_eventlet_zmq_available))
 
     def test_when_no_arg_to_get_poller_then_return_default_poller(self):
         zmq_async._is_eventlet_zmq_available = lambda: True
@@ -101,6 +111,11 @@ class TestGetReplyPoller(test_utils.BaseTestCase):
     @testtools.skipIf(zmq is None, "zmq not available")
     def setUp(self):
         super(TestGetReplyPoller, self).setUp()
+        # the tests replace the function, restore it for the other tests
+        self.useFixture(fixtures.MonkeyPatch(
+            'oslo_messaging._drivers.zmq_driver.zmq_async.'
+            '_is_eventlet_zmq_available',
+            zmq_async._is_eventlet_zmq_available))
 
     def test_default_reply_poller_is_HoldReplyPoller(self):
         zmq_async._is_eventlet_zmq_available = lambda: True
@@ -136,6 +151,11 @@ class TestGetExecutor(test_utils.BaseTestCase):
     @testtools.skipIf(zmq is None, "zmq not available")
     def setUp(self):
         super(TestGetExecutor, self).setUp()
+        # the tests replace the function, restore it for the other tests
+        self.useFixture(fixtures.MonkeyPatch(
+            'oslo_messaging._drivers.zmq_driver.zmq_async.'
+            '_is_eventlet_zmq_available',
+            zmq_async._is_eventlet_zmq_available))
 
     def test_default_executor_is_GreenExecutor(self):
         zmq_async._is_eventlet_zmq_available = lambda: True
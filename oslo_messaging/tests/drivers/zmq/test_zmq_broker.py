@@ -0,0 +1,169 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import signal
+import time
+
+import mock
+import testscenarios
+
+import oslo_messaging
+from oslo_messaging._drivers.zmq_driver.broker import zmq_broker
+from oslo_messaging._drivers.zmq_driver.broker import zmq_queue_proxy
+from oslo_messaging._drivers.zmq_driver.client import zmq_request
+from oslo_messaging._drivers.zmq_driver import zmq_address
+from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
+from oslo_messaging.tests.drivers.zmq import zmq_common
+
+zmq = zmq_async.import_zmq(zmq_concurrency='native')
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestZmqBroker(zmq_common.ZmqBaseTestCase):
+
+    scenarios = [
+        ('one_thread', {'threads': 1}),
+        ('two_threads', {'threads': 2}),
+    ]
+
+    def setUp(self):
+        super(TestZmqBroker, self).setUp()
+        self.config(direct_over_proxy=True, rpc_poll_timeout=0.1,
+                    rpc_zmq_broker_threads=self.threads)
+
+        # the broker must look up the servers in the matchmaker of the driver
+        with mock.patch('oslo_messaging._drivers.zmq_driver.matchmaker.'
+                        'matchmaker_cache.get_matchmaker',
+                        return_value=self.driver.matchmaker):
+            self.broker = zmq_broker.ZmqBroker(self.conf)
+        self.broker.start()
+        self.addCleanup(self.broker.close)
+
+    def test_workers(self):
+        self.assertEqual(self.threads, len(self.broker.proxies))
+        if self.threads > 1:
+            self.assertIsInstance(self.broker.device,
+                                  zmq_queue_proxy.QueueDevice)
+        else:
+            self.assertIsNone(self.broker.device)
+
+    def test_call(self):
+        target = oslo_messaging.Target(topic='testtopic', server='server')
+        self.listener.listen(target)
+
+        for i in range(self.threads * 2):
+            self.listener._received.clear()
+            result = self.driver.send(
+                target, {}, {'method': 'hello-world', 'tx_id': i},
+                wait_for_reply=True)
+            self.assertTrue(result)
+            self.assertEqual(i, self.listener.message.message['tx_id'])
+
+    def test_cast(self):
+        target = oslo_messaging.Target(topic='testtopic', server='server')
+        self.listener.listen(target)
+
+        self.driver.send(target, {}, {'method': 'hello-world', 'tx_id': 1},
+                         wait_for_reply=False)
+
+        self.listener._received.wait(5)
+        self.assertTrue(self.listener._received.isSet())
+        self.assertEqual(u'hello-world',
+                         self.listener.message.message[u'method'])
+        self.assertEqual(1, self.broker.stats()['requests'])
+
+    def test_malformed_requests_dropped(self):
+        target = oslo_messaging.Target(topic='testtopic', server='server')
+        self.listener.listen(target)
+        context = zmq.Context()
+        self.addCleanup(context.term)
+        socket = context.socket(zmq.DEALER)
+        self.addCleanup(socket.close, linger=0)
+        socket.connect(zmq_address.get_broker_address(self.conf))
+
+        socket.send_multipart([b'not', b'a', b'request'])
+        socket.send_multipart([b''] + [b'\xff'] * zmq_codec.REQUEST_FRAMES)
+        self.driver.send(target, {}, {'method': 'hello-world', 'tx_id': 1},
+                         wait_for_reply=False)
+
+        self.listener._received.wait(5)
+        self.assertTrue(self.listener._received.isSet())
+        self.assertEqual(1, self.listener.message.message['tx_id'])
+
+
+class TestZmqBrokerSupervisor(zmq_common.ZmqBaseTestCase):
+
+    def setUp(self):
+        super(TestZmqBrokerSupervisor, self).setUp()
+        self.config(rpc_poll_timeout=0.1)
+        self.supervisor = zmq_broker.ZmqBrokerSupervisor(
+            self.conf, 2, report_interval=0.1)
+        self.supervisor.start()
+        self.addCleanup(self.supervisor.close)
+
+    def _wait_for(self, predicate, timeout=10):
+        deadline = time.time() + timeout
+        while not predicate():
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.05)
+
+    def _send_requests(self, count):
+        client = zmq.Context.instance().socket(zmq.DEALER)
+        self.addCleanup(client.close, linger=0)
+        client.connect(zmq_address.get_broker_address(self.conf))
+        target = oslo_messaging.Target(topic='testtopic', server='server')
+        for _ in range(count):
+            request = zmq_request.CastRequest(
+                target, context={}, message={'method': 'hello-world'},
+                timeout=0, retry=None)
+            client.send_multipart(
+                [b''] + zmq_codec.encode_request(request,
+                                                 zmq_codec.JsonCodec()))
+
+    def test_requests_routed_by_workers(self):
+        self._send_requests(4)
+
+        self._wait_for(
+            lambda: sum(self.supervisor.stats()['requests']) == 4)
+
+        with mock.patch.object(zmq_broker.LOG, 'info') as info:
+            self.supervisor._report(1)
+        self.assertEqual(2, info.call_count)
+        self.assertEqual(
+            4, sum(call[0][1]['rate'] for call in info.call_args_list))
+
+    def test_dead_worker_restarted(self):
+        worker, other = self.supervisor._workers
+        os.kill(worker.pid, signal.SIGKILL)
+        worker.join()
+
+        self.supervisor.check_workers()
+
+        restarted = self.supervisor._workers[0]
+        self.assertNotEqual(worker.pid, restarted.pid)
+        self.assertTrue(restarted.is_alive())
+        self.assertIs(other, self.supervisor._workers[1])
+
+    def test_dead_device_restarted(self):
+        device = self.supervisor._device
+        os.kill(device.pid, signal.SIGKILL)
+        device.join()
+
+        self.supervisor.check_workers()
+
+        self.assertNotEqual(device.pid, self.supervisor._device.pid)
+        self._send_requests(2)
+        self._wait_for(
+            lambda: sum(self.supervisor.stats()['requests']) == 2)
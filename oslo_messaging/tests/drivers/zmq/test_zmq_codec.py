@@ -0,0 +1,121 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import pickle
+
+import testscenarios
+import testtools
+
+import oslo_messaging
+from oslo_messaging._drivers.zmq_driver.client import zmq_request
+from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_codec
+from oslo_messaging._drivers.zmq_driver import zmq_names
+from oslo_messaging.tests import utils as test_utils
+
+zmq = zmq_async.import_zmq()
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestZmqCodec(test_utils.BaseTestCase):
+
+    scenarios = [(name.decode(), {'codec': codec})
+                 for name, codec in zmq_codec.CODECS.items()]
+
+    @testtools.skipIf(zmq is None, "zmq not available")
+    def setUp(self):
+        super(TestZmqCodec, self).setUp()
+        self.target = oslo_messaging.Target(topic="topic", server="server")
+        self.request = zmq_request.CallRequest(
+            self.target, context={"user": u"é"},
+            message={"method": "hello", "args": {"n": [1, 2]}},
+            timeout=10, retry=None, allowed_remote_exmods=[])
+
+    def test_request_round_trip(self):
+        frames = zmq_codec.encode_request(self.request, self.codec)
+        self.assertTrue(all(isinstance(f, bytes) for f in frames))
+
+        received = zmq_codec.ReceivedRequest(frames)
+        self.assertEqual(zmq_names.CALL_TYPE, received.msg_type)
+        self.assertEqual(self.request.message_id, received.message_id)
+        self.assertEqual(self.request.context, received.context)
+        self.assertEqual(self.request.message, received.message)
+        self.assertEqual("topic", received.target.topic)
+        self.assertEqual("server", received.target.server)
+        self.assertIsNone(received.proxy_reply_id)
+        self.assertIs(self.codec, received.codec)
+
+    def test_routing_without_body(self):
+        frames = zmq_codec.encode_request(self.request, self.codec)
+        frames[zmq_codec.IDX_BODY] = b"not decodable"
+
+        self.assertEqual(zmq_names.CALL_TYPE, zmq_codec.get_msg_type(frames))
+        target = zmq_codec.get_target(frames)
+        self.assertEqual("topic", target.topic)
+        self.assertEqual("server", target.server)
+        self.assertRaises(zmq_codec.MalformedMessage,
+                          zmq_codec.ReceivedRequest, frames)
+
+    def test_proxy_reply_id(self):
+        frames = zmq_codec.encode_request(self.request, self.codec)
+        frames[zmq_codec.IDX_REPLY_ID] = b"\x00client"
+
+        received = zmq_codec.ReceivedRequest(frames)
+        self.assertEqual(b"\x00client", received.proxy_reply_id)
+
+    def test_reply_round_trip(self):
+        frames = zmq_codec.encode_reply(self.request.message_id, self.codec,
+                                        reply={"result": [1, u"é"]})
+
+        reply = zmq_codec.decode_reply(frames)
+        self.assertEqual(self.request.message_id,
+                         reply[zmq_names.FIELD_MSG_ID])
+        self.assertEqual({"result": [1, u"é"]},
+                         reply[zmq_names.FIELD_REPLY])
+        self.assertIsNone(reply[zmq_names.FIELD_FAILURE])
+
+
+class TestZmqCodecErrors(test_utils.BaseTestCase):
+
+    def test_pickle_rejected(self):
+        target = oslo_messaging.Target(topic="topic")
+        request = zmq_request.CastRequest(target, context={},
+                                          message={"method": "m"},
+                                          timeout=10, retry=None)
+        frames = zmq_codec.encode_request(request, zmq_codec.JsonCodec())
+        frames[zmq_codec.IDX_CODEC] = b"pickle"
+        frames[zmq_codec.IDX_BODY] = pickle.dumps({"context": {},
+                                                   "message": {}})
+
+        self.assertRaises(zmq_codec.MalformedMessage,
+                          zmq_codec.ReceivedRequest, frames)
+
+    def test_undecodable_frames(self):
+        frames = [b"call", b"id", b"", b"topic", b"server", b"json", b"{}"]
+        for index in (zmq_codec.IDX_MSG_TYPE, zmq_codec.IDX_TOPIC,
+                      zmq_codec.IDX_MSG_ID):
+            bad_frames = list(frames)
+            bad_frames[index] = b"\xff"
+            self.assertRaises(zmq_codec.MalformedMessage,
+                              zmq_codec.ReceivedRequest, bad_frames)
+
+        self.assertRaises(zmq_codec.MalformedMessage,
+                          zmq_codec.decode_reply, [b"\xff", b"json", b"{}"])
+        self.assertRaises(zmq_codec.MalformedMessage,
+                          zmq_codec.decode_reply, [b"id", b"json", b"[]"])
+
+    def test_wrong_frame_count(self):
+        self.assertRaises(zmq_codec.MalformedMessage,
+                          zmq_codec.get_msg_type, [b"cast", b"id"])
+        self.assertRaises(zmq_codec.MalformedMessage,
+                          zmq_codec.decode_reply, [b"id"])
@@ -0,0 +1,224 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import futurist
+import threading
+import time
+
+import mock
+import testscenarios
+import testtools
+
+import oslo_messaging
+from oslo_messaging._drivers.zmq_driver.client.publishers.dealer \
+    import zmq_dealer_call_publisher
+from oslo_messaging._drivers.zmq_driver.client.publishers.dealer \
+    import zmq_dealer_publisher
+from oslo_messaging._drivers.zmq_driver.client.publishers.dealer \
+    import zmq_dealer_publisher_proxy
+from oslo_messaging._drivers.zmq_driver import zmq_async
+from oslo_messaging._drivers.zmq_driver import zmq_names
+from oslo_messaging.tests.drivers.zmq import zmq_common
+from oslo_messaging.tests import utils as test_utils
+
+zmq = zmq_async.import_zmq()
+
+load_tests = testscenarios.load_tests_apply_scenarios
+
+
+class TestPublisherSockets(test_utils.BaseTestCase):
+
+    @testtools.skipIf(zmq is None, "zmq not available")
+    def setUp(self):
+        super(TestPublisherSockets, self).setUp()
+        self.messaging_conf.transport_driver = 'zmq'
+        self.config(rpc_zmq_target_sockets=2,
+                    rpc_zmq_target_socket_idle_timeout=60,
+                    rpc_zmq_target_hosts_interval=10)
+        self.matchmaker = mock.Mock()
+        self.matchmaker.get_hosts.return_value = ['127.0.0.1:5001',
+                                                  '127.0.0.1:5002']
+        self.now = 0
+        patcher = mock.patch('time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.publisher = zmq_dealer_publisher.DealerPublisher(
+            self.conf, self.matchmaker)
+        self.addCleanup(self.publisher.cleanup)
+
+    def _socket(self, topic):
+        return self.publisher._check_hosts_connections(
+            oslo_messaging.Target(topic=topic), 'ROUTER')
+
+    def test_hosts_updated(self):
+        socket = self._socket('topic')
+        self.assertEqual(set(['tcp://127.0.0.1:5001', 'tcp://127.0.0.1:5002']),
+                         socket.connections)
+
+        self.matchmaker.get_hosts.return_value = ['127.0.0.1:5002',
+                                                  '127.0.0.1:5003']
+        self.now = 5
+        self.assertIs(socket, self._socket('topic'))
+        self.assertEqual(1, self.matchmaker.get_hosts.call_count)
+
+        self.now = 10
+        self.assertIs(socket, self._socket('topic'))
+        self.assertEqual(2, self.matchmaker.get_hosts.call_count)
+        self.assertEqual(set(['tcp://127.0.0.1:5002', 'tcp://127.0.0.1:5003']),
+                         socket.connections)
+
+    def test_target_without_hosts_looked_up(self):
+        self.matchmaker.get_hosts.return_value = []
+        socket = self._socket('topic')
+        self.assertEqual(set(), socket.connections)
+
+        self.matchmaker.get_hosts.return_value = ['127.0.0.1:5001']
+        self.assertIs(socket, self._socket('topic'))
+        self.assertEqual(set(['tcp://127.0.0.1:5001']), socket.connections)
+
+    def test_least_recently_used_closed(self):
+        socket_1 = self._socket('topic_1')
+        socket_2 = self._socket('topic_2')
+        self._socket('topic_1')
+
+        with mock.patch.object(socket_2, 'close') as close:
+            socket_3 = self._socket('topic_3')
+        self.assertTrue(close.called)
+        self.assertEqual([socket_1, socket_3],
+                         list(self.publisher.outbound_sockets.values()))
+
+    def test_idle_socket_closed(self):
+        socket_1 = self._socket('topic_1')
+        self.now = 30
+        socket_2 = self._socket('topic_2')
+
+        self.now = 60
+        with mock.patch.object(socket_1, 'close') as close:
+            self.assertIs(socket_2, self._socket('topic_2'))
+        self.assertTrue(close.called)
+        self.assertEqual([socket_2],
+                         list(self.publisher.outbound_sockets.values()))
+
+    def test_socket_shared_by_threads(self):
+        hosts = self.matchmaker.get_hosts.return_value
+
+        def _get_hosts(target, listener_type):
+            # let the other threads look the target up meanwhile
+            time.sleep(0.01)
+            return hosts
+
+        self.matchmaker.get_hosts.side_effect = _get_hosts
+        sockets = []
+        threads = [threading.Thread(
+            target=lambda: sockets.append(self._socket('topic')))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(5, len(sockets))
+        self.assertEqual(1, len(set(sockets)))
+        self.assertEqual(sockets[:1],
+                         list(self.publisher.outbound_sockets.values()))
+        self.assertEqual(1, self.matchmaker.get_hosts.call_count)
+
+    def test_closed_socket_untracked(self):
+        reply_receiver = mock.Mock()
+        publisher = zmq_dealer_publisher_proxy.DealerPublisherProxy(
+            self.conf, self.matchmaker, reply_receiver)
+        self.addCleanup(publisher.cleanup)
+        target = oslo_messaging.Target(topic='topic')
+        socket = publisher._check_hosts_connections(target, 'ROUTER')
+
+        self.now = 60
+        publisher._check_hosts_connections(
+            oslo_messaging.Target(topic='other'), 'ROUTER')
+
+        reply_receiver.untrack_socket.assert_called_once_with(socket.handle)
+
+
+class TestReplyWaiter(test_utils.BaseTestCase):
+
+    @testtools.skipIf(zmq is None, "zmq not available")
+    def setUp(self):
+        super(TestReplyWaiter, self).setUp()
+        self.messaging_conf.transport_driver = 'zmq'
+        with mock.patch.object(zmq_async, 'get_executor'):
+            self.reply_waiter = zmq_dealer_call_publisher.ReplyWaiter(
+                self.conf)
+        self.reply_waiter.poller = mock.Mock()
+
+    def _reply(self, message_id):
+        return {zmq_names.FIELD_MSG_ID: message_id,
+                zmq_names.FIELD_REPLY: message_id,
+                zmq_names.FIELD_FAILURE: None}
+
+    def test_ready_replies_dispatched_at_once(self):
+        futures = {}
+        for message_id in ('1', '2', '3'):
+            futures[message_id] = futurist.Future()
+            self.reply_waiter.track_reply(futures[message_id], message_id)
+        socket = mock.Mock()
+        self.reply_waiter.poller.poll.side_effect = [
+            (self._reply('1'), socket), (None, socket),
+            (self._reply('3'), socket), (None, None)]
+
+        self.reply_waiter.run_loop()
+
+        self.assertEqual('1', futures['1'].result(0)[zmq_names.FIELD_REPLY])
+        self.assertFalse(futures['2'].done())
+        self.assertEqual('3', futures['3'].result(0)[zmq_names.FIELD_REPLY])
+        calls = [mock.call(timeout=self.conf.rpc_poll_timeout)]
+        calls += [mock.call(timeout=0)] * 3
+        self.assertEqual(calls, self.reply_waiter.poller.poll.call_args_list)
+
+    def test_timed_out_reply_dropped(self):
+        future = futurist.Future()
+        self.reply_waiter.track_reply(future, '1')
+        self.reply_waiter.untrack_id('1')
+        self.reply_waiter.untrack_id('1')
+        self.reply_waiter.poller.poll.side_effect = [
+            (self._reply('1'), mock.Mock()), (None, None)]
+
+        self.reply_waiter.run_loop()
+
+        self.assertFalse(future.done())
+
+
+class TestCallPublisher(zmq_common.ZmqBaseTestCase):
+
+    scenarios = [
+        ('green', {'native': False}),
+        ('native', {'native': True}),
+    ]
+
+    def setUp(self):
+        super(TestCallPublisher, self).setUp()
+        self.config(rpc_zmq_native_reply_thread=self.native,
+                    rpc_poll_timeout=0.1)
+
+    def test_call(self):
+        target = oslo_messaging.Target(topic='testtopic', server='server')
+        self.listener.listen(target)
+
+        for i in range(3):
+            result = self.driver.send(
+                target, {}, {'method': 'hello-world', 'tx_id': i},
+                wait_for_reply=True)
+            self.assertTrue(result)
+            self.assertEqual(i, self.listener.message.message['tx_id'])
+
+        publisher = self.driver.client.item.call_publisher
+        self.assertEqual(self.native, publisher.reply_waiter.native)
+        self.assertEqual({}, publisher.reply_waiter.replies)
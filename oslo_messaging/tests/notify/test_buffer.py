@@ -0,0 +1,171 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+import weakref
+
+from oslo_messaging.notify import _buffer
+from oslo_messaging.tests import utils as test_utils
+
+
+class _BlockedSend(object):
+    """A send callable which waits for release() before returning."""
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self._release = threading.Event()
+
+    def __call__(self, batch):
+        self.started.set()
+        self._release.wait(10)
+        self.batches.append(batch)
+
+    def release(self):
+        self._release.set()
+
+
+class TestBufferedSender(test_utils.BaseTestCase):
+
+    def _sender(self, send, **kwargs):
+        sender = _buffer.BufferedSender(send, **kwargs)
+        self.addCleanup(sender.stop, flush=False, timeout=10)
+        return sender
+
+    def test_send_in_batches(self):
+        send = _BlockedSend()
+        sender = self._sender(send, batch_size=3)
+
+        self.assertTrue(sender.put(0))
+        self.assertTrue(send.started.wait(10))
+        for i in range(1, 8):
+            self.assertTrue(sender.put(i))
+        send.release()
+
+        self.assertTrue(sender.flush(timeout=10))
+        self.assertEqual([[0], [1, 2, 3], [4, 5, 6], [7]], send.batches)
+        self.assertEqual({'queued': 0, 'sent': 8, 'failed': 0,
+                          'dropped': 0},
+                         sender.stats())
+
+    def test_overflow_drop(self):
+        send = _BlockedSend()
+        sender = self._sender(send, max_size=2)
+
+        sender.put(0)
+        self.assertTrue(send.started.wait(10))
+        self.assertTrue(sender.put(1))
+        self.assertTrue(sender.put(2))
+        self.assertFalse(sender.put(3))
+        self.assertEqual({'queued': 3, 'sent': 0, 'failed': 0,
+                          'dropped': 1},
+                         sender.stats())
+
+        send.release()
+        self.assertTrue(sender.flush(timeout=10))
+        self.assertEqual([[0], [1, 2]], send.batches)
+
+    def test_overflow_block(self):
+        send = _BlockedSend()
+        sender = self._sender(send, max_size=1, overflow=_buffer.BLOCK)
+
+        sender.put(0)
+        self.assertTrue(send.started.wait(10))
+        sender.put(1)
+        blocked = threading.Thread(target=sender.put, args=(2,))
+        blocked.start()
+        blocked.join(0.1)
+        self.assertTrue(blocked.is_alive())
+
+        send.release()
+        blocked.join(10)
+        self.assertFalse(blocked.is_alive())
+        self.assertTrue(sender.flush(timeout=10))
+        self.assertEqual([0, 1, 2], sum(send.batches, []))
+        self.assertEqual(0, sender.stats()['dropped'])
+
+    def test_flush_timeout(self):
+        send = _BlockedSend()
+        sender = self._sender(send)
+
+        sender.put(0)
+        self.assertFalse(sender.flush(timeout=0.01))
+        send.release()
+        self.assertTrue(sender.flush(timeout=10))
+
+    def test_stop_flushes(self):
+        send = _BlockedSend()
+        send.release()
+        sender = self._sender(send)
+
+        for i in range(5):
+            sender.put(i)
+        sender.stop(timeout=10)
+
+        self.assertEqual([0, 1, 2, 3, 4], sum(send.batches, []))
+        self.assertFalse(sender.put(5))
+        self.assertEqual({'queued': 0, 'sent': 5, 'failed': 0,
+                          'dropped': 1},
+                         sender.stats())
+
+    def test_send_failure(self):
+        def send(batch):
+            raise RuntimeError('boom')
+        sender = self._sender(send)
+
+        sender.put(0)
+        self.assertTrue(sender.flush(timeout=10))
+        self.assertEqual({'queued': 0, 'sent': 0, 'failed': 1,
+                          'dropped': 0},
+                         sender.stats())
+
+    def test_send_partial_failure(self):
+        def send(batch):
+            return len([i for i in batch if i % 2])
+        sender = self._sender(send)
+
+        for i in range(3):
+            sender.put(i)
+        self.assertTrue(sender.flush(timeout=10))
+        self.assertEqual({'queued': 0, 'sent': 2, 'failed': 1,
+                          'dropped': 0},
+                         sender.stats())
+
+    def test_stops_with_owner(self):
+        class Owner(object):
+            def __init__(self):
+                self.batches = []
+
+            def send(self, batch):
+                self.batches.append(batch)
+
+        owner = Owner()
+        sender = self._sender(owner.send)
+        sender.put(0)
+        self.assertTrue(sender.flush(timeout=10))
+        self.assertEqual([[0]], owner.batches)
+        thread = sender._thread
+        owner_ref = weakref.ref(owner)
+
+        del owner
+        deadline = time.time() + 10
+        while owner_ref() is not None and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertIsNone(owner_ref())
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+
+    def test_invalid_overflow_policy(self):
+        self.assertRaises(ValueError, _buffer.BufferedSender, list,
+                          overflow='wait')
@@ -254,3 +254,178 @@ class TestDispatcherFilter(test_utils.BaseTestCase):
             self.assertEqual(1, endpoint.info.call_count)
         else:
             self.assertEqual(0, endpoint.info.call_count)
+
+
+class TestFilterEventTypePrefix(test_utils.BaseTestCase):
+    scenarios = [
+        ('anchored_literal',
+         dict(event_type='^compute\.instance\.create',
+              prefix='compute.instance.create')),
+        ('unanchored_literal',
+         dict(event_type='compute.start', prefix='compute')),
+        ('wildcard_suffix',
+         dict(event_type='^instance\..*\.start$', prefix='instance.')),
+        ('optional_char',
+         dict(event_type='^computes?\.', prefix='compute')),
+        ('repeated_char',
+         dict(event_type='^ab+c', prefix='a')),
+        ('alternation',
+         dict(event_type='^compute|^network', prefix='')),
+        ('group',
+         dict(event_type='^(compute|network)\.', prefix='')),
+        ('flags',
+         dict(event_type='(?i)^compute', prefix='')),
+        ('char_class_escape',
+         dict(event_type='^\\w+\.start', prefix='')),
+        ('match_all',
+         dict(event_type='.*', prefix='')),
+    ]
+
+    def test_event_type_prefix(self):
+        notification_filter = oslo_messaging.NotificationFilter(
+            event_type=self.event_type)
+        self.assertEqual(self.prefix, notification_filter.event_type_prefix)
+
+
+class TestDispatcherFilterIndex(test_utils.BaseTestCase):
+
+    def _build_endpoints(self, count):
+        endpoints = []
+        for i in range(count):
+            notification_filter = oslo_messaging.NotificationFilter(
+                event_type='^service%d\.instance\.' % i)
+            notification_filter.match = mock.Mock(
+                wraps=notification_filter.match)
+            endpoints.append(mock.Mock(spec=['info'],
+                                       filter_rule=notification_filter))
+        return endpoints
+
+    def _dispatch(self, dispatcher, event_type):
+        message = {'payload': {},
+                   'priority': 'info',
+                   'publisher_id': 'compute01.manager',
+                   'event_type': event_type,
+                   'timestamp': '2014-03-03 18:21:04.369234',
+                   'message_id': '99863dda-97f0-443a-a0c1-6ed317b7fd45'}
+        callback = dispatcher([mock.Mock(ctxt={}, message=message)])
+        callback.run()
+        callback.done()
+
+    def test_only_candidate_filters_evaluated(self):
+        endpoints = self._build_endpoints(50)
+        endpoints.append(mock.Mock(spec=['info']))
+        dispatcher = notify_dispatcher.NotificationDispatcher(
+            [oslo_messaging.Target(topic='notifications')], endpoints,
+            serializer=None, allow_requeue=True)
+
+        self._dispatch(dispatcher, 'service42.instance.create')
+
+        for i, endpoint in enumerate(endpoints[:50]):
+            expected = 1 if i == 42 else 0
+            self.assertEqual(expected, endpoint.filter_rule.match.call_count)
+            self.assertEqual(expected, endpoint.info.call_count)
+        # endpoints without filter always receive the message
+        self.assertEqual(1, endpoints[50].info.call_count)
+
+    def test_shared_prefix_candidates(self):
+        endpoints = self._build_endpoints(2)
+        generic = oslo_messaging.NotificationFilter(event_type='^service')
+        endpoints.append(mock.Mock(spec=['info'], filter_rule=generic))
+        dispatcher = notify_dispatcher.NotificationDispatcher(
+            [oslo_messaging.Target(topic='notifications')], endpoints,
+            serializer=None, allow_requeue=True)
+
+        self._dispatch(dispatcher, 'service1.instance.delete')
+
+        self.assertEqual(0, endpoints[0].info.call_count)
+        self.assertEqual(1, endpoints[1].info.call_count)
+        self.assertEqual(1, endpoints[2].info.call_count)
+
+    def test_dispatch_preserves_endpoint_order(self):
+        endpoints = self._build_endpoints(3)
+        endpoints.reverse()
+        calls = []
+        for endpoint in endpoints:
+            endpoint.info.side_effect = (
+                lambda *args, **kwargs: calls.append(args[2]))
+        endpoints[1].filter_rule = oslo_messaging.NotificationFilter()
+        endpoints[1].info.side_effect = lambda *args: calls.append('any')
+        dispatcher = notify_dispatcher.NotificationDispatcher(
+            [oslo_messaging.Target(topic='notifications')], endpoints,
+            serializer=None, allow_requeue=True)
+
+        self._dispatch(dispatcher, 'service0.instance.create')
+
+        self.assertEqual(['any', 'service0.instance.create'], calls)
+
+
+class TestBatchDispatcher(test_utils.BaseTestCase):
+
+    def _incoming(self, priorities):
+        incoming = []
+        for i, priority in enumerate(priorities):
+            msg = notification_msg.copy()
+            msg['priority'] = priority
+            msg['payload'] = {'index': i}
+            incoming.append(mock.Mock(ctxt={}, message=msg))
+        return incoming
+
+    def _dispatch(self, endpoints, incoming):
+        dispatcher = notify_dispatcher.BatchNotificationDispatcher(
+            [oslo_messaging.Target(topic='notifications')], endpoints,
+            serializer=None, allow_requeue=True, batch_size=len(incoming))
+        callback = dispatcher(incoming)
+        callback.run()
+        callback.done()
+
+    def test_one_call_per_priority(self):
+        endpoint = mock.Mock(spec=['info', 'error'])
+        endpoint.info.return_value = None
+        endpoint.error.return_value = None
+        priorities = ['info', 'error', 'info', 'error', 'info']
+
+        self._dispatch([endpoint], self._incoming(priorities))
+
+        self.assertEqual(1, endpoint.info.call_count)
+        self.assertEqual(1, endpoint.error.call_count)
+        info_messages = endpoint.info.call_args[0][0]
+        error_messages = endpoint.error.call_args[0][0]
+        self.assertEqual([0, 2, 4],
+                         [m['payload']['index'] for m in info_messages])
+        self.assertEqual([1, 3],
+                         [m['payload']['index'] for m in error_messages])
+
+    def test_requeue_only_failed_priority(self):
+        endpoint = mock.Mock(spec=['info', 'error'])
+        endpoint.info.return_value = None
+        endpoint.error.return_value = oslo_messaging.NotificationResult.REQUEUE
+        other_endpoint = mock.Mock(spec=['error'])
+        incoming = self._incoming(['info', 'error', 'info', 'error'])
+
+        self._dispatch([endpoint, other_endpoint], incoming)
+
+        for i, message in enumerate(incoming):
+            if i % 2:
+                self.assertEqual(0, message.acknowledge.call_count)
+                self.assertEqual(1, message.requeue.call_count)
+            else:
+                self.assertEqual(1, message.acknowledge.call_count)
+                self.assertEqual(0, message.requeue.call_count)
+        # requeued messages are not passed to the remaining endpoints
+        self.assertEqual(0, other_endpoint.error.call_count)
+
+    def test_requeue_only_filtered_messages(self):
+        endpoint = mock.Mock(spec=['info'])
+        endpoint.filter_rule = oslo_messaging.NotificationFilter(
+            payload={'index': '^[01]$'})
+        endpoint.info.return_value = oslo_messaging.NotificationResult.REQUEUE
+        incoming = self._incoming(['info', 'info', 'info'])
+        for message in incoming:
+            message.message['payload']['index'] = str(
+                message.message['payload']['index'])
+
+        self._dispatch([endpoint], incoming)
+
+        self.assertEqual([1, 1, 0], [m.requeue.call_count for m in incoming])
+        self.assertEqual([0, 0, 1],
+                         [m.acknowledge.call_count for m in incoming])
@@ -152,3 +152,68 @@ class TestLogNotifier(test_utils.BaseTestCase):
              'exc_info': None,
              'levelname': logging.getLevelName(levelno),
              'extra': None})
+
+
+class TestBufferedLogNotifier(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestBufferedLogNotifier, self).setUp()
+        self.addCleanup(oslo_messaging.notify._impl_test.reset)
+        self.config(driver=['test'],
+                    group='oslo_messaging_notifications')
+        logging.logThreads = 0
+
+    def _handler(self, **kwargs):
+        with mock.patch('oslo_messaging.transport.get_transport',
+                        return_value=test_notifier._FakeTransport(self.conf)):
+            handler = oslo_messaging.BufferedLoggingNotificationHandler(
+                'test://', **kwargs)
+        self.addCleanup(handler.close)
+        return handler
+
+    @staticmethod
+    def _record(levelno, msg):
+        return logging.LogRecord('foo', levelno, '/foo/bar', 42, msg,
+                                 None, None)
+
+    def test_records_batched_by_level(self):
+        notifications = oslo_messaging.notify._impl_test.NOTIFICATIONS
+        handler = self._handler()
+
+        # queue all the records before the sender thread is started
+        with mock.patch.object(handler._sender, '_start'):
+            handler.emit(self._record(logging.ERROR, 'first'))
+            handler.emit(self._record(logging.WARNING, 'second'))
+            handler.emit(self._record(logging.ERROR, 'third'))
+            handler.emit(self._record(42, 'unknown level'))
+            self.assertEqual([], notifications)
+        handler._sender._start()
+        handler.flush()
+
+        notifications = [(n[2], n[1]['event_type'],
+                          [r['msg'] for r in n[1]['payload']['records']])
+                         for n in notifications]
+        self.assertEqual([('ERROR', 'logrecords', ['first', 'third']),
+                          ('WARN', 'logrecords', ['second'])],
+                         notifications)
+        self.assertEqual({'queued': 0, 'sent': 3, 'failed': 0,
+                          'dropped': 0},
+                         handler.get_stats())
+
+    def test_overflow_drop(self):
+        handler = self._handler(max_size=2)
+
+        with mock.patch.object(handler._sender, '_start'):
+            for i in range(3):
+                handler.emit(self._record(logging.ERROR, str(i)))
+        self.assertEqual({'queued': 2, 'sent': 0, 'failed': 0,
+                          'dropped': 1},
+                         handler.get_stats())
+
+    def test_close_flushes(self):
+        handler = self._handler()
+        handler.emit(self._record(logging.ERROR, 'bye'))
+        handler.close()
+
+        n = oslo_messaging.notify._impl_test.NOTIFICATIONS[0][1]
+        self.assertEqual(['bye'], [r['msg'] for r in n['payload']['records']])
@@ -188,3 +188,42 @@ class NotifierMiddlewareTest(utils.BaseTestCase):
             self.assertEqual(call_args[3], 'INFO')
             self.assertEqual(set(call_args[2].keys()),
                              set(['request', 'response']))
+
+    def test_environ_keys_opt(self):
+        m = middleware.RequestNotifier(
+            FakeApp(),
+            environ_keys='REQUEST_METHOD, PATH_INFO,HTTP_X_AUTH_TOKEN')
+        req = webob.Request.blank('/foo/bar',
+                                  environ={'REQUEST_METHOD': 'GET',
+                                           'HTTP_X_AUTH_TOKEN': uuid.uuid4()})
+        with mock.patch(
+                'oslo_messaging.notify.notifier.Notifier._notify') as notify:
+            m(req)
+            self.assertEqual(2, len(notify.call_args_list))
+            for call_args in notify.call_args_list:
+                self.assertEqual({'REQUEST_METHOD': 'GET',
+                                  'PATH_INFO': '/foo/bar'},
+                                 call_args[0][2]['request'])
+
+    def test_async_send_opt(self):
+        m = middleware.RequestNotifier(FakeApp(), async_send='true')
+        self.addCleanup(m.notifier._sender.stop)
+        self.assertIsNotNone(m.notifier.get_async_stats())
+
+        req = webob.Request.blank('/foo/bar',
+                                  environ={'REQUEST_METHOD': 'GET'})
+        with mock.patch.object(m.notifier, '_do_notify') as do_notify:
+            m(req)
+            self.assertTrue(m.notifier.flush(timeout=10))
+            event_types = [c[0][1]['event_type']
+                           for c in do_notify.call_args_list]
+            self.assertEqual(['http.request', 'http.response'], event_types)
+
+    def test_async_send_default(self):
+        m = middleware.RequestNotifier(FakeApp())
+        self.assertIsNone(m.notifier.get_async_stats())
+
+        self.config(async_send=True, group='oslo_messaging_notifications')
+        m = middleware.RequestNotifier(FakeApp())
+        self.addCleanup(m.notifier._sender.stop)
+        self.assertIsNotNone(m.notifier.get_async_stats())
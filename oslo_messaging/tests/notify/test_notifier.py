@@ -28,6 +28,7 @@ import testscenarios
 import yaml
 
 import oslo_messaging
+from oslo_messaging import _utils as utils
 from oslo_messaging.notify import _impl_log
 from oslo_messaging.notify import messaging
 from oslo_messaging.notify import _impl_test
@@ -179,8 +180,8 @@ class TestMessagingNotifier(test_utils.BaseTestCase):
         self.mox.StubOutWithMock(transport, '_send_notification')
 
         message_id = uuid.uuid4()
-        self.mox.StubOutWithMock(uuid, 'uuid4')
-        uuid.uuid4().AndReturn(message_id)
+        self.mox.StubOutWithMock(utils, 'generate_uuid')
+        utils.generate_uuid().AndReturn(str(message_id))
 
         mock_utcnow.return_value = datetime.datetime.utcnow()
 
@@ -238,8 +239,8 @@ class TestSerializer(test_utils.BaseTestCase):
                                            serializer=serializer)
 
         message_id = uuid.uuid4()
-        self.mox.StubOutWithMock(uuid, 'uuid4')
-        uuid.uuid4().AndReturn(message_id)
+        self.mox.StubOutWithMock(utils, 'generate_uuid')
+        utils.generate_uuid().AndReturn(str(message_id))
 
         mock_utcnow.return_value = datetime.datetime.utcnow()
 
@@ -278,8 +279,8 @@ class TestLogNotifier(test_utils.BaseTestCase):
         notifier = oslo_messaging.Notifier(transport, 'test.localhost')
 
         message_id = uuid.uuid4()
-        self.mox.StubOutWithMock(uuid, 'uuid4')
-        uuid.uuid4().AndReturn(message_id)
+        self.mox.StubOutWithMock(utils, 'generate_uuid')
+        utils.generate_uuid().AndReturn(str(message_id))
 
         mock_utcnow.return_value = datetime.datetime.utcnow()
 
@@ -337,6 +338,82 @@ class TestLogNotifier(test_utils.BaseTestCase):
         logger.info.assert_called_once_with(mask_str)
 
 
+class TestAsyncNotifier(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestAsyncNotifier, self).setUp()
+        _impl_test.reset()
+        self.addCleanup(_impl_test.reset)
+
+    def _notifier(self, **kwargs):
+        transport = _FakeTransport(self.conf)
+        notifier = oslo_messaging.Notifier(transport, 'test.localhost',
+                                           driver='test', **kwargs)
+        self.addCleanup(notifier._sender.stop)
+        return notifier
+
+    def test_async_send(self):
+        self.config(async_send=True, group='oslo_messaging_notifications')
+        notifier = self._notifier()
+
+        with mock.patch.object(notifier, '_do_notify',
+                               wraps=notifier._do_notify) as do_notify:
+            notifier.info({'user': 'bob'}, 'test.notify', {'foo': 'bar'})
+            notifier.prepare(publisher_id='other').error({}, 'test.error',
+                                                         {})
+            self.assertTrue(notifier.flush(timeout=10))
+
+        self.assertEqual(2, do_notify.call_count)
+        self.assertEqual(2, len(_impl_test.NOTIFICATIONS))
+        ctxt, message, priority, retry = _impl_test.NOTIFICATIONS[0]
+        self.assertEqual({'user': 'bob'}, ctxt)
+        self.assertEqual('test.localhost', message['publisher_id'])
+        self.assertEqual('INFO', priority)
+        message = _impl_test.NOTIFICATIONS[1][1]
+        self.assertEqual('other', message['publisher_id'])
+        self.assertEqual({'queued': 0, 'sent': 2, 'failed': 0,
+                          'dropped': 0},
+                         notifier.get_async_stats())
+
+    def test_async_send_failure(self):
+        notifier = self._notifier(async_send=True)
+
+        with mock.patch.object(_impl_test.TestDriver, 'notify',
+                               side_effect=RuntimeError('boom')):
+            notifier.info({}, 'test.notify', {})
+            self.assertTrue(notifier.flush(timeout=10))
+
+        self.assertEqual({'queued': 0, 'sent': 0, 'failed': 1,
+                          'dropped': 0},
+                         notifier.get_async_stats())
+
+    def test_async_send_argument(self):
+        notifier = self._notifier(async_send=True)
+        notifier.info({}, 'test.notify', {})
+        self.assertTrue(notifier.flush(timeout=10))
+        self.assertEqual(1, len(_impl_test.NOTIFICATIONS))
+
+    def test_thread_stops_with_notifier(self):
+        notifier = self._notifier(async_send=True)
+        notifier.prepare(publisher_id='other').info({}, 'test.notify', {})
+        self.assertTrue(notifier.flush(timeout=10))
+        thread = notifier._sender._thread
+
+        del notifier
+        thread.join(10)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(1, len(_impl_test.NOTIFICATIONS))
+
+    def test_sync_send(self):
+        notifier = oslo_messaging.Notifier(_FakeTransport(self.conf),
+                                           'test.localhost', driver='test')
+        notifier.info({}, 'test.notify', {})
+        self.assertEqual(1, len(_impl_test.NOTIFICATIONS))
+        self.assertIsNone(notifier.get_async_stats())
+        self.assertTrue(notifier.flush())
+
+
 class TestRoutingNotifier(test_utils.BaseTestCase):
     def setUp(self):
         super(TestRoutingNotifier, self).setUp()
@@ -561,3 +638,138 @@ group_1:
                     {}, mock.ANY, 'INFO', None)
                 rpc2_driver.notify.assert_called_once_with(
                     {}, mock.ANY, 'INFO', None)
+
+    def test_notify_decisions_cached(self):
+        self.router.routing_groups = {'group_1': None}
+        drivers_mock = mock.MagicMock(return_value=['rpc'])
+
+        with mock.patch.object(self.router, 'plugin_manager') as pm:
+            with mock.patch.object(self.router, '_get_drivers_for_message',
+                                   drivers_mock):
+                self.notifier.info({}, 'my_event', {})
+                self.notifier.info({}, 'my_event', {})
+                self.notifier.error({}, 'my_event', {})
+                self.assertEqual(2, drivers_mock.call_count)
+                self.assertEqual(['rpc'], pm.map.call_args[0][6])
+
+    def test_get_drivers_for_message_compiled_once(self):
+        config = r"""
+group_1:
+   rpc:
+       accepted_events:
+          - foo.*
+        """
+        group = yaml.safe_load(config)['group_1']
+
+        with mock.patch.object(self.router, '_compile_patterns',
+                               wraps=self.router._compile_patterns) as cp:
+            for event_type in ('foo.1', 'foo.2', 'bar'):
+                self.router._get_drivers_for_message(group, event_type,
+                                                     'info')
+            self.assertEqual(1, cp.call_count)
+
+    def test_notify_reloads_modified_config(self):
+        self.config(routing_config="routing_notifier.yaml",
+                    routing_config_check_interval=10,
+                    group='oslo_messaging_notifications')
+        configs = [r"""
+group_1:
+    rpc:
+        accepted_events:
+          - my_event
+        """, r"""
+group_1:
+    rpc2:
+        accepted_events:
+          - my_event
+        """]
+        config_file = mock.MagicMock(side_effect=configs)
+        config_mtime = mock.MagicMock(return_value=1)
+
+        rpc_driver = mock.Mock()
+        rpc2_driver = mock.Mock()
+        pm = dispatch.DispatchExtensionManager.make_test_instance(
+            [extension.Extension('rpc', None, None, rpc_driver),
+             extension.Extension('rpc2', None, None, rpc2_driver)],
+        )
+
+        with mock.patch.object(self.router, '_get_notifier_config_file',
+                               config_file), \
+                mock.patch.object(self.router, '_get_notifier_config_mtime',
+                                  config_mtime), \
+                mock.patch('stevedore.dispatch.DispatchExtensionManager',
+                           return_value=pm), \
+                mock.patch('time.time') as now:
+            now.return_value = 100
+            self.notifier.info({}, 'my_event', {})
+            self.notifier.info({}, 'my_event', {})
+            self.assertEqual(2, rpc_driver.notify.call_count)
+
+            # modified, but not checked before the interval has elapsed
+            config_mtime.return_value = 2
+            now.return_value = 105
+            self.notifier.info({}, 'my_event', {})
+            self.assertEqual(3, rpc_driver.notify.call_count)
+            self.assertEqual(0, rpc2_driver.notify.call_count)
+
+            now.return_value = 111
+            self.notifier.info({}, 'my_event', {})
+            self.assertEqual(3, rpc_driver.notify.call_count)
+            self.assertEqual(1, rpc2_driver.notify.call_count)
+            self.assertEqual(2, config_file.call_count)
+
+    def test_notify_keeps_config_when_reload_fails(self):
+        self.config(routing_config="routing_notifier.yaml",
+                    routing_config_check_interval=10,
+                    group='oslo_messaging_notifications')
+        configs = [r"""
+group_1:
+    rpc:
+        accepted_events:
+          - my_event
+        """, "group_1: [", r"""
+group_1:
+    rpc2:
+        accepted_events:
+          - my_event
+        """]
+        config_file = mock.MagicMock(side_effect=configs)
+        config_mtime = mock.MagicMock(return_value=1)
+
+        rpc_driver = mock.Mock()
+        rpc2_driver = mock.Mock()
+        pm = dispatch.DispatchExtensionManager.make_test_instance(
+            [extension.Extension('rpc', None, None, rpc_driver),
+             extension.Extension('rpc2', None, None, rpc2_driver)],
+        )
+
+        with mock.patch.object(self.router, '_get_notifier_config_file',
+                               config_file), \
+                mock.patch.object(self.router, '_get_notifier_config_mtime',
+                                  config_mtime), \
+                mock.patch('stevedore.dispatch.DispatchExtensionManager',
+                           return_value=pm), \
+                mock.patch('time.time') as now:
+            now.return_value = 100
+            self.notifier.info({}, 'my_event', {})
+            self.notifier.info({}, 'my_event', {})
+
+            # half written file
+            config_mtime.return_value = 2
+            now.return_value = 111
+            self.notifier.info({}, 'my_event', {})
+            self.assertEqual(3, rpc_driver.notify.call_count)
+
+            # loaded again at the next check, though not modified since
+            now.return_value = 122
+            self.notifier.info({}, 'my_event', {})
+            self.assertEqual(3, rpc_driver.notify.call_count)
+            self.assertEqual(1, rpc2_driver.notify.call_count)
+            self.assertEqual(3, config_file.call_count)
+
+    def test_get_drivers_for_message_no_patterns(self):
+        group = {'rpc': {'accepted_events': [],
+                         'accepted_priorities': ['info']}}
+
+        self.assertEqual([], self.router._get_drivers_for_message(
+            group, 'my_event', 'info'))
@@ -0,0 +1,124 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+
+import fixtures
+
+import oslo_messaging
+from oslo_messaging.notify import _impl_test
+from oslo_messaging.notify import _sampling
+from oslo_messaging.tests import utils as test_utils
+from six.moves import mock
+
+
+class TestNotificationSampler(test_utils.BaseTestCase):
+
+    def test_keep_one_in(self):
+        sampler = _sampling.NotificationSampler(
+            [{'event_type': 'compute.metrics.*', 'keep_one_in': 3}])
+
+        kept = [sampler.accept('compute.metrics.update', 'INFO')
+                for __ in range(7)]
+
+        self.assertEqual([True, False, False, True, False, False, True], kept)
+        self.assertEqual({'sampled': 7, 'dropped': 4}, sampler.stats())
+
+    @mock.patch('oslo_utils.timeutils.now')
+    def test_rate(self, now):
+        now.return_value = 100
+        sampler = _sampling.NotificationSampler(
+            [{'event_type': 'usage.*', 'rate': 2, 'burst': 3}])
+
+        kept = [sampler.accept('usage.audit', 'info') for __ in range(4)]
+        self.assertEqual([True, True, True, False], kept)
+
+        now.return_value = 100.5
+        kept = [sampler.accept('usage.audit', 'info') for __ in range(2)]
+        self.assertEqual([True, False], kept)
+        self.assertEqual({'sampled': 6, 'dropped': 2}, sampler.stats())
+
+    def test_unmatched_and_exempt_are_kept(self):
+        sampler = _sampling.NotificationSampler(
+            [{'event_type': 'compute.*', 'priority': 'info', 'keep_one_in': 2},
+             {'keep_one_in': 1000}])
+
+        for __ in range(3):
+            self.assertTrue(sampler.accept('compute.update', 'ERROR'))
+        self.assertEqual({'sampled': 0, 'dropped': 0}, sampler.stats())
+
+        sampler = _sampling.NotificationSampler(
+            [{'event_type': 'compute.*', 'keep_one_in': 2}])
+        self.assertTrue(sampler.accept('network.update', 'info'))
+        self.assertTrue(sampler.accept('network.update', 'info'))
+        self.assertEqual({'sampled': 0, 'dropped': 0}, sampler.stats())
+
+    def test_first_matching_rule_applies(self):
+        sampler = _sampling.NotificationSampler(
+            [{'event_type': 'compute.*', 'priority': 'info', 'keep_one_in': 2},
+             {'keep_one_in': 1000}])
+
+        kept = [sampler.accept('compute.update', 'info') for __ in range(4)]
+        self.assertEqual([True, False, True, False], kept)
+        kept = [sampler.accept('compute.update', 'warn') for __ in range(2)]
+        self.assertEqual([True, False], kept)
+
+    def test_invalid_rules(self):
+        for rules in ([{'event_type': 'foo'}],
+                      [{'keep_one_in': 2, 'rate': 1}],
+                      [{'keep_one_in': 0}],
+                      [{'rate': -1}],
+                      ['foo']):
+            self.assertRaises(ValueError, _sampling.NotificationSampler,
+                              rules)
+
+
+class TestSamplingNotifier(test_utils.BaseTestCase):
+
+    def setUp(self):
+        super(TestSamplingNotifier, self).setUp()
+        _impl_test.reset()
+        self.addCleanup(_impl_test.reset)
+
+    def test_notifier_sampling(self):
+        tempdir = self.useFixture(fixtures.TempDir()).path
+        sampling_config = os.path.join(tempdir, 'sampling.yaml')
+        with open(sampling_config, 'w') as f:
+            f.write("- event_type: compute.metrics.*\n"
+                    "  keep_one_in: 2\n")
+        self.config(sampling_config=sampling_config,
+                    group='oslo_messaging_notifications')
+
+        notifier = oslo_messaging.Notifier(
+            mock.Mock(conf=self.conf), 'test.localhost',
+            driver='test')
+        sub_notifier = notifier.prepare(publisher_id='other')
+        for __ in range(2):
+            notifier.info({}, 'compute.metrics.update', {})
+            sub_notifier.info({}, 'compute.metrics.update', {})
+        notifier.error({}, 'compute.metrics.update', {})
+        notifier.info({}, 'compute.instance.create', {})
+
+        event_types = [(n[1]['event_type'], n[2])
+                       for n in _impl_test.NOTIFICATIONS]
+        self.assertEqual([('compute.metrics.update', 'INFO'),
+                          ('compute.metrics.update', 'INFO'),
+                          ('compute.metrics.update', 'ERROR'),
+                          ('compute.instance.create', 'INFO')], event_types)
+        self.assertEqual({'sampled': 4, 'dropped': 2},
+                         notifier.get_sampling_stats())
+
+    def test_no_sampling(self):
+        notifier = oslo_messaging.Notifier(
+            mock.Mock(conf=self.conf), 'test.localhost',
+            driver='test')
+        self.assertIsNone(notifier.get_sampling_stats())
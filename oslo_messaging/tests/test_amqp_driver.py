@@ -25,6 +25,7 @@ import uuid
 
 from oslo_utils import importutils
 from six import moves
+from six.moves import mock
 from string import Template
 import testtools
 
@@ -37,6 +38,7 @@ from oslo_messaging.tests import utils as test_utils
 pyngus = importutils.try_import("pyngus")
 if pyngus:
     from oslo_messaging._drivers.protocols.amqp import driver as amqp_driver
+    from oslo_messaging._drivers.protocols.amqp import eventloop
 
 # The Cyrus-based SASL tests can only be run if the installed version of proton
 # has been built with Cyrus SASL support.
@@ -93,6 +95,99 @@ class TestProtonDriverLoad(test_utils.BaseTestCase):
                               amqp_driver.ProtonDriver)
 
 
+@testtools.skipUnless(pyngus, "proton modules not present")
+class TestEventLoopRequests(test_utils.BaseTestCase):
+    """Test the hand off of callables to the eventloop thread."""
+
+    def _pipe_bytes(self, requests):
+        readable = select.select([requests], [], [], 0)[0]
+        if not readable:
+            return 0
+        data = os.read(requests.fileno(), 4096)
+        # put the data back for read()
+        os.write(requests._requests._pipe[1], data)
+        return len(data)
+
+    def test_wakeups_coalesced(self):
+        requests = eventloop.Requests()
+        executed = []
+        for i in range(1000):
+            requests.wakeup(lambda i=i: executed.append(i))
+        self.assertEqual(1, self._pipe_bytes(requests))
+
+        requests.read()
+        self.assertEqual(list(range(1000)), executed)
+        self.assertEqual(0, self._pipe_bytes(requests))
+
+        # the next request wakes the eventloop up again
+        requests.wakeup(lambda: executed.append(1000))
+        self.assertEqual(1, self._pipe_bytes(requests))
+        requests.read()
+        self.assertEqual(1001, len(executed))
+
+    def test_request_queued_during_read(self):
+        requests = eventloop.Requests()
+        executed = []
+
+        def reschedule():
+            executed.append('first')
+            requests.wakeup(lambda: executed.append('second'))
+
+        requests.wakeup(reschedule)
+        requests.read()
+        self.assertEqual(['first'], executed)
+        # the request queued while reading must wake the eventloop up
+        self.assertEqual(1, self._pipe_bytes(requests))
+        requests.read()
+        self.assertEqual(['first', 'second'], executed)
+
+    def test_request_queued_while_draining_the_pipe(self):
+        requests = eventloop.Requests()
+        executed = []
+        read = os.read
+
+        def _read(fd, n):
+            # another thread queues a request just before the pipe is drained
+            requests.wakeup(lambda: executed.append('during'))
+            return read(fd, n)
+
+        requests.wakeup(lambda: executed.append('before'))
+        with mock.patch('os.read', side_effect=_read):
+            requests.read()
+        self.assertEqual(['before', 'during'], executed)
+
+        # the wakeup of the next request must not be lost
+        requests.wakeup(lambda: executed.append('after'))
+        self.assertEqual(1, self._pipe_bytes(requests))
+        requests.read()
+        self.assertEqual(['before', 'during', 'after'], executed)
+
+    def test_concurrent_wakeups(self):
+        requests = eventloop.Requests()
+        executed = []
+        done = threading.Event()
+
+        def reader():
+            while not done.is_set() or requests._requests._items:
+                if select.select([requests], [], [], 0.1)[0]:
+                    requests.read()
+
+        def writer():
+            for __ in range(1000):
+                requests.wakeup(lambda: executed.append(None))
+
+        reader_thread = threading.Thread(target=reader)
+        reader_thread.start()
+        writers = [threading.Thread(target=writer) for __ in range(4)]
+        for w in writers:
+            w.start()
+        for w in writers:
+            w.join()
+        done.set()
+        reader_thread.join(30)
+        self.assertEqual(4000, len(executed))
+
+
 class _AmqpBrokerTestCase(test_utils.BaseTestCase):
 
     @testtools.skipUnless(pyngus, "proton modules not present")
@@ -138,6 +233,75 @@ class TestAmqpSend(_AmqpBrokerTestCase):
         self.assertEqual(listener.messages.get().message, {"msg": "value"})
         driver.cleanup()
 
+    def test_send_throughput(self):
+        """Verify many concurrent senders are not throttled by the driver."""
+        driver = amqp_driver.ProtonDriver(self.conf, self._broker_url)
+        target = oslo_messaging.Target(topic="test-topic")
+        senders, count = 8, 250
+        listener = _ListenerThread(driver.listen(target), senders * count)
+
+        def sender(index):
+            for i in range(count):
+                driver.send(target, {"context": "whatever"},
+                            {"sender": index, "index": i},
+                            wait_for_reply=False)
+
+        threads = [threading.Thread(target=sender, args=(i,))
+                   for i in range(senders)]
+        start = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=60)
+        listener.join(timeout=60)
+        LOG.debug("%d messages sent in %f seconds", senders * count,
+                  time.time() - start)
+        self.assertFalse(listener.is_alive())
+
+        received = {}
+        for msg in listener.get_messages():
+            received.setdefault(msg.message["sender"], []).append(
+                msg.message["index"])
+        self.assertEqual(senders, len(received))
+        for indexes in received.values():
+            self.assertEqual(list(range(count)), indexes)
+        driver.cleanup()
+
+    def test_drivers_share_eventloop(self):
+        """Verify the drivers of a process are serviced by one thread."""
+        # the thread may still service the drivers of other tests
+        thread = eventloop._threads.get(os.getpid())
+        containers = len(thread._containers) if thread else 1
+        driver1 = amqp_driver.ProtonDriver(self.conf, self._broker_url)
+        driver2 = amqp_driver.ProtonDriver(self.conf, self._broker_url)
+        target1 = oslo_messaging.Target(topic="test-topic", server="server1")
+        target2 = oslo_messaging.Target(topic="test-topic", server="server2")
+        listener1 = _ListenerThread(driver1.listen(target1), 1)
+        listener2 = _ListenerThread(driver2.listen(target2), 1)
+
+        driver2.send(target1, {"context": "whatever"}, {"msg": "to 1"})
+        driver1.send(target2, {"context": "whatever"}, {"msg": "to 2"})
+        listener1.join(timeout=30)
+        listener2.join(timeout=30)
+        self.assertFalse(listener1.is_alive())
+        self.assertFalse(listener2.is_alive())
+        self.assertEqual("to 1", listener1.get_messages()[0].message["msg"])
+        self.assertEqual("to 2", listener2.get_messages()[0].message["msg"])
+
+        processor = driver1._ctrl.processor
+        self.assertIs(processor, driver2._ctrl.processor)
+        self.assertEqual(containers + 2, len(processor._containers))
+
+        driver1.cleanup()
+        self.assertTrue(processor.is_alive())
+        self.assertEqual(containers + 1, len(processor._containers))
+        driver2.send(target2, {"context": "whatever"}, {"msg": "still up"})
+        driver2.cleanup()
+        if thread is None:
+            # the thread stops with the last driver it services
+            processor.join(timeout=30)
+            self.assertFalse(processor.is_alive())
+
     def test_send_exchange_with_reply(self):
         driver = amqp_driver.ProtonDriver(self.conf, self._broker_url)
         target1 = oslo_messaging.Target(topic="test-topic", exchange="e1")
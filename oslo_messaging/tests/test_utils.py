@@ -13,6 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+import select
+import uuid
+
 from oslo_messaging._drivers import common
 from oslo_messaging import _utils as utils
 from oslo_messaging.tests import utils as test_utils
@@ -98,3 +102,57 @@ class TimerTestCase(test_utils.BaseTestCase):
         self.assertEqual(0, remaining)
         callback.assert_called_once_with(1, a='b')
 
+
+class HandoffTestCase(test_utils.BaseTestCase):
+    def setUp(self):
+        super(HandoffTestCase, self).setUp()
+        self.handoff = common.Handoff()
+        self.addCleanup(self.handoff.close)
+
+    def _readable(self):
+        return bool(select.select([self.handoff], [], [], 0)[0])
+
+    def test_items_handed_off_in_order(self):
+        for i in range(3):
+            self.handoff.put(i)
+        self.assertTrue(self._readable())
+
+        self.assertEqual([0, 1, 2], self.handoff.get_all())
+        self.assertFalse(self._readable())
+
+    def test_item_put_while_draining_the_pipe(self):
+        read = os.read
+
+        def _read(fd, n):
+            # another thread puts an item just before the pipe is drained
+            self.handoff.put('during')
+            return read(fd, n)
+
+        self.handoff.put('before')
+        with mock.patch('os.read', side_effect=_read):
+            self.assertEqual(['before', 'during'], self.handoff.get_all())
+
+        # the wakeup of the next item must not be lost
+        self.handoff.put('after')
+        self.assertTrue(self._readable())
+        self.assertEqual(['after'], self.handoff.get_all())
+
+
+class GenerateIdTestCase(test_utils.BaseTestCase):
+    def test_ids_unique(self):
+        ids = [utils.generate_id() for _ in range(1000)]
+        self.assertEqual(1000, len(set(ids)))
+        self.assertTrue(all(len(id) == 32 for id in ids))
+        self.assertEqual(1, len(set(id[:16] for id in ids)))
+
+    def test_new_prefix_in_other_process(self):
+        id = utils.generate_id()
+        with mock.patch('os.getpid', return_value=-1):
+            with mock.patch.object(utils, '_check_pid', True):
+                other = utils.generate_id()
+        self.assertNotEqual(id[:16], other[:16])
+        self.assertEqual(other[:16], utils.generate_id()[:16])
+
+    def test_uuid_format(self):
+        id = utils.generate_uuid()
+        self.assertEqual(id, str(uuid.UUID(id)))
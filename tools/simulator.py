@@ -37,6 +37,7 @@ RANDOM_VARIABLE = None
 CURRENT_PID = None
 RPC_CLIENTS = []
 MESSAGES = []
+CONTEXT = {}
 
 USAGE = """ Usage: ./simulator.py [-h] [--url URL] [-d DEBUG]\
  {notify-server,notify-client,rpc-server,rpc-client} ...
@@ -222,6 +223,23 @@ def init_msg(messages_count):
     LOG.info("Messages has been prepared")
 
 
+def init_context(services):
+    # Build a context carrying a keystone like service catalog, to measure
+    # the cost of large contexts on the library and the message transport
+    if services <= 0:
+        return
+    CONTEXT['request_id'] = 'req-simulator'
+    CONTEXT['service_catalog'] = [
+        {'type': 'service-%d' % i, 'name': 'service-%d' % i,
+         'endpoints': [{'region': 'region-%d' % r, 'interface': interface,
+                        'url': 'http://service-%d.region-%d:%d/v2' % (
+                            i, r, 8000 + i)}
+                       for r in range(3)
+                       for interface in ('public', 'internal', 'admin')]}
+        for i in range(services)]
+    LOG.info("Context has been prepared with %d services", services)
+
+
 def rpc_server(transport, target, wait_before_answer, executor, show_stats):
     endpoints = [RpcEndpoint(wait_before_answer, show_stats)]
     server = rpc.get_rpc_server(transport, target, endpoints,
@@ -250,7 +268,7 @@ def send_msg(c_id, transport, target, wait_after_msg, timeout, is_cast,
 
 def _rpc_call(client, msg):
     try:
-        res = client.call({}, 'info', message=msg)
+        res = client.call(CONTEXT, 'info', message=msg)
     except Exception as e:
         LOG.exception('Error %s on CALL for message %s', str(e), msg)
     else:
@@ -259,7 +277,7 @@ def _rpc_call(client, msg):
 
 def _rpc_cast(client, msg):
     try:
-        client.cast({}, 'info', message=msg)
+        client.cast(CONTEXT, 'info', message=msg)
     except Exception as e:
         LOG.exception('Error %s on CAST for message %s', str(e), msg)
     else:
@@ -345,6 +363,10 @@ def main():
                         'have been done')
     client.add_argument('--is-cast', dest='is_cast', type=bool, default=False,
                         help='Use `call` or `cast` RPC methods')
+    client.add_argument('--context-services', dest='context_services',
+                        type=int, default=0,
+                        help='Number of services in a service catalog sent '
+                        'in the context of each message')
 
     args = parser.parse_args()
 
@@ -379,6 +401,7 @@ def main():
                         args.wait_after_msg, args.timeout)
     elif args.mode == 'rpc-client':
         init_msg(args.messages)
+        init_context(args.context_services)
 
         start = datetime.datetime.now()
         threads_spawner(args.threads, send_msg, transport, target,